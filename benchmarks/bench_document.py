@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Memory and build time of ``Document`` and ``CompactDocument``.
+
+Builds a 1000 row page with 15 fields per document, the way
+``SolrResults`` does, and reports traced allocations.
+
+Usage::
+
+    python benchmarks/bench_document.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar.document import Document, CompactDocument, FieldIndex
+
+
+class FakeResults(object):
+    def __init__(self):
+        self.field_index = FieldIndex()
+
+
+def make_raw_docs(rows=1000, fields=15):
+    return [
+        dict(('field_{}'.format(f), '{}-{}'.format(i, f) if f % 2 else i * f)
+             for f in range(fields))
+        for i in range(rows)
+    ]
+
+
+def build(document_cls, raw_docs):
+    results = FakeResults()
+    return [document_cls(_results=results, **raw_doc) for raw_doc in raw_docs]
+
+
+def measure(document_cls, raw_docs):
+    tracemalloc.start()
+    docs = build(document_cls, raw_docs)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del docs
+    seconds = min(timeit.repeat(lambda: build(document_cls, raw_docs),
+                                number=10, repeat=5)) / 10
+    return size, seconds
+
+
+def main():
+    raw_docs = make_raw_docs()
+    for document_cls in (Document, CompactDocument):
+        size, seconds = measure(document_cls, raw_docs)
+        print('{:16} {:8.1f} KiB  {:6.0f} bytes/doc  {:6.2f} ms/page'.format(
+            document_cls.__name__, size / 1024.0, size / len(raw_docs),
+            seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
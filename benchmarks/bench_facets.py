@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Decoding of large facet fields.
+
+Compares ``FacetField.process_data`` with the previous tuple accumulating
+``zip_counts`` and double ``to_python`` conversion.
+
+Usage::
+
+    python benchmarks/bench_facets.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar.facets import FacetField, FacetValue
+from solar.pysolr import Results
+from solar.types import Integer, String
+
+
+def old_zip_counts(counts, n, over=0):
+    acc = ()
+    for v in counts:
+        acc = acc + (v,)
+        if len(acc) % (n + over) == 0:
+            yield acc
+            acc = acc[n:]
+    if len(acc) == n:
+        yield acc + (None,) * over
+
+
+def old_process_data(facet, results):
+    facet.values = []
+    raw_facet_fields = results.raw_results.facets.get('facet_fields', {})
+    facet_data = raw_facet_fields.get(facet.key, [])
+    for val, count in old_zip_counts(facet_data, 2):
+        facet.values.append(
+            FacetValue(facet.to_python(val), count, facet=facet))
+
+
+class FakeResults(object):
+    def __init__(self, raw_results):
+        self.raw_results = raw_results
+
+
+def main():
+    for size in (100, 1000, 10000):
+        facet_data = []
+        for i in range(size):
+            facet_data.extend([str(i * 7), size - i])
+        results = FakeResults(Results(
+            [], 0, facets={'facet_fields': {'category': facet_data}}))
+
+        for type in (Integer, String):
+            facet = FacetField('category', type=type)
+            old = min(timeit.repeat(lambda: old_process_data(facet, results),
+                                    number=5, repeat=3)) / 5
+            new = min(timeit.repeat(lambda: facet.process_data(results),
+                                    number=5, repeat=3)) / 5
+            print('{:6} values {:8}: old {:8.2f} ms  new {:6.2f} ms'.format(
+                size, type.__name__, old * 1000, new * 1000))
+
+
+if __name__ == '__main__':
+    main()
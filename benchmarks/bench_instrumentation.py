@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+"""Cost of instrumentation phases in the request path.
+
+Every search enters eight phases. Measures a phase without hooks, which is
+the default, and with the ``PhaseCollector`` hook registered.
+
+Usage::
+
+    python benchmarks/bench_instrumentation.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar import instrumentation
+from solar.instrumentation import PhaseCollector, add_hook, remove_hook, phase
+
+
+def run_phase():
+    with phase(instrumentation.HTTP, url='select') as info:
+        info['bytes'] = 100
+
+
+def main():
+    number = 100000
+    empty = min(timeit.repeat(lambda: None, number=number, repeat=3))
+    disabled = min(timeit.repeat(run_phase, number=number, repeat=3))
+    collector = add_hook(PhaseCollector())
+    try:
+        enabled = min(timeit.repeat(run_phase, number=number, repeat=3))
+    finally:
+        remove_hook(collector)
+    print('no hooks:  {:6.3f} us per phase'.format(
+        (disabled - empty) / number * 1e6))
+    print('collector: {:6.3f} us per phase'.format(
+        (enabled - empty) / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
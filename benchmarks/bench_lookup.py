@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""Lookup of values in a large facet.
+
+Filter UIs call ``FacetField.get_value`` for every selected value. Compares
+the indexed lookup with the previous linear scan on a 5000 value facet.
+
+Usage::
+
+    python benchmarks/bench_lookup.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar.facets import FacetField, FacetValue
+from solar.util import LookupIndex
+
+
+def make_facet(size):
+    facet = FacetField('category')
+    facet.values = [FacetValue('value_{}'.format(i), i, facet=facet)
+                    for i in range(size)]
+    return facet
+
+
+def old_get_value(facet, value):
+    for fv in facet.values:
+        if fv.value == value:
+            return fv
+
+
+def main():
+    size = 5000
+    facet = make_facet(size)
+    for selected in (10, 100, 1000):
+        wanted = ['value_{}'.format(i) for i in range(size - selected, size)]
+
+        def run_old():
+            return [old_get_value(facet, v) for v in wanted]
+
+        def run_new():
+            # include the cost of building the index
+            facet._values_index = LookupIndex('value')
+            return [facet.get_value(v) for v in wanted]
+
+        assert run_old() == run_new()
+        old = min(timeit.repeat(run_old, number=3, repeat=3)) / 3
+        new = min(timeit.repeat(run_new, number=3, repeat=3)) / 3
+        print('{} values, {:4} lookups: linear {:8.2f} ms  indexed {:6.2f} ms'.format(
+            size, selected, old * 1000, new * 1000))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""Rendering of filter queries with ``make_fq``.
+
+Compares the previous escaping (one ``re.sub`` per special word and one
+``str.replace`` per special character) without memoization with the
+compiled escaping, cold and warm ``fq_memo``, on wide and deep trees.
+
+Usage::
+
+    python benchmarks/bench_make_fq.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar import util
+from solar.util import X, LocalParams, SPECIAL_WORDS, SPECIAL_CHARACTERS
+
+
+def old_process_special_words(value, words=None):
+    words = words or SPECIAL_WORDS
+    for w in words:
+        value = re.sub(r'(\A|\s+)({})(\s+|\Z)'.format(w),
+                       lambda m: m.group(0).lower(), value)
+    return value
+
+
+def old_process_special_characters(value, chars=None):
+    chars = chars or SPECIAL_CHARACTERS
+    for c in chars:
+        value = value.replace(c, r'\{}'.format(c))
+    return value
+
+
+def wide_tree(width):
+    return X(*[X(**{'field_{}'.format(i): 'value {} AND (x)'.format(i)})
+               for i in range(width)], _op='OR')
+
+
+def deep_tree(depth):
+    x = X(category=13)
+    for i in range(depth):
+        x = X(x, name='name: {}'.format(i)) | X(price__gte=i * 10)
+    return x
+
+
+def bench(func, number=200):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+def main():
+    lp = LocalParams(tag='t')
+    trees = [('wide 10', wide_tree(10)), ('wide 100', wide_tree(100)),
+             ('deep 5', deep_tree(5)), ('deep 20', deep_tree(20))]
+    new_words = util.process_special_words
+    new_chars = util.process_special_characters
+    for name, x in trees:
+        util.process_special_words = old_process_special_words
+        util.process_special_characters = old_process_special_characters
+        old = bench(lambda: util._render_fq(x, lp))
+        util.process_special_words = new_words
+        util.process_special_characters = new_chars
+        compiled = bench(lambda: util._render_fq(x, lp))
+
+        def cold():
+            util.fq_memo.clear()
+            return util.make_fq(x, lp)
+        cold_memo = bench(cold)
+        warm_memo = bench(lambda: util.make_fq(x, lp))
+        assert util.make_fq(x, lp) == util._render_fq(x, lp)
+        print('{:9} old {:8.1f} us  compiled {:8.1f} us  '
+              'memo cold {:8.1f} us  memo warm {:6.1f} us'.format(
+                  name, old * 1e6, compiled * 1e6,
+                  cold_memo * 1e6, warm_memo * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Build time of long ``SolrQuery`` chains.
+
+Compares copy-on-write cloning with the previous ``_clone`` that created
+a new query and copied every list and the params dict.
+
+Usage::
+
+    python benchmarks/bench_query_clone.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar import SolrSearcher
+from solar.query import SolrQuery
+
+
+class OldCloneQuery(SolrQuery):
+    def _clone(self, cls=None):
+        cls = cls or self.__class__
+        clone = cls(self.searcher, self._q, *self._q_args, **self._q_kwargs)
+        clone._q_local_params = self._q_local_params
+        clone._fq = list(self._fq)
+        clone._groupeds = list(self._groupeds)
+        clone._facet_fields = list(self._facet_fields)
+        clone._facet_queries = list(self._facet_queries)
+        clone._facet_ranges = list(self._facet_ranges)
+        clone._facet_dates = list(self._facet_dates)
+        clone._facet_pivots = list(self._facet_pivots)
+        clone._stats_fields = list(self._stats_fields)
+        clone._params = self._params.copy()
+        clone._document_cls = self._document_cls
+        clone._instance_mapper = self._instance_mapper
+        clone._db_query = self._db_query
+        clone._iter_instances = self._iter_instances
+        clone._use_cache = self._use_cache
+        return clone
+
+
+def build(searcher, length):
+    q = searcher.search('test')
+    for i in range(length):
+        step = i % 5
+        if step == 0:
+            q = q.filter(field=i)
+        elif step == 1:
+            q = q.facet_field('facet_{}'.format(i), limit=10)
+        elif step == 2:
+            q = q.order_by('-rank_{}'.format(i))
+        elif step == 3:
+            q = q.set_param('param_{}'.format(i), i)
+        else:
+            q = q.stats('stats_{}'.format(i))
+    return q
+
+
+def main():
+    new_searcher = SolrSearcher('http://localhost:8983/solr')
+    old_searcher = SolrSearcher('http://localhost:8983/solr',
+                                query_cls=OldCloneQuery)
+    for length in (5, 20, 100):
+        assert str(build(old_searcher, length)) == str(build(new_searcher, length))
+        old = min(timeit.repeat(lambda: build(old_searcher, length),
+                                number=100, repeat=3)) / 100
+        new = min(timeit.repeat(lambda: build(new_searcher, length),
+                                number=100, repeat=3)) / 100
+        print('{:4} calls: old {:8.1f} us  copy-on-write {:8.1f} us'.format(
+            length, old * 1e6, new * 1e6))
+
+
+if __name__ == '__main__':
+    main()
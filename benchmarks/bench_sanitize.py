@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Throughput of ``clean_xml_string`` and ``sanitize``.
+
+Compares the current implementations with the previous per-character
+generator and ``bytes.replace`` loop.
+
+Usage::
+
+    python benchmarks/bench_sanitize.py
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from solar.pysolr import (
+    clean_xml_string, sanitize, is_valid_xml_char_ordinal,
+    force_bytes, force_unicode, REPLACEMENTS,
+)
+
+
+def old_clean_xml_string(s):
+    return ''.join(c for c in s if is_valid_xml_char_ordinal(ord(c)))
+
+
+def old_sanitize(data):
+    fixed_string = force_bytes(data)
+    for bad, good in REPLACEMENTS:
+        fixed_string = fixed_string.replace(bad, good)
+    return force_unicode(fixed_string)
+
+
+def make_text(size, dirty):
+    chunk = 'Lorem ipsum dolor sit amet, Привіт світ! 1234567890\n'
+    if dirty:
+        chunk += '\x01\x0b'
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def measure(func, data, number):
+    seconds = min(timeit.repeat(lambda: func(data), number=number, repeat=3))
+    size = len(data.encode('utf-8')) * number
+    return size / seconds / 1024 / 1024
+
+
+def main():
+    size = 4 * 1024 * 1024
+    for dirty in (False, True):
+        data = make_text(size, dirty)
+        print('{} text, {} MB'.format('dirty' if dirty else 'clean', size // 1024 // 1024))
+        for name, old, new in (
+                ('clean_xml_string', old_clean_xml_string, clean_xml_string),
+                ('sanitize', old_sanitize, sanitize)):
+            assert old(data) == new(data)
+            before = measure(old, data, 1)
+            after = measure(new, data, 5)
+            print('  {:<18} before: {:>9.1f} MB/s  after: {:>9.1f} MB/s  x{:.1f}'.format(
+                name, before, after, after / before))
+
+
+if __name__ == '__main__':
+    main()
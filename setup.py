@@ -33,6 +33,9 @@ setup(
             'lxml',
             'cssselect',
         ],
+        'async': [
+            'aiohttp',
+        ],
     },
     classifiers=[
         "Development Status :: 3 - Alpha",
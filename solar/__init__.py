@@ -1,6 +1,12 @@
-from .searcher import SolrSearcher, CommonSearcher
-from .query import SolrQuery, SolrError
+from .searcher import SolrSearcher, AsyncSolrSearcher, CommonSearcher
+from .query import SolrQuery, AsyncSolrQuery, SolrError
 from .util import X, LocalParams
+from .cache import ResultCache, MemcachedResultCache
+from .template import Placeholder
+from .cluster import SolrCluster
+from .retry import RetryPolicy, CircuitBreaker
+from .exceptions import CircuitOpenError
+from .deadline import Deadline, DeadlineExceeded
 
 from .functions import _FunctionGenerator
 func = _FunctionGenerator()
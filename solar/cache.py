@@ -0,0 +1,352 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+import time
+import zlib
+import socket
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from .compat import force_unicode
+from .pysolr import force_bytes
+
+
+log = logging.getLogger(__name__)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class BaseResultCache(object):
+    """Interface of the searcher's result cache.
+
+    Subclasses must implement ``get``, ``set``, ``delete`` and ``clear``.
+    ``get`` returns ``None`` for missing keys.
+    """
+    # does network I/O, async searchers call it from a thread pool
+    blocking = False
+
+    @staticmethod
+    def make_key(handler, params):
+        """Makes key from handler name and request parameters."""
+        return (handler, _freeze(params))
+
+    def get(self, key):
+        raise NotImplementedError()
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def get_or_set(self, key, creator, ttl=None, cacheable=None):
+        """Returns cached value or calls ``creator`` and caches its result.
+
+        Result is not stored when ``cacheable(value)`` returns ``False``.
+        """
+        value = self.get(key)
+        if value is None:
+            value = creator()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, ttl=ttl)
+        return value
+
+
+class ResultCache(BaseResultCache):
+    """In-process cache of decoded Solr responses.
+
+    Keeps at most ``maxsize`` entries evicting least recently used ones,
+    every entry expires in ``ttl`` seconds.
+
+    Usage::
+
+        searcher = SolrSearcher(solr_url, result_cache=ResultCache(1000, ttl=30))
+        # bypass cache for a single query
+        searcher.search('test').cache(False).results
+    """
+    def __init__(self, maxsize=1024, ttl=60, timer=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires_at = item
+            if expires_at <= self.timer():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, self.timer() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': len(self._data),
+        }
+
+
+class MemcachedError(Exception):
+    pass
+
+
+class MemcachedResultCache(BaseResultCache):
+    """Result cache shared between processes via memcached text protocol.
+
+    Values are stored as zlib compressed JSON. Network errors are logged
+    and treated as cache misses so search keeps working without memcached.
+
+    While one client computes an expired key others wait up to
+    ``lock_timeout`` seconds for its result instead of querying Solr too.
+
+    Keys contain a namespace version stored in memcached, :meth:`clear`
+    increments it so other keys of a shared server are kept. Clients
+    re-read the version every ``version_ttl`` seconds.
+
+    :class:`AsyncSolrSearcher` calls the cache from the default executor
+    so the event loop is not blocked by memcached requests.
+
+    Usage::
+
+        cache = MemcachedResultCache('127.0.0.1:11211', ttl=30, prefix='catalog:')
+        searcher = SolrSearcher(solr_url, result_cache=cache)
+    """
+    FLAG_ZLIB_JSON = 1
+    blocking = True
+
+    def __init__(self, server='127.0.0.1:11211', ttl=60, prefix='solar:',
+                 timeout=1, lock_timeout=5, compress_level=6, version_ttl=1):
+        if isinstance(server, tuple):
+            self.address = server
+        else:
+            host, _, port = server.rpartition(':')
+            self.address = (host, int(port))
+        self.ttl = ttl
+        self.prefix = prefix
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.compress_level = compress_level
+        self.version_ttl = version_ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._version_key = '{}version'.format(prefix)
+        self._version = None
+        self._version_checked_at = 0
+
+    def make_key(self, handler, params):
+        digest = hashlib.sha1(
+            force_bytes(repr(_freeze(params)))).hexdigest()
+        return '{}{}:{}:{}'.format(self.prefix, handler, self.get_version(),
+                                   digest)
+
+    def get_version(self):
+        now = time.time()
+        if (self._version is None or
+                now - self._version_checked_at >= self.version_ttl):
+            version = self._call(None, self._read_version)
+            if version is not None:
+                self._version = version
+            elif self._version is None:
+                # memcached is down, keys will not be found anyway
+                self._version = '0'
+            self._version_checked_at = now
+        return self._version
+
+    def dumps(self, value):
+        data = json.dumps(value, separators=(',', ':'))
+        return zlib.compress(force_bytes(data), self.compress_level)
+
+    def loads(self, data):
+        return json.loads(force_unicode(zlib.decompress(data)))
+
+    # protocol
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection(self.address, self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+        return conn
+
+    def _disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            sock, reader = conn
+            reader.close()
+            sock.close()
+
+    def _command(self, line, data=None):
+        try:
+            sock, reader = self._connect()
+            payload = force_bytes(line) + b'\r\n'
+            if data is not None:
+                payload += data + b'\r\n'
+            sock.sendall(payload)
+            return reader, reader.readline().rstrip(b'\r\n')
+        except (socket.error, socket.timeout):
+            self._disconnect()
+            raise
+
+    def _call(self, default, func, *args):
+        try:
+            return func(*args)
+        except (socket.error, socket.timeout, MemcachedError) as e:
+            log.warning('Memcached error: %s', e)
+            self._disconnect()
+            return default
+
+    def _get_raw(self, key):
+        reader, line = self._command('get {}'.format(key))
+        flags, data = None, None
+        while line != b'END':
+            parts = line.split()
+            if len(parts) != 4 or parts[0] != b'VALUE':
+                raise MemcachedError(force_unicode(line))
+            flags, size = int(parts[2]), int(parts[3])
+            data = reader.read(size + 2)[:-2]
+            line = reader.readline().rstrip(b'\r\n')
+        return flags, data
+
+    def _get(self, key):
+        flags, data = self._get_raw(key)
+        if flags != self.FLAG_ZLIB_JSON:
+            return None
+        try:
+            return self.loads(data)
+        except (zlib.error, ValueError) as e:
+            log.warning("Corrupt memcached value of '%s': %s", key, e)
+            return None
+
+    def _store(self, command, key, data, ttl, flags=0):
+        _, line = self._command(
+            '{} {} {} {} {}'.format(command, key, flags, int(ttl), len(data)),
+            data)
+        if line not in (b'STORED', b'NOT_STORED'):
+            raise MemcachedError(force_unicode(line))
+        return line == b'STORED'
+
+    def _delete(self, key):
+        _, line = self._command('delete {}'.format(key))
+        if line not in (b'DELETED', b'NOT_FOUND'):
+            raise MemcachedError(force_unicode(line))
+
+    def _read_version(self):
+        _, data = self._get_raw(self._version_key)
+        if data is None:
+            # unique initial value so evicted version does not revive old keys
+            self._store('add', self._version_key,
+                        force_bytes('{}'.format(int(time.time() * 1000))), 0)
+            _, data = self._get_raw(self._version_key)
+        return force_unicode(data) if data is not None else None
+
+    def _incr_version(self):
+        _, line = self._command('incr {} 1'.format(self._version_key))
+        if line == b'NOT_FOUND':
+            return self._read_version()
+        if not line.isdigit():
+            raise MemcachedError(force_unicode(line))
+        return force_unicode(line)
+
+    # cache interface
+
+    def get(self, key):
+        value = self._call(None, self._get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._call(False, self._store, 'set', key, self.dumps(value),
+                   max(ttl, 1), self.FLAG_ZLIB_JSON)
+
+    def delete(self, key):
+        self._call(None, self._delete, key)
+
+    def clear(self):
+        """Invalidates all keys of this cache."""
+        version = self._call(None, self._incr_version)
+        if version is not None:
+            self._version = version
+            self._version_checked_at = time.time()
+
+    def get_or_set(self, key, creator, ttl=None, cacheable=None):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        lock_key = key + ':lock'
+        locked = self._call(None, self._store, 'add', lock_key, b'1',
+                            max(self.lock_timeout, 1))
+        if locked is False:
+            # someone else is computing the value, wait for it
+            deadline = time.time() + self.lock_timeout
+            while time.time() < deadline:
+                time.sleep(0.01)
+                value = self._call(None, self._get, key)
+                if value is not None:
+                    self.hits += 1
+                    return value
+        try:
+            value = creator()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, ttl=ttl)
+        finally:
+            if locked:
+                self.delete(lock_key)
+        return value
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,268 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import logging
+import threading
+import time
+
+from .pysolr import Solr
+from .deadline import get_current_deadline
+from .exceptions import (
+    SolrConnectionError, CircuitOpenError, DeadlineExceeded)
+
+
+log = logging.getLogger(__name__)
+
+
+class SolrNode(object):
+    """Replica of :class:`SolrCluster` with its load and latency stats."""
+
+    def __init__(self, url, breaker=None):
+        self.url = url
+        self.breaker = breaker
+        self.healthy = True
+        self.outstanding = 0
+        # exponentially weighted moving average of response time in seconds
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+
+    def __repr__(self):
+        return '<SolrNode {} {}>'.format(
+            self.url, 'healthy' if self.healthy else 'ejected')
+
+    def create_full_url(self, path=''):
+        if len(path):
+            return '/'.join([self.url.rstrip('/'), path.lstrip('/')])
+        return self.url
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'latency': self.latency,
+            'requests': self.requests,
+            'failures': self.failures,
+            'circuit_breaker': self.breaker.stats() if self.breaker else None,
+        }
+
+
+class SolrCluster(Solr):
+    """
+    :class:`Solr` client which balances requests between several replicas.
+
+    Accepts a list of base urls and the same arguments as :class:`Solr`.
+    All nodes share one connection pool.
+
+    ``balancing`` is ``'least_outstanding'`` to choose a node with
+    the least number of in-flight requests or ``'ewma'`` to also take into
+    account the moving average of node response times.
+
+    Nodes which fail to respond are ejected. If ``health_check_interval``
+    is set a background thread pings all nodes and re-admits recovered
+    ones, otherwise :meth:`check_health` should be called periodically.
+    Idempotent requests (searches and real-time gets) are retried
+    on another node, updates are sent only once.
+
+    A ``circuit_breaker`` is copied for every node, nodes with open
+    breakers are skipped. When ``retry_policy`` is passed it replaces
+    ``max_attempts`` for the requests it retries: every retry goes to
+    another node if there is one, after a backoff delay, and
+    ``retry_policy.max_attempts`` limits the total number of HTTP attempts.
+
+    Usage::
+
+        solr = SolrCluster(['http://solr1:8983/solr/products',
+                            'http://solr2:8983/solr/products'],
+                           balancing='ewma', health_check_interval=5)
+        searcher = SolrSearcher(solr=solr)
+    """
+    LEAST_OUTSTANDING = 'least_outstanding'
+    EWMA = 'ewma'
+
+    health_check_path = 'admin/ping?wt=json'
+    # weight of the last response time in the latency average
+    ewma_alpha = 0.3
+    idempotent_paths = ('select', 'get', 'mlt', 'terms')
+
+    def __init__(self, urls, balancing=LEAST_OUTSTANDING,
+                 health_check_interval=None, health_check_timeout=2,
+                 max_attempts=None, **kwargs):
+        if not urls:
+            raise ValueError('At least one node url is required')
+        if balancing not in (self.LEAST_OUTSTANDING, self.EWMA):
+            raise ValueError('Unknown balancing: {!r}'.format(balancing))
+        super(SolrCluster, self).__init__(urls[0], **kwargs)
+        self.nodes = [
+            SolrNode(url, breaker=(self.circuit_breaker.copy()
+                                   if self.circuit_breaker else None))
+            for url in urls]
+        self.balancing = balancing
+        self.health_check_timeout = health_check_timeout
+        self.max_attempts = max_attempts or len(self.nodes)
+        self._nodes_lock = threading.Lock()
+        self._next = 0
+        self._health_checker = None
+        self._stop_health_checks = threading.Event()
+        if health_check_interval:
+            self.start_health_checks(health_check_interval)
+
+    def _node_score(self, node):
+        if self.balancing == self.EWMA:
+            return (node.outstanding + 1) * (node.latency or 0.0)
+        return node.outstanding
+
+    def _choose_node(self, exclude=()):
+        with self._nodes_lock:
+            candidates = [n for n in self.nodes
+                          if n not in exclude and
+                          (n.breaker is None or n.breaker.available())]
+            healthy = [n for n in candidates if n.healthy]
+            # when all nodes are ejected trying them is better than failing
+            candidates = healthy or candidates
+            if not candidates:
+                return None
+            # rotate to spread requests between equally loaded nodes
+            self._next = (self._next + 1) % len(candidates)
+            candidates = candidates[self._next:] + candidates[:self._next]
+            node = min(candidates, key=self._node_score)
+            if node.breaker is not None:
+                node.breaker.allow()
+            node.outstanding += 1
+            node.requests += 1
+            return node
+
+    def _finish_request(self, node, elapsed=None, error=None, sent=True):
+        with self._nodes_lock:
+            node.outstanding -= 1
+            if node.breaker is not None:
+                if error is not None:
+                    node.breaker.record_failure()
+                elif sent:
+                    node.breaker.record_success()
+                else:
+                    node.breaker.release()
+            if elapsed is not None:
+                if node.latency is None:
+                    node.latency = elapsed
+                else:
+                    node.latency += self.ewma_alpha * (elapsed - node.latency)
+            if error is not None:
+                node.failures += 1
+                node.last_error = error
+                node.healthy = False
+
+    def is_idempotent(self, method, path):
+        path = path.lstrip('/')
+        return method.lower() == 'get' or path.startswith(self.idempotent_paths)
+
+    def retry_stats(self):
+        stats = super(SolrCluster, self).retry_stats()
+        stats['circuit_breaker'] = dict(
+            (node.url, node.breaker.stats() if node.breaker else None)
+            for node in self.nodes)
+        return stats
+
+    def _send_request(self, method, path='', body=None, headers=None, files=None, stream=False):
+        policy = self.retry_policy
+        if policy is not None and not policy.is_retryable(method, path):
+            policy = None
+        max_attempts = self.max_attempts if self.is_idempotent(method, path) else 1
+        attempt = 1
+        tried = []
+        error = None
+        while True:
+            node = self._choose_node(exclude=tried)
+            if node is None and policy is not None and tried:
+                # every node has failed, start another round
+                tried = []
+                node = self._choose_node()
+            if node is None:
+                if error is None:
+                    raise CircuitOpenError(
+                        'Circuit breakers of all Solr nodes are open')
+                raise error
+            tried.append(node)
+            start_time = time.time()
+            try:
+                response = self._send_url_request(
+                    node.create_full_url(path), method, body=body,
+                    headers=headers, files=files, stream=stream)
+            except SolrConnectionError as e:
+                self._finish_request(node, error=e)
+                log.warning("Solr node '%s' is ejected: %s", node.url, e)
+                error = e
+                deadline = get_current_deadline()
+                if deadline is not None and deadline.expired():
+                    # no time is left to try other nodes
+                    raise DeadlineExceeded(
+                        'Deadline of {}s exceeded: {}'.format(deadline.timeout, e))
+                if policy is not None:
+                    delay = policy.next_delay(attempt)
+                    if delay is None:
+                        raise
+                    policy.sleep(delay)
+                elif attempt >= max_attempts:
+                    raise
+                attempt += 1
+                continue
+            except DeadlineExceeded:
+                self._finish_request(node, sent=False)
+                raise
+            except Exception:
+                self._finish_request(node, elapsed=time.time() - start_time)
+                raise
+            self._finish_request(node, elapsed=time.time() - start_time)
+            return response
+
+    def check_node(self, node):
+        """Pings node and returns ``True`` if it is alive."""
+        try:
+            resp = self.session.get(node.create_full_url(self.health_check_path),
+                                    timeout=self.health_check_timeout)
+            return resp.status_code == 200
+        except Exception as e:
+            log.debug("Health check of '%s' failed: %s", node.url, e)
+            return False
+
+    def check_health(self):
+        """Pings all nodes, ejects dead and re-admits recovered ones."""
+        for node in self.nodes:
+            healthy = self.check_node(node)
+            with self._nodes_lock:
+                if healthy and not node.healthy:
+                    log.info("Solr node '%s' is re-admitted", node.url)
+                elif not healthy and node.healthy:
+                    log.warning("Solr node '%s' is ejected by health check",
+                                node.url)
+                node.healthy = healthy
+
+    def start_health_checks(self, interval):
+        if self._health_checker is not None:
+            return
+        self._stop_health_checks.clear()
+
+        def run():
+            while not self._stop_health_checks.wait(interval):
+                try:
+                    self.check_health()
+                except Exception:
+                    log.exception('Solr health check failed')
+
+        self._health_checker = threading.Thread(
+            target=run, name='solr-health-check')
+        self._health_checker.daemon = True
+        self._health_checker.start()
+
+    def close(self):
+        """Stops background health checks."""
+        if self._health_checker is not None:
+            self._stop_health_checks.set()
+            self._health_checker.join()
+            self._health_checker = None
+
+    def nodes_stats(self):
+        with self._nodes_lock:
+            return [node.stats() for node in self.nodes]
@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import threading
+import time
+
+from .exceptions import DeadlineExceeded
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+
+if contextvars is not None:
+    _current = contextvars.ContextVar('solar_deadline', default=None)
+
+    def get_current_deadline():
+        """Returns deadline active in the current thread or task."""
+        return _current.get()
+
+    def _set(deadline):
+        return _current.set(deadline)
+
+    def _reset(token):
+        _current.reset(token)
+else:
+    _local = threading.local()
+
+    def get_current_deadline():
+        """Returns deadline active in the current thread."""
+        return getattr(_local, 'deadline', None)
+
+    def _set(deadline):
+        token = get_current_deadline()
+        _local.deadline = deadline
+        return token
+
+    def _reset(token):
+        _local.deadline = token
+
+
+class _Activation(object):
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self._token = None
+
+    def __enter__(self):
+        deadline = self.deadline
+        current = get_current_deadline()
+        # nested deadline cannot extend the outer one
+        if current is not None and current.expires_at < deadline.expires_at:
+            deadline = current
+        self._token = _set(deadline)
+        return deadline
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _reset(self._token)
+        return False
+
+
+class Deadline(object):
+    """Time budget for everything that is done to serve a request.
+
+    While a deadline is active Solr requests use the remaining time as
+    HTTP timeout and ``timeAllowed`` parameter. When the budget is spent
+    :exc:`DeadlineExceeded` is raised instead of sending new requests or
+    calling instance mappers. Mappers can read
+    :func:`get_current_deadline` to limit their own queries.
+
+    Usage::
+
+        with Deadline(1.5).activate():
+            results = query.results
+            query_filter.process_results(results)
+
+        # or only for a single query
+        results = query.deadline(1.5).results
+        if results.partial_results:
+            ...
+    """
+    def __init__(self, timeout, _clock=time.time):
+        self._clock = _clock
+        self.timeout = timeout
+        self.expires_at = _clock() + timeout
+
+    def __repr__(self):
+        return '<Deadline remaining={:.3f}s>'.format(self.remaining())
+
+    def remaining(self):
+        return max(self.expires_at - self._clock(), 0.0)
+
+    def expired(self):
+        return self._clock() >= self.expires_at
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded(
+                'Deadline of {}s exceeded'.format(self.timeout))
+
+    def activate(self):
+        return _Activation(self)
+
+    def wrap(self, fn):
+        """Returns function that runs ``fn`` with this deadline active.
+
+        Useful to pass deadline to other threads.
+        """
+        def wrapper(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def get_timeout(default):
+    """Returns HTTP timeout limited by the current deadline."""
+    deadline = get_current_deadline()
+    if deadline is None:
+        return default
+    deadline.check()
+    remaining = deadline.remaining()
+    if default is None:
+        return remaining
+    return min(default, remaining)
+
+
+def is_limited_by_deadline(timeout, default):
+    """Checks if HTTP ``timeout`` was shortened by the current deadline.
+
+    Timeouts of such requests are reported as :exc:`DeadlineExceeded`
+    so they do not count as node failures.
+    """
+    if get_current_deadline() is None:
+        return False
+    return default is None or timeout < default
@@ -1,12 +1,8 @@
 from __future__ import unicode_literals
 
-    
-class Document(object):
-    def __init__(self, _results=None, **raw_doc):
-        self._results = _results
-        self._fields = list(raw_doc.keys())
-        for key in raw_doc:
-            setattr(self, key, raw_doc[key])
+
+class DocumentMixin(object):
+    __slots__ = ()
 
     @property
     def instance(self):
@@ -23,5 +19,96 @@ class Document(object):
         if id:
             return self._results.highlighted.get(id)
 
+
+class Document(DocumentMixin):
+    def __init__(self, _results=None, **raw_doc):
+        self._results = _results
+        self._fields = list(raw_doc.keys())
+        for key in raw_doc:
+            setattr(self, key, raw_doc[key])
+
     def to_solr(self):
         return dict((f, getattr(self, f)) for f in self._fields)
+
+
+_MISSING = object()
+
+
+class FieldIndex(object):
+    """Field name to row position mapping shared by documents of one response.
+
+    New field names are appended when they appear, so rows of earlier
+    documents can be shorter than the index.
+    """
+    __slots__ = ('names', 'positions')
+
+    def __init__(self, names=()):
+        self.names = []
+        self.positions = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        return self.positions[name]
+
+    def make_row(self, raw_doc):
+        positions = self.positions
+        if len(raw_doc) == len(positions):
+            try:
+                row = [None] * len(positions)
+                for name, value in raw_doc.items():
+                    row[positions[name]] = value
+                return tuple(row)
+            except KeyError:
+                pass
+        row = [_MISSING] * len(positions)
+        for name, value in raw_doc.items():
+            pos = positions.get(name)
+            if pos is None:
+                pos = self.add(name)
+                row.append(_MISSING)
+            row[pos] = value
+        return tuple(row)
+
+
+class CompactDocument(DocumentMixin):
+    """Document that keeps field values in a tuple.
+
+    Field names are stored once per response in :class:`FieldIndex`
+    so documents do not have ``__dict__``. Use it on pages with many rows::
+
+        class ProductSearcher(SolrSearcher):
+            document_cls = CompactDocument
+    """
+    __slots__ = ('_results', '_index', '_row', '_instance')
+
+    def __init__(self, _results=None, **raw_doc):
+        self._results = _results
+        if _results is not None:
+            self._index = _results.field_index
+        else:
+            self._index = FieldIndex()
+        self._row = self._index.make_row(raw_doc)
+
+    def __getattr__(self, name):
+        if name in CompactDocument.__slots__:
+            raise AttributeError(name)
+        pos = self._index.positions.get(name)
+        if pos is not None and pos < len(self._row):
+            value = self._row[pos]
+            if value is not _MISSING:
+                return value
+        raise AttributeError(name)
+
+    def __getstate__(self):
+        return (self._results, self.to_solr())
+
+    def __setstate__(self, state):
+        self.__init__(state[0], **state[1])
+
+    def to_solr(self):
+        return dict((name, value)
+                    for name, value in zip(self._index.names, self._row)
+                    if value is not _MISSING)
@@ -0,0 +1,33 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+
+
+class SolrError(Exception):
+    pass
+
+
+# server is overloaded or restarting, other replicas can serve the request
+UNAVAILABLE_STATUS_CODES = (502, 503, 504)
+
+
+class SolrConnectionError(SolrError):
+    """
+    Server could not be reached, timed out or is temporarily unavailable.
+    """
+    pass
+
+
+class DeadlineExceeded(SolrError):
+    """
+    Time budget of the current request is spent, see :class:`Deadline`.
+    """
+    pass
+
+
+class CircuitOpenError(SolrConnectionError):
+    """
+    Request is rejected without connecting because the node is considered
+    down, see :class:`solar.retry.CircuitBreaker`.
+    """
+    pass
@@ -2,22 +2,26 @@ from __future__ import unicode_literals
 
 from __future__ import absolute_import
 from copy import deepcopy
-from itertools import chain
 
-from .util import LocalParams, X, make_fq, _pop_from_kwargs
-from .types import instantiate, get_to_python
+from .util import LocalParams, X, LookupIndex, make_fq, _pop_from_kwargs
+from .types import instantiate, get_to_python, get_to_python_list
 from .pysolr import Solr
+from .loader import InstanceLoader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 def zip_counts(counts, n, over=0):
-    acc = ()
-    for v in counts:
-        acc = acc + (v,)
-        if len(acc) % (n + over) == 0:
-            yield acc
-            acc = acc[n:]
-    if len(acc) == n:
-        yield acc + (None,) * over
+    counts = tuple(counts)
+    size = n + over
+    for i in range(0, len(counts) - n + 1, n):
+        chunk = counts[i:i + size]
+        if len(chunk) < size:
+            chunk = chunk + (None,) * (size - len(chunk))
+        yield chunk
 
 
 class FacetField(object):
@@ -27,10 +31,13 @@ class FacetField(object):
         self.key = self.local_params.get('key', self.field)
         self.type = instantiate(_pop_from_kwargs(facet_params, 'type'))
         self.to_python = get_to_python(self.type)
+        self.to_python_list = get_to_python_list(self.type)
         self.instance_mapper = _pop_from_kwargs(facet_params, 'instance_mapper')
-        self.mapper_registry = None
+        self.instance_loader = None
         self.facet_params = facet_params
         self.values = []
+        self._values_index = LookupIndex('value')
+        self._arrays = None
 
     def clone(self):
         return self.__class__(
@@ -48,36 +55,61 @@ class FacetField(object):
         return params
 
     def get_value(self, value):
-        for fv in self.values:
-            if fv.value == value:
-                return fv
+        return self._values_index.lookup(self.values, value)
 
-    def set_mapper_registry(self, mapper_registry):
-        if self.instance_mapper:
-            mapper_registry.setdefault(self.instance_mapper, []).append(self)
-        self.mapper_registry = mapper_registry
+    def set_instance_loader(self, instance_loader):
+        self.instance_loader = instance_loader
+        if instance_loader is not None:
+            instance_loader.register(self)
 
     def process_data(self, results):
-        self.values = []
         raw_facet_fields = results.raw_results.facets.get('facet_fields', {})
         facet_data = raw_facet_fields.get(self.key, [])
-        for val, count in zip_counts(facet_data, 2):
-            self.values.append(
-                FacetValue(self.to_python(val), count, facet=self))
+        counts = facet_data[1::2]
+        values = self.to_python_list(facet_data[0:2 * len(counts):2])
+        make_value = FacetValue.from_python
+        self.values = [make_value(value, count, self)
+                       for value, count in zip(values, counts)]
+        self._arrays = None
+
+    def to_arrays(self):
+        """Returns values and counts as numpy arrays.
+
+        Values array has dtype of the facet type (``object`` for strings)
+        so numeric facets can be sorted and aggregated without python loops::
+
+            values, counts = results.get_facet_field('price').to_arrays()
+            total = (values * counts).sum()
+        """
+        if numpy is None:
+            raise ImportError('FacetField.to_arrays requires numpy to be installed')
+        if self._arrays is None or len(self._arrays[1]) != len(self.values):
+            dtype = getattr(self.type, 'numpy_dtype', object)
+            values = [fv.value for fv in self.values]
+            if None in values:
+                dtype = object
+            self._arrays = (
+                numpy.array(values, dtype=dtype),
+                numpy.array([fv.count or 0 for fv in self.values], dtype='int64'),
+            )
+        return self._arrays
 
-    def _populate_instances(self):
-        if self.mapper_registry and self.instance_mapper in self.mapper_registry:
-            facets = self.mapper_registry[self.instance_mapper]
-        else:
-            facets = [self]
-        values = list(chain(*(f.values for f in facets)))
+    def get_instance_mapper(self):
         if self.instance_mapper:
-            instances = self.instance_mapper([v.value for v in values])
-        else:
-            instances = {}
-        for fv in values:
+            return (self.instance_mapper, None)
+
+    def get_instance_ids(self):
+        return [fv.value for fv in self.values]
+
+    def set_instances(self, instances):
+        for fv in self.values:
             fv._instance = instances.get(fv.value)
 
+    def _populate_instances(self):
+        if self.instance_loader is None:
+            self.instance_loader = InstanceLoader()
+        self.instance_loader.load(self)
+
 
 class FacetValue(object):
     def __init__(self, value, count, facet=None):
@@ -88,6 +120,16 @@ class FacetValue(object):
         self.facet = facet
         self.pivot = None
 
+    @classmethod
+    def from_python(cls, value, count, facet):
+        """Makes facet value from already converted value."""
+        fv = cls.__new__(cls)
+        fv.value = fv.orig_value = value
+        fv.count = count
+        fv.facet = facet
+        fv.pivot = None
+        return fv
+
     @property
     def instance(self):
         if not hasattr(self, '_instance'):
@@ -109,6 +151,7 @@ class FacetRange(object):
         self.key = self.local_params.get('key', self.field)
         self.type = instantiate(type)
         self.to_python = get_to_python(self.type)
+        self.to_python_list = get_to_python_list(self.type)
         self.facet_params = facet_params
         self.values = []
 
@@ -141,12 +184,10 @@ class FacetRange(object):
         self.end = self.to_python(raw_facet_data.get('end', self.end))
         self.gap = raw_facet_data.get('gap', self.gap)
         facet_counts = raw_facet_data.get('counts', [])
-        for start, count, end in zip_counts(facet_counts, 2, 1):
-            start = self.to_python(start)
-            if end is None:
-                end = self.end
-            else:
-                end = self.to_python(end)
+        counts = facet_counts[1::2]
+        starts = self.to_python_list(facet_counts[0:2 * len(counts):2])
+        ends = starts[1:] + [self.end]
+        for start, end, count in zip(starts, ends, counts):
             self.values.append(
                 FacetRangeValue(start, end, count, facet=self))
 
@@ -235,6 +276,6 @@ class FacetPivot(FacetField):
             )
             if 'pivot' in facet_data and next_facet:
                 fv.pivot = next_facet.clone()
-                fv.pivot.set_mapper_registry(self.mapper_registry)
+                fv.pivot.set_instance_loader(self.instance_loader)
                 self.process_facet(facet_data['pivot'], [fv.pivot] + rest_facets)
             facet.values.append(fv)
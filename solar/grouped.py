@@ -3,8 +3,9 @@ from __future__ import unicode_literals
 from __future__ import absolute_import
 from copy import deepcopy
 
-from .util import X, make_fq
+from .util import X, LookupIndex, make_fq
 from .types import instantiate, get_to_python
+from .loader import InstanceLoader
 
 
 class Grouped(object):
@@ -23,6 +24,16 @@ class Grouped(object):
         self.start = None
         self.groups = [] # grouped format
         self.docs = [] # simple format
+        self.instance_loader = None
+        self._groups_index = LookupIndex('value')
+
+    def set_instance_loader(self, instance_loader):
+        self.instance_loader = instance_loader
+        if instance_loader is not None:
+            instance_loader.register(self)
+
+    def get_instance_mapper(self):
+        return None
 
     def get_params(self):
         params = {}
@@ -68,9 +79,7 @@ class Grouped(object):
         self.docs.append(doc)
 
     def get_group(self, value):
-        for group in self.groups:
-            if group.value == value:
-                return group
+        return self._groups_index.lookup(self.groups, value)
 
 
 class GroupedField(Grouped):
@@ -103,11 +112,21 @@ class GroupedField(Grouped):
             return self._instance_mapper(ids)
         return {}
         
-    def _populate_instances(self):
-        values = [group.value for group in self.groups]
-        instances_map = self.instance_mapper(values)
+    def get_instance_mapper(self):
+        if self._instance_mapper:
+            return (self._instance_mapper, None)
+
+    def get_instance_ids(self):
+        return [group.value for group in self.groups]
+
+    def set_instances(self, instances):
         for group in self.groups:
-            group._instance = instances_map.get(group.value)
+            group._instance = instances.get(group.value)
+
+    def _populate_instances(self):
+        if self.instance_loader is None:
+            self.instance_loader = InstanceLoader()
+        self.instance_loader.load(self)
 
 
 class GroupedQuery(Grouped):
@@ -0,0 +1,216 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import time
+import asyncio
+import logging
+import threading
+
+from six.moves import queue
+
+from .compat import force_unicode
+
+
+log = logging.getLogger(__name__)
+
+
+def estimate_doc_size(doc):
+    size = 0
+    for key, value in doc.items():
+        if not isinstance(value, (list, tuple)):
+            value = (value,)
+        for v in value:
+            # field name is repeated for every value
+            size += len(key) + len(force_unicode(v))
+    return size
+
+
+class FailedBatch(object):
+    def __init__(self, index, docs, error):
+        self.index = index
+        self.docs = docs
+        self.error = error
+
+
+class IndexerStats(object):
+    def __init__(self):
+        self.docs = 0
+        self.batches = 0
+        self.failed_docs = 0
+        self.failed_batches = []
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def docs_per_sec(self):
+        elapsed = self.elapsed
+        if not elapsed:
+            return 0.0
+        return self.docs / elapsed
+
+
+class Indexer(object):
+    """Sends documents to Solr by batches from several threads.
+
+    Documents are split into batches of at most ``batch_size`` documents
+    and ``batch_bytes`` approximate bytes. Batches are sent by ``workers``
+    threads, when all of them are busy and ``queue_size`` batches are
+    waiting the producer blocks. Solr commits the documents in
+    ``commit_within`` milliseconds, pass ``commit=True`` to send
+    a single commit after all batches.
+
+    Usage::
+
+        indexer = searcher.indexer(batch_size=1000, workers=4)
+        stats = indexer.index(doc for doc in iter_rows())
+        print(stats.docs_per_sec, stats.failed_batches)
+    """
+    def __init__(self, searcher, batch_size=500, batch_bytes=None, workers=4,
+                 queue_size=None, commit_within=10000, commit=False):
+        self.searcher = searcher
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.workers = workers
+        self.queue_size = queue_size or workers * 2
+        self.commit_within = commit_within
+        self.commit = commit
+
+    def iter_batches(self, docs):
+        batch = []
+        batch_bytes = 0
+        for doc in docs:
+            if self.batch_bytes:
+                doc_size = estimate_doc_size(doc)
+                if batch and batch_bytes + doc_size > self.batch_bytes:
+                    yield batch
+                    batch = []
+                    batch_bytes = 0
+                batch_bytes += doc_size
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+                batch_bytes = 0
+        if batch:
+            yield batch
+
+    def send_batch(self, docs):
+        return self.searcher.solr.add(
+            docs, commit=False, commitWithin=self.commit_within)
+
+    def _record_failure(self, stats, index, docs, error):
+        log.error("Failed to index batch %s: %s", index, error, exc_info=True)
+        stats.failed_docs += len(docs)
+        stats.failed_batches.append(FailedBatch(index, docs, error))
+
+    def _record_success(self, stats, docs):
+        stats.docs += len(docs)
+        stats.batches += 1
+
+    def _log_stats(self, stats):
+        log.info("Indexed %s docs in %0.3f seconds (%0.1f docs/sec), "
+                 "%s batches failed",
+                 stats.docs, stats.elapsed, stats.docs_per_sec,
+                 len(stats.failed_batches))
+
+    def _worker(self, batches, stats, lock):
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            index, docs = item
+            try:
+                docs = self.searcher.prepare_docs(docs)
+                self.send_batch(docs)
+            except Exception as e:
+                with lock:
+                    self._record_failure(stats, index, docs, e)
+            else:
+                with lock:
+                    self._record_success(stats, docs)
+
+    def index(self, docs):
+        stats = IndexerStats()
+        stats.start_time = time.time()
+        lock = threading.Lock()
+        batches = queue.Queue(maxsize=self.queue_size)
+        threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker,
+                                      args=(batches, stats, lock))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try:
+            for index, batch in enumerate(self.iter_batches(docs)):
+                batches.put((index, batch))
+        finally:
+            for thread in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+
+        if self.commit:
+            self.searcher.commit()
+
+        stats.end_time = time.time()
+        self._log_stats(stats)
+        return stats
+
+
+class AsyncIndexer(Indexer):
+    """Indexer for :class:`solar.searcher.AsyncSolrSearcher`.
+
+    Batches are sent by ``workers`` concurrent tasks instead of threads.
+
+    Usage::
+
+        indexer = searcher.indexer(batch_size=1000, workers=4)
+        stats = await indexer.index(doc for doc in iter_rows())
+    """
+    async def send_batch(self, docs):
+        return await self.searcher.solr.add(
+            docs, commit=False, commitWithin=self.commit_within)
+
+    async def _worker(self, batches, stats):
+        while True:
+            item = await batches.get()
+            if item is None:
+                return
+            index, docs = item
+            try:
+                docs = self.searcher.prepare_docs(docs)
+                await self.send_batch(docs)
+            except Exception as e:
+                self._record_failure(stats, index, docs, e)
+            else:
+                self._record_success(stats, docs)
+
+    async def index(self, docs):
+        stats = IndexerStats()
+        stats.start_time = time.time()
+        batches = asyncio.Queue(maxsize=self.queue_size)
+        workers = [asyncio.ensure_future(self._worker(batches, stats))
+                   for i in range(self.workers)]
+
+        try:
+            for index, batch in enumerate(self.iter_batches(docs)):
+                await batches.put((index, batch))
+        finally:
+            for worker in workers:
+                await batches.put(None)
+            await asyncio.gather(*workers)
+
+        if self.commit:
+            await self.searcher.commit()
+
+        stats.end_time = time.time()
+        self._log_stats(stats)
+        return stats
@@ -0,0 +1,181 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import math
+import threading
+import time
+from collections import deque
+
+
+# phases of a search request
+QUERY = 'query'
+PARAMS = 'params'
+URLENCODE = 'urlencode'
+HTTP = 'http'
+DECODE = 'decode'
+RESULTS = 'results'
+PROCESS = 'process'
+INSTANCES = 'instances'
+# lookups in result and instance caches
+CACHE = 'cache'
+
+PHASES = (QUERY, PARAMS, URLENCODE, HTTP, DECODE, RESULTS, PROCESS, INSTANCES,
+          CACHE)
+
+_hooks = ()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Hook(object):
+    """Receives notifications about instrumented phases.
+
+    ``info`` is a dict with phase details: ``bytes``, ``qtime``, ``hits``,
+    ``docs``, ``values`` etc. depending on the phase. When phase has nested
+    phases their total times are in ``info['phases']``.
+    """
+    def before(self, phase, info):
+        pass
+
+    def after(self, phase, elapsed, info):
+        pass
+
+
+def add_hook(hook):
+    """Registers hook for all phases, returns it so can be used as decorator."""
+    global _hooks
+    with _lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook):
+    global _hooks
+    with _lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+class _NullInfo(dict):
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullPhase(object):
+    info = _NullInfo()
+
+    def __enter__(self):
+        return self.info
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_null_phase = _NullPhase()
+
+
+class _Phase(object):
+    def __init__(self, name, hooks, info):
+        self.name = name
+        self.hooks = hooks
+        self.info = info
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        for hook in self.hooks:
+            hook.before(self.name, self.info)
+        self.start = time.time()
+        return self.info
+
+    def __exit__(self, exc_type, exc_value, tb):
+        elapsed = time.time() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            phases = stack[-1].info.setdefault('phases', {})
+            phases[self.name] = phases.get(self.name, 0.0) + elapsed
+        if exc_value is not None:
+            self.info['error'] = exc_value
+        for hook in self.hooks:
+            hook.after(self.name, elapsed, self.info)
+        return False
+
+
+def phase(name, **info):
+    """Context manager measuring a phase, yields dict for phase details.
+
+    Does nothing when there are no registered hooks.
+
+    Usage::
+
+        with phase(HTTP, url=url) as info:
+            resp = send()
+            info['bytes'] = len(resp.content)
+    """
+    hooks = _hooks
+    if not hooks:
+        return _null_phase
+    return _Phase(name, hooks, info)
+
+
+def is_enabled():
+    return bool(_hooks)
+
+
+class PhaseCollector(Hook):
+    """Hook collecting last ``max_samples`` timings of every phase.
+
+    Usage::
+
+        collector = add_hook(PhaseCollector())
+        ...
+        collector.percentiles('http')
+        # {'count': 1000, 'p50': 0.012, 'p95': 0.048, 'p99': 0.105}
+    """
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def after(self, phase, elapsed, info):
+        with self._lock:
+            samples = self._samples.get(phase)
+            if samples is None:
+                samples = self._samples[phase] = deque(maxlen=self.max_samples)
+                self._counts[phase] = 0
+            samples.append(elapsed)
+            self._counts[phase] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._counts = {}
+
+    def percentiles(self, phase, percents=(50, 95, 99)):
+        with self._lock:
+            samples = sorted(self._samples.get(phase, ()))
+            count = self._counts.get(phase, 0)
+        stats = {'count': count}
+        for p in percents:
+            stats['p{}'.format(p)] = percentile(samples, p)
+        return stats
+
+    def summary(self):
+        with self._lock:
+            phases = list(self._samples)
+        return dict((p, self.percentiles(p)) for p in phases)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(p / 100.0 * len(sorted_values)))
+    index = min(max(rank, 1), len(sorted_values)) - 1
+    return sorted_values[index]
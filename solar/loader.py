@@ -0,0 +1,89 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+from collections import OrderedDict
+
+from . import instrumentation
+from .instrumentation import phase
+
+
+class InstanceLoader(object):
+    """Loads instances for all components of a single response.
+
+    Components (results, facets, groupeds, stats facets) that share the same
+    mapper are resolved with one mapper call when any of them is asked for
+    instances. A component must implement:
+
+    * ``get_instance_mapper()`` - returns ``(mapper, db_query)`` or ``None``
+    * ``get_instance_ids()`` - returns list of ids to load
+    * ``set_instances(instances)`` - takes dict of loaded instances
+
+    Optional ``cache`` (see :class:`solar.cache.ResultCache`) keeps loaded
+    instances between requests. ``prepare`` is called before loading so
+    lazily processed components can fill their values. Mappers are called
+    with ``deadline`` (see :class:`solar.deadline.Deadline`) active.
+    """
+    def __init__(self, cache=None, prepare=None, deadline=None):
+        self.cache = cache
+        self.prepare = prepare
+        self.deadline = deadline
+        self._pending = OrderedDict()
+
+    def register(self, component):
+        mapper_key = component.get_instance_mapper()
+        if mapper_key is not None:
+            self._pending.setdefault(mapper_key, []).append(component)
+
+    def load(self, component):
+        mapper_key = component.get_instance_mapper()
+        if mapper_key is None:
+            component.set_instances({})
+            return
+
+        if self.prepare is not None:
+            self.prepare()
+        components = self._pending.pop(mapper_key, [])
+        if not any(c is component for c in components):
+            components.append(component)
+
+        ids = OrderedDict()
+        for c in components:
+            for id in c.get_instance_ids():
+                ids[id] = None
+        instances = self._load(mapper_key, list(ids))
+        for c in components:
+            c.set_instances(instances)
+
+    def _load(self, mapper_key, ids):
+        instances = {}
+        missing_ids = ids
+        if self.cache is not None:
+            with phase(instrumentation.CACHE, cache='instance') as info:
+                missing_ids = []
+                for id in ids:
+                    instance = self.cache.get((mapper_key, id))
+                    if instance is None:
+                        missing_ids.append(id)
+                    else:
+                        instances[id] = instance
+                info['hits'] = len(instances)
+                info['misses'] = len(missing_ids)
+
+        if missing_ids:
+            mapper, db_query = mapper_key
+            if self.deadline is not None:
+                self.deadline.check()
+                mapper = self.deadline.wrap(mapper)
+            with phase(instrumentation.INSTANCES, mapper=mapper_key[0]) as info:
+                if db_query is None:
+                    loaded = mapper(missing_ids)
+                else:
+                    loaded = mapper(missing_ids, db_query=db_query)
+                info['ids'] = len(missing_ids)
+                info['instances'] = len(loaded)
+            if self.cache is not None:
+                for id, instance in loaded.items():
+                    if instance is not None:
+                        self.cache.set((mapper_key, id), instance)
+            instances.update(loaded)
+        return instances
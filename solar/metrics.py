@@ -0,0 +1,278 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import threading
+
+from . import instrumentation
+from .instrumentation import Hook
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+HANDLERS = ('select', 'get', 'update', 'mlt', 'terms', 'admin')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return '{}'.format(int(value))
+    return repr(value)
+
+
+def _escape_help(value):
+    return '{}'.format(value).replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape(value):
+    return _escape_help(value).replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(name, _escape(value)) for name, value in labels))
+
+
+class Metric(object):
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError('{} expects labels: {}'.format(
+                self.name, ', '.join(self.labelnames)))
+        return tuple('{}'.format(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError()
+
+    def render(self):
+        lines = [
+            '# HELP {} {}'.format(self.name, _escape_help(self.documentation)),
+            '# TYPE {} {}'.format(self.name, self.type),
+        ]
+        for suffix, labels, value in self._samples():
+            lines.append('{}{}{} {}'.format(
+                self.name, suffix, _format_labels(labels), _format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield '', list(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    """Gauge which value is calculated by function on rendering."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), func=None):
+        super(Gauge, self).__init__(name, documentation, labelnames)
+        self.func = func
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self):
+        if self.func is not None:
+            items = sorted((self._key(labels), value)
+                           for labels, value in self.func())
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        for key, value in items:
+            yield '', list(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = data[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            data[1] += value
+            data[2] += 1
+
+    def get_count(self, **labels):
+        data = self._values.get(self._key(labels))
+        return data[2] if data else 0
+
+    def get_sum(self, **labels):
+        data = self._values.get(self._key(labels))
+        return data[1] if data else 0.0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(((key, (list(data[0]), data[1], data[2]))
+                            for key, data in self._values.items()),
+                           key=lambda item: item[0])
+        for key, (counts, total, count) in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield ('_bucket', labels + [('le', _format_value(float(bound)))],
+                       cumulative)
+            yield '_sum', labels, total
+            yield '_count', labels, count
+
+
+class MetricsRegistry(object):
+    """Collection of metrics rendered in Prometheus text format.
+
+    Usage::
+
+        registry = MetricsRegistry()
+        requests = registry.counter('app_requests_total', 'Requests.',
+                                    ['handler'])
+        requests.inc(handler='select')
+        registry.render()
+    """
+    def __init__(self):
+        self._metrics = []
+        self._names = {}
+
+    def register(self, metric):
+        if metric.name in self._names:
+            raise ValueError('Metric {} is already registered'.format(metric.name))
+        self._names[metric.name] = metric
+        self._metrics.append(metric)
+        return metric
+
+    def get(self, name):
+        return self._names.get(name)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), func=None):
+        return self.register(Gauge(name, documentation, labelnames, func=func))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=LATENCY_BUCKETS):
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self):
+        return ''.join(metric.render() + '\n' for metric in self._metrics)
+
+
+def get_handler(url):
+    """Returns name of Solr request handler from request url."""
+    path = url.split('?', 1)[0]
+    for segment in reversed(path.split('/')):
+        if segment in HANDLERS:
+            return segment
+    return 'other'
+
+
+class MetricsHook(Hook):
+    """Instrumentation hook that collects searcher traffic metrics.
+
+    Usage::
+
+        metrics = instrumentation.add_hook(MetricsHook())
+        ...
+        # in a /metrics view
+        return Response(metrics.registry.render(), content_type=CONTENT_TYPE)
+    """
+    def __init__(self, registry=None, prefix='solar'):
+        self.registry = registry = registry or MetricsRegistry()
+        self.requests = registry.counter(
+            '{}_requests_total'.format(prefix),
+            'Solr requests by handler and HTTP status.',
+            ['handler', 'status'])
+        self.request_duration = registry.histogram(
+            '{}_request_duration_seconds'.format(prefix),
+            'Client side time of Solr requests.',
+            ['handler'])
+        self.qtime = registry.histogram(
+            '{}_qtime_seconds'.format(prefix),
+            'Solr reported query time (QTime).',
+            ['handler'])
+        self.response_size = registry.histogram(
+            '{}_response_size_bytes'.format(prefix),
+            'Size of Solr responses.',
+            ['handler'], buckets=SIZE_BUCKETS)
+        self.query_duration = registry.histogram(
+            '{}_query_duration_seconds'.format(prefix),
+            'Time of searches including results processing.')
+        self.cache_requests = registry.counter(
+            '{}_cache_requests_total'.format(prefix),
+            'Cache lookups by cache and result.',
+            ['cache', 'result'])
+        self.cache_hit_ratio = registry.gauge(
+            '{}_cache_hit_ratio'.format(prefix),
+            'Ratio of cache hits to all lookups.',
+            ['cache'], func=self._cache_hit_ratios)
+
+    def _cache_hit_ratios(self):
+        hits = {}
+        totals = {}
+        for (cache, result), value in list(self.cache_requests._values.items()):
+            totals[cache] = totals.get(cache, 0) + value
+            if result == 'hit':
+                hits[cache] = hits.get(cache, 0) + value
+        return [({'cache': cache}, float(hits.get(cache, 0)) / total)
+                for cache, total in totals.items() if total]
+
+    def after(self, phase, elapsed, info):
+        if phase == instrumentation.HTTP:
+            handler = get_handler(info.get('url', ''))
+            status = info.get('status')
+            self.requests.inc(handler=handler,
+                              status=status if status is not None else 'error')
+            self.request_duration.observe(elapsed, handler=handler)
+            if info.get('bytes') is not None:
+                self.response_size.observe(info['bytes'], handler=handler)
+        elif phase == instrumentation.DECODE:
+            qtime = info.get('qtime')
+            if qtime is not None:
+                self.qtime.observe(qtime / 1000.0, handler='select')
+        elif phase == instrumentation.QUERY:
+            self.query_duration.observe(elapsed)
+        elif phase == instrumentation.CACHE:
+            cache = info.get('cache')
+            if info.get('hits'):
+                self.cache_requests.inc(info['hits'], cache=cache, result='hit')
+            if info.get('misses'):
+                self.cache_requests.inc(info['misses'], cache=cache, result='miss')
@@ -2,16 +2,26 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import ast
+import codecs
 import datetime
 import logging
 import os
 import re
+import threading
 import time
 # We can remove ExpatError when we drop support for Python 2.6:
 from xml.parsers.expat import ExpatError
 
 import requests
+from requests.adapters import HTTPAdapter
 import six
+
+from . import instrumentation
+from .instrumentation import phase
+from .deadline import get_current_deadline, get_timeout, is_limited_by_deadline
+from .exceptions import (
+    SolrError, SolrConnectionError, DeadlineExceeded, CircuitOpenError,
+    UNAVAILABLE_STATUS_CODES)
 from six import unichr
 from six.moves import zip
 
@@ -29,6 +39,13 @@ try:
 except ImportError:
     import json
 
+try:
+    # Only needed for AsyncSolr.
+    import asyncio
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 try:
     # Python 3.X
     from urllib.parse import urlencode
@@ -60,7 +77,7 @@ except NameError:
 
 
 __author__ = 'Daniel Lindsley, Joseph Kocherhans, Jacob Kaplan-Moss'
-__all__ = ['Solr']
+__all__ = ['Solr', 'AsyncSolr']
 __version__ = (3, 3, 0)
 
 
@@ -202,25 +219,27 @@ def is_valid_xml_char_ordinal(i):
         )
 
 
+# Complement of the chars accepted by ``is_valid_xml_char_ordinal``
+INVALID_XML_CHARS_RE = re.compile(
+    r'[^\x09\x0a\x0d\x20-\ud7ff\ue000-\ufffd\U00010000-\U0010ffff]')
+
+
 def clean_xml_string(s):
     """
     Cleans string from invalid xml chars
 
-    Solution was found there::
-
-    http://stackoverflow.com/questions/8733233/filtering-out-certain-bytes-in-python
+    Returns the string untouched when there is nothing to clean.
     """
-    return ''.join(c for c in s if is_valid_xml_char_ordinal(ord(c)))
-
-
-class SolrError(Exception):
-    pass
+    if INVALID_XML_CHARS_RE.search(s) is None:
+        return s
+    return INVALID_XML_CHARS_RE.sub('', s)
 
 
 class Results(object):
     def __init__(self, docs, hits, highlighting=None, facets=None,
                  facets_2=None, spellcheck=None, stats=None, qtime=None,
-                 debug=None, grouped=None, nextCursorMark=None):
+                 debug=None, grouped=None, nextCursorMark=None,
+                 partial_results=False):
         self.docs = docs
         self.hits = hits
         self.highlighting = highlighting or {}
@@ -229,6 +248,7 @@ class Results(object):
         self.spellcheck = spellcheck or {}
         self.stats = stats or {}
         self.qtime = qtime
+        self.partial_results = partial_results
         self.debug = debug or {}
         self.grouped = grouped or {}
         self.nextCursorMark = nextCursorMark or None
@@ -240,6 +260,291 @@ class Results(object):
         return iter(self.docs)
 
 
+def make_session(pool_connections=10, pool_maxsize=10, pool_block=False):
+    """
+    Creates ``requests.Session`` with configured connection pools.
+
+    ``pool_connections`` is the number of hosts which pools are kept,
+    ``pool_maxsize`` is the number of kept alive connections per host.
+    If ``pool_block`` is ``True`` requests wait for a free connection
+    instead of opening extra connections which are not reused.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def session_pool_stats(session):
+    """
+    Returns utilization of the session connection pools by host.
+    """
+    pools = {}
+    for prefix, adapter in session.adapters.items():
+        poolmanager = getattr(adapter, 'poolmanager', None)
+        if poolmanager is None:
+            continue
+        for key in list(poolmanager.pools.keys()):
+            pool = poolmanager.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            host = '{}://{}:{}'.format(pool.scheme, pool.host, pool.port)
+            idle = len([conn for conn in list(pool.pool.queue)
+                        if conn is not None])
+            pools[host] = {
+                'maxsize': pool.pool.maxsize,
+                'idle': idle,
+                'connections': pool.num_connections,
+                'requests': pool.num_requests,
+            }
+    return pools
+
+
+def get_results_kwargs(result):
+    """
+    Collects ``Results`` keyword arguments from a decoded Solr response.
+    """
+    result_kwargs = {}
+
+    if result.get('debug'):
+        result_kwargs['debug'] = result['debug']
+
+    if result.get('highlighting'):
+        result_kwargs['highlighting'] = result['highlighting']
+
+    if result.get('facet_counts'):
+        result_kwargs['facets'] = result['facet_counts']
+
+    if result.get("facets"):
+        result_kwargs["facets_2"] = result["facets"]
+
+    if result.get('spellcheck'):
+        result_kwargs['spellcheck'] = result['spellcheck']
+
+    if result.get('stats'):
+        result_kwargs['stats'] = result['stats']
+
+    if 'QTime' in result.get('responseHeader', {}):
+        result_kwargs['qtime'] = result['responseHeader']['QTime']
+
+    if result.get('responseHeader', {}).get('partialResults'):
+        result_kwargs['partial_results'] = True
+
+    if result.get('grouped'):
+        result_kwargs['grouped'] = result['grouped']
+
+    if result.get('nextCursorMark'):
+        result_kwargs['nextCursorMark'] = result['nextCursorMark']
+
+    return result_kwargs
+
+
+class JSONStreamReader(object):
+    """
+    Reads JSON values one by one from an iterable of unicode chunks.
+
+    Only the data needed to decode the current value is kept in memory.
+    """
+    WHITESPACE = ' \t\n\r'
+    NUMBER_CHARS = '0123456789.eE+-'
+
+    def __init__(self, chunks, decoder=None):
+        if isinstance(chunks, six.string_types):
+            chunks = [chunks]
+        self.chunks = iter(chunks)
+        self.decoder = decoder or json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size=0):
+        parts = [self.buf[self.pos:]]
+        size = len(parts[0])
+        while not self.eof and (size <= min_size or len(parts) == 1):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.eof = True
+            elif chunk:
+                parts.append(chunk)
+                size += len(chunk)
+        self.buf = ''.join(parts)
+        self.pos = 0
+        return size
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self.WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("Unexpected end of JSON stream")
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected '{}' at position {} of JSON stream".format(
+                char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+            else:
+                # numbers can be truncated at the end of the buffer
+                if (self.eof or isinstance(value, bool)
+                        or not isinstance(value, (int, float))
+                        or (end < len(self.buf)
+                            and self.buf[end] not in self.NUMBER_CHARS)):
+                    self.pos = end
+                    return value
+            # read at least as much data as we already have
+            # to avoid quadratic decoding of large values
+            self._fill(min_size=2 * (len(self.buf) - self.pos))
+
+    def members(self):
+        """Yields keys of an object, value must be read before next key."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError("Expected ',' or '}}' at position {} of JSON stream".format(
+                    self.pos - 1))
+
+    def items(self):
+        """Yields elements of an array."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError("Expected ',' or ']' at position {} of JSON stream".format(
+                    self.pos - 1))
+
+
+class StreamingResults(Results):
+    """
+    Results that decode documents while the response is being read.
+
+    Iterating over results yields documents as they arrive without keeping
+    them. Other sections (facets, stats, grouped and so on) are collected
+    and accessing them reads the rest of the response, documents that were
+    not iterated yet are kept in ``docs`` in that case.
+    """
+    SECTIONS = ('highlighting', 'facets', 'facets_2', 'spellcheck', 'stats',
+                'qtime', 'debug', 'grouped', 'nextCursorMark',
+                'partial_results')
+
+    _DOCS_START = object()
+
+    def __init__(self, chunks, decoder=None):
+        self._reader = JSONStreamReader(chunks, decoder)
+        self._result = {}
+        self._response = {}
+        self._docs = None
+        self._streamed = False
+        self._finished = False
+        self._full = None
+        self._events = self._parse()
+        # read everything before the documents
+        if next(self._events, None) is None:
+            self._docs = []
+
+    def _parse(self):
+        reader = self._reader
+        for key in reader.members():
+            if key == 'response' and reader.peek() == '{':
+                for response_key in reader.members():
+                    if response_key == 'docs':
+                        yield self._DOCS_START
+                        for doc in reader.items():
+                            yield doc
+                    else:
+                        self._response[response_key] = reader.value()
+            else:
+                self._result[key] = reader.value()
+        self._finished = True
+
+    def _finish(self):
+        if self._full is None:
+            # documents that were not iterated yet are kept
+            docs = list(self._events)
+            if self._docs is None:
+                self._docs = docs
+            self._full = Results(
+                [], self._response.get('numFound', 0),
+                **get_results_kwargs(self._result)
+            )
+        return self._full
+
+    def __getattr__(self, name):
+        if name in self.SECTIONS:
+            return getattr(self._finish(), name)
+        raise AttributeError(name)
+
+    def _stream(self):
+        for doc in self._events:
+            yield doc
+        # the rest of documents was read by _finish
+        docs = self._docs or []
+        for doc in docs:
+            yield doc
+        del docs[:]
+
+    def __iter__(self):
+        if self._streamed:
+            raise SolrError("Documents have already been consumed")
+        if self._docs is not None:
+            return iter(self._docs)
+        self._streamed = True
+        return self._stream()
+
+    def __len__(self):
+        # does not read the response while documents are streamed
+        if self._docs is None and self._streamed:
+            return 0
+        return len(self.docs)
+
+    @property
+    def docs(self):
+        """Documents that were not iterated yet."""
+        if self._docs is None:
+            if self._streamed:
+                self._finish()
+            else:
+                self._docs = list(self._events)
+        return self._docs
+
+    @property
+    def hits(self):
+        if 'numFound' not in self._response:
+            self._finish()
+        return self._response.get('numFound', 0)
+
+
 class Solr(object):
     """
     The main object for working with Solr.
@@ -250,20 +555,104 @@ class Solr(object):
     Optionally accepts ``timeout`` for wait seconds until giving up on a
     request. Default is ``60`` seconds.
 
+    Optionally accepts ``stream_results``. If ``True`` search responses are
+    decoded incrementally while they are read, see ``StreamingResults``.
+    Default is ``False``.
+
+    Optionally accepts ``update_format`` for the format of documents sent
+    by ``add``, ``'xml'`` or ``'json'``. Default is ``'xml'``.
+
+    Optionally accepts ``pool_connections``, ``pool_maxsize`` and
+    ``pool_block`` to configure keep-alive connection pools, see
+    :func:`make_session`. Set ``pool_maxsize`` not less than the number of
+    threads sending requests. A ``requests.Session`` can be passed as
+    ``session`` to share connections with other clients.
+
+    Optionally accepts ``retry_policy`` to retry searches and real-time gets
+    failed with connection errors and ``circuit_breaker`` to fail fast
+    while the server is down, see :mod:`solar.retry`.
+
     Usage::
 
         solr = pysolr.Solr('http://localhost:8983/solr')
         # With a 10 second timeout.
         solr = pysolr.Solr('http://localhost:8983/solr', timeout=10)
+        # Up to 32 connections, wait for a free one when all are busy
+        solr = pysolr.Solr('http://localhost:8983/solr',
+                           pool_maxsize=32, pool_block=True)
+        # Retry failed searches, stop connecting after 5 failures in a row
+        solr = pysolr.Solr('http://localhost:8983/solr',
+                           retry_policy=RetryPolicy(max_attempts=3),
+                           circuit_breaker=CircuitBreaker(failure_threshold=5))
 
     """
-    def __init__(self, url, decoder=None, timeout=60):
+    stream_chunk_size = 64 * 1024
+
+    def __init__(self, url, decoder=None, timeout=60, stream_results=False,
+                 update_format='xml', session=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, retry_policy=None,
+                 circuit_breaker=None):
+        self._init_client(url, decoder, timeout, stream_results,
+                          update_format, retry_policy, circuit_breaker)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        if session is None:
+            session = make_session(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        self.session = session
+        self.session.stream = False
+
+    def _init_client(self, url, decoder, timeout, stream_results,
+                     update_format, retry_policy, circuit_breaker):
+        # state shared with AsyncSolr which has its own session
         self.decoder = decoder or json.JSONDecoder()
         self.url = url
         self.timeout = timeout
+        self.stream_results = stream_results
+        self.update_format = update_format
         self.log = self._get_log()
-        self.session = requests.Session()
-        self.session.stream = False
+        self._in_flight = 0
+        self._requests_count = 0
+        self._in_flight_lock = threading.Lock()
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+
+    def _acquire(self):
+        with self._in_flight_lock:
+            self._in_flight += 1
+            self._requests_count += 1
+
+    def _release(self):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def pool_stats(self):
+        """
+        Returns connection pool utilization.
+
+        ``in_flight`` is the number of requests which responses are not
+        read yet, ``pools`` contains connection pool stats by host.
+        """
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'pool_block': self.pool_block,
+            'in_flight': self._in_flight,
+            'requests': self._requests_count,
+            'pools': session_pool_stats(self.session),
+        }
+
+    def retry_stats(self):
+        """
+        Returns counters of the retry policy and the circuit breaker state.
+        """
+        return {
+            'retry': self.retry_policy.stats() if self.retry_policy else None,
+            'circuit_breaker': (self.circuit_breaker.stats()
+                                if self.circuit_breaker else None),
+        }
 
     def _get_log(self):
         return LOG
@@ -275,8 +664,60 @@ class Solr(object):
         # No path? No problem.
         return self.url
 
-    def _send_request(self, method, path='', body=None, headers=None, files=None):
-        url = self._create_full_url(path)
+    def _send_request(self, method, path='', body=None, headers=None, files=None, stream=False):
+        policy = self.retry_policy
+        if policy is None or not policy.is_retryable(method, path):
+            return self._send_attempt(method, path, body=body, headers=headers,
+                                      files=files, stream=stream)
+        attempt = 1
+        while True:
+            try:
+                return self._send_attempt(method, path, body=body,
+                                          headers=headers, files=files,
+                                          stream=stream)
+            except CircuitOpenError:
+                raise
+            except SolrConnectionError as e:
+                delay = policy.next_delay(attempt)
+                if delay is None:
+                    raise
+                self.log.warning("Retrying '%s' in %0.3f seconds: %s",
+                                 path, delay, e)
+                policy.sleep(delay)
+                attempt += 1
+
+    def _check_circuit_breaker(self):
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(
+                "Circuit breaker of '%s' is open" % self.url)
+
+    def _record_attempt(self, error=None):
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return
+        if isinstance(error, SolrConnectionError):
+            breaker.record_failure()
+        elif isinstance(error, DeadlineExceeded):
+            # request was not sent
+            breaker.release()
+        else:
+            # server responded, so it is alive
+            breaker.record_success()
+
+    def _send_attempt(self, method, path='', body=None, headers=None, files=None, stream=False):
+        self._check_circuit_breaker()
+        try:
+            response = self._send_url_request(
+                self._create_full_url(path), method, body=body,
+                headers=headers, files=files, stream=stream)
+        except Exception as e:
+            self._record_attempt(e)
+            raise
+        self._record_attempt()
+        return response
+
+    def _send_url_request(self, url, method, body=None, headers=None, files=None, stream=False):
         method = method.lower()
         log_body = body
 
@@ -285,6 +726,8 @@ class Solr(object):
 
         if log_body is None:
             log_body = ''
+        elif isinstance(log_body, bytes):
+            log_body = force_unicode(log_body[:10])
         elif not isinstance(log_body, str):
             log_body = repr(body)
 
@@ -304,22 +747,36 @@ class Solr(object):
         if bytes_body is not None:
             bytes_body = force_bytes(body)
 
+        timeout = get_timeout(self.timeout)
+        resp = None
+        self._acquire()
         try:
-            resp = requests_method(url, data=bytes_body, headers=headers, files=files,
-                                   timeout=self.timeout)
+            with phase(instrumentation.HTTP, url=url, method=method) as info:
+                resp = requests_method(url, data=bytes_body, headers=headers, files=files,
+                                       timeout=timeout, stream=stream)
+                info['status'] = resp.status_code
+                if not stream:
+                    info['bytes'] = len(resp.content)
         except requests.exceptions.Timeout as err:
+            if is_limited_by_deadline(timeout, self.timeout):
+                raise DeadlineExceeded(
+                    "Deadline exceeded waiting for '%s': %s" % (url, err))
             error_message = "Connection to server '%s' timed out: %s"
             self.log.error(error_message, url, err, exc_info=True)
-            raise SolrError(error_message % (url, err))
+            raise SolrConnectionError(error_message % (url, err))
         except requests.exceptions.ConnectionError as err:
             error_message = "Failed to connect to server at '%s', are you sure that URL is correct? Checking it in a browser might help: %s"
             params = (url, err)
             self.log.error(error_message, *params, exc_info=True)
-            raise SolrError(error_message % params)
+            raise SolrConnectionError(error_message % params)
         except HTTPException as err:
             error_message = "Unhandled error: %s %s: %s"
             self.log.error(error_message, method, url, err, exc_info=True)
-            raise SolrError(error_message % (method, url, err))
+            raise SolrConnectionError(error_message % (method, url, err))
+        finally:
+            # streamed responses hold the connection until they are read
+            if resp is None or not stream:
+                self._release()
 
         end_time = time.time()
         self.log.info("Finished '%s' (%s) with body '%s' in %0.3f seconds.",
@@ -329,26 +786,53 @@ class Solr(object):
             error_message = self._extract_error(resp)
             self.log.error(error_message, extra={'data': {'headers': resp.headers,
                                                           'response': resp.content}})
+            if stream:
+                resp.close()
+                self._release()
+            if int(resp.status_code) in UNAVAILABLE_STATUS_CODES:
+                raise SolrConnectionError(error_message)
             raise SolrError(error_message)
 
+        if stream:
+            return self._iter_content(resp)
         return force_unicode(resp.content)
 
-    def _select(self, params):
+    def _iter_content(self, resp):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            for chunk in resp.iter_content(chunk_size=self.stream_chunk_size):
+                yield decoder.decode(chunk)
+            yield decoder.decode(b'', final=True)
+        finally:
+            resp.close()
+            self._release()
+
+    def _select(self, params, stream=False):
         # specify json encoding of results
         params['wt'] = 'json'
-        params_encoded = safe_urlencode(params, True)
+        deadline = get_current_deadline()
+        if deadline is not None:
+            # let Solr stop searching and return partial results in time
+            time_allowed = int(deadline.remaining() * 1000)
+            if params.get('timeAllowed') is not None:
+                time_allowed = min(time_allowed, int(params['timeAllowed']))
+            params['timeAllowed'] = max(time_allowed, 1)
+        with phase(instrumentation.URLENCODE) as info:
+            params_encoded = safe_urlencode(params, True)
+            info['bytes'] = len(params_encoded)
 
         if len(params_encoded) < 1024:
             # Typical case.
             path = 'select/?%s' % params_encoded
-            return self._send_request('get', path)
+            return self._send_request('get', path, stream=stream)
         else:
             # Handles very long queries by submitting as a POST.
             path = 'select/'
             headers = {
                 'Content-type': 'application/x-www-form-urlencoded; charset=utf-8',
             }
-            return self._send_request('post', path, body=params_encoded, headers=headers)
+            return self._send_request('post', path, body=params_encoded, headers=headers,
+                                      stream=stream)
 
     def _get(self, params):
         params['wt'] = 'json'
@@ -367,10 +851,11 @@ class Solr(object):
         path = 'terms/?%s' % safe_urlencode(params, True)
         return self._send_request('get', path)
 
-    def _update(self, message, clean_ctrl_chars=True, commit=True, softCommit=False, waitFlush=None, waitSearcher=None):
+    def _update(self, message, clean_ctrl_chars=True, commit=True, softCommit=False, waitFlush=None, waitSearcher=None,
+                commitWithin=None, content_type='text/xml; charset=utf-8'):
         """
-        Posts the given xml message to http://<self.url>/update and
-        returns the result.
+        Posts the given xml (or ``content_type``) message to
+        http://<self.url>/update and returns the result.
 
         Passing `sanitize` as False will prevent the message from being cleaned
         of control characters (default True). This is done by default because
@@ -395,6 +880,9 @@ class Solr(object):
         if waitSearcher is not None:
             query_vars.append('waitSearcher=%s' % str(bool(waitSearcher)).lower())
 
+        if commitWithin:
+            query_vars.append('commitWithin=%s' % commitWithin)
+
         if query_vars:
             path = '%s?%s' % (path, '&'.join(query_vars))
 
@@ -402,25 +890,28 @@ class Solr(object):
         if clean_ctrl_chars:
             message = sanitize(message)
 
-        return self._send_request('post', path, message, {'Content-type': 'text/xml; charset=utf-8'})
+        return self._send_request('post', path, message, {'Content-type': content_type})
 
     def _extract_error(self, resp):
         """
         Extract the actual error message from a solr response.
         """
-        reason = resp.headers.get('reason', None)
+        return self._extract_error_message(resp.headers, resp.content)
+
+    def _extract_error_message(self, headers, content):
+        reason = headers.get('reason', None)
         full_response = None
 
         if reason is None:
             try:
                 # if response is in json format
-                reason = resp.json()['error']['msg']
-            except KeyError:
+                reason = json.loads(force_unicode(content))['error']['msg']
+            except (KeyError, TypeError):
                 # if json response has unexpected structure
-                full_response = resp.content
+                full_response = content
             except ValueError:
                 # otherwise we assume it's html
-                reason, full_html = self._scrape_response(resp.headers, resp.content)
+                reason, full_html = self._scrape_response(headers, content)
                 full_response = unescape_html(full_html)
 
         msg = "[Reason: %s]" % reason
@@ -514,6 +1005,12 @@ class Solr(object):
         Converts python values to a form suitable for insertion into the xml
         we send to solr.
         """
+        return clean_xml_string(self._convert_from_python(value))
+
+    def _convert_from_python(self, value):
+        """
+        Converts python values to strings that solr understands.
+        """
         if hasattr(value, 'strftime'):
             if hasattr(value, 'hour'):
                 value = "%sZ" % value.isoformat()
@@ -536,7 +1033,7 @@ class Solr(object):
 
             value = "{0}".format(value)
 
-        return clean_xml_string(value)
+        return value
 
     def _to_python(self, value):
         """
@@ -636,38 +1133,42 @@ class Solr(object):
         """
         params = {'q': q}
         params.update(kwargs)
+        if self.stream_results:
+            response = self._select(params, stream=True)
+            return StreamingResults(response, self.decoder)
         response = self._select(params)
+        return self._search_results(response)
 
-        # TODO: make result retrieval lazy and allow custom result objects
-        result = self.decoder.decode(response)
-        result_kwargs = {}
-
-        if result.get('debug'):
-            result_kwargs['debug'] = result['debug']
-
-        if result.get('highlighting'):
-            result_kwargs['highlighting'] = result['highlighting']
-
-        if result.get('facet_counts'):
-            result_kwargs['facets'] = result['facet_counts']
-
-        if result.get("facets"):
-            result_kwargs["facets_2"] = result["facets"]
-
-        if result.get('spellcheck'):
-            result_kwargs['spellcheck'] = result['spellcheck']
+    def search_raw(self, q, **kwargs):
+        """
+        Performs a search and returns decoded Solr response.
 
-        if result.get('stats'):
-            result_kwargs['stats'] = result['stats']
+        ``search_raw`` together with ``results_from_raw`` is the same as
+        ``search``. Decoded responses contain only builtin types so they
+        can be cached and turned into results many times.
+        """
+        params = {'q': q}
+        params.update(kwargs)
+        return self._decode_search_response(self._select(params))
 
-        if 'QTime' in result.get('responseHeader', {}):
-            result_kwargs['qtime'] = result['responseHeader']['QTime']
+    def _decode_search_response(self, response):
+        with phase(instrumentation.DECODE) as info:
+            result = self.decoder.decode(response)
+            if instrumentation.is_enabled():
+                info['bytes'] = len(response)
+                info['qtime'] = (result.get('responseHeader') or {}).get('QTime')
+                info['hits'] = (result.get('response') or {}).get('numFound')
+        return result
 
-        if result.get('grouped'):
-            result_kwargs['grouped'] = result['grouped']
+    def _search_results(self, response):
+        return self.results_from_raw(self._decode_search_response(response))
 
-        if result.get('nextCursorMark'):
-            result_kwargs['nextCursorMark'] = result['nextCursorMark']
+    def results_from_raw(self, result):
+        """
+        Creates ``Results`` from a decoded search response.
+        """
+        # TODO: allow custom result objects
+        result_kwargs = get_results_kwargs(result)
 
         response = result.get('response') or {}
         numFound = response.get('numFound', 0)
@@ -698,10 +1199,12 @@ class Solr(object):
             params = {'ids': ids}
         params.update(kwargs)
         response = self._get(params)
+        return self._get_results(response, single=id is not None)
 
+    def _get_results(self, response, single=False):
         result = self.decoder.decode(response)
 
-        if id is not None:
+        if single:
             docs = list([_f for _f in [result.get('doc')] if _f])
             numFound = len(docs)
         else:
@@ -727,7 +1230,9 @@ class Solr(object):
         }
         params.update(kwargs)
         response = self._mlt(params)
+        return self._mlt_results(response)
 
+    def _mlt_results(self, response):
         result = self.decoder.decode(response)
 
         if result['response'] is None:
@@ -754,6 +1259,9 @@ class Solr(object):
         }
         params.update(kwargs)
         response = self._suggest_terms(params)
+        return self._suggest_terms_results(response)
+
+    def _suggest_terms_results(self, response):
         result = self.decoder.decode(response)
         terms = result.get("terms", {})
         res = {}
@@ -810,6 +1318,57 @@ class Solr(object):
 
         return doc_elem
 
+    def _build_json_doc(self, doc, boost=None, fieldUpdates=None):
+        json_doc = {}
+
+        for key, value in doc.items():
+            if key == 'boost':
+                continue
+
+            if isinstance(value, (list, tuple)):
+                field_value = [self._convert_from_python(bit)
+                               for bit in value if not self._is_null_value(bit)]
+                if not field_value:
+                    continue
+            elif self._is_null_value(value):
+                continue
+            else:
+                field_value = self._convert_from_python(value)
+
+            if fieldUpdates and key in fieldUpdates:
+                field_value = {fieldUpdates[key]: field_value}
+            elif boost and key in boost:
+                field_value = {'boost': float(boost[key]), 'value': field_value}
+
+            json_doc[key] = field_value
+
+        return json_doc
+
+    def _build_json_message(self, docs, boost=None, fieldUpdates=None):
+        """
+        Builds JSON update message as bytes.
+
+        Documents are sent as ``[...]`` array. If any document has a boost
+        ``{"add": {...}, "add": {...}}`` commands are used instead as arrays
+        cannot hold document boosts.
+        """
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        docs = list(docs)
+
+        if any('boost' in doc for doc in docs):
+            commands = []
+            for doc in docs:
+                command = {'doc': self._build_json_doc(doc, boost=boost, fieldUpdates=fieldUpdates)}
+                if 'boost' in doc:
+                    command['boost'] = float(doc['boost'])
+                commands.append('"add":%s' % dumps(command))
+            m = '{%s}' % ','.join(commands)
+        else:
+            m = dumps([self._build_json_doc(doc, boost=boost, fieldUpdates=fieldUpdates)
+                       for doc in docs])
+
+        return force_bytes(m), len(docs)
+
     def add(self, docs, boost=None, fieldUpdates=None, commit=True, softCommit=False, commitWithin=None, waitFlush=None, waitSearcher=None):
         """
         Adds or updates documents.
@@ -831,6 +1390,9 @@ class Solr(object):
 
         Optionally accepts ``waitSearcher``. Default is ``None``.
 
+        Documents are sent as XML unless ``update_format`` of the instance
+        is ``'json'``.
+
         Usage::
 
             solr.add([
@@ -846,10 +1408,19 @@ class Solr(object):
         """
         start_time = time.time()
         self.log.debug("Starting to build add request...")
+
+        if self.update_format == 'json':
+            m, ndocs = self._build_json_message(docs, boost=boost, fieldUpdates=fieldUpdates)
+            end_time = time.time()
+            self.log.debug("Built add request of %s docs in %0.2f seconds.", ndocs, end_time - start_time)
+            return self._update(m, clean_ctrl_chars=False, commit=commit, softCommit=softCommit,
+                                waitFlush=waitFlush, waitSearcher=waitSearcher, commitWithin=commitWithin,
+                                content_type='application/json; charset=utf-8')
+
         message = ET.Element('add')
 
         if commitWithin:
-            message.set('commitWithin', commitWithin)
+            message.set('commitWithin', force_unicode(commitWithin))
 
         for doc in docs:
             message.append(self._build_doc(doc, boost=boost, fieldUpdates=fieldUpdates))
@@ -965,16 +1536,7 @@ class Solr(object):
             :metadata:
                         key:value pairs of text strings
         """
-        if not hasattr(file_obj, "name"):
-            raise ValueError("extract() requires file-like objects which have a defined name property")
-
-        params = {
-            "extractOnly": "true" if extractOnly else "false",
-            "lowernames": "true",
-            "wt": "json",
-        }
-        params.update(kwargs)
-
+        params = self._extract_params(file_obj, extractOnly, kwargs)
         try:
             # We'll provide the file using its true name as Tika may use that
             # as a file type hint:
@@ -985,7 +1547,21 @@ class Solr(object):
             self.log.error("Failed to extract document metadata: %s", err,
                            exc_info=True)
             raise
+        return self._extract_results(resp, file_obj)
+
+    def _extract_params(self, file_obj, extractOnly, kwargs):
+        if not hasattr(file_obj, "name"):
+            raise ValueError("extract() requires file-like objects which have a defined name property")
 
+        params = {
+            "extractOnly": "true" if extractOnly else "false",
+            "lowernames": "true",
+            "wt": "json",
+        }
+        params.update(kwargs)
+        return params
+
+    def _extract_results(self, resp, file_obj):
         try:
             data = json.loads(resp)
         except ValueError as err:
@@ -1007,6 +1583,228 @@ class Solr(object):
         return data
 
 
+class AsyncSolr(Solr):
+    """
+    Asynchronous version of :class:`Solr` built on top of ``aiohttp``.
+
+    Accepts the same arguments as :class:`Solr` and additionally an
+    ``aiohttp.ClientSession`` instance as ``session``. If it is not passed
+    the session is created on the first request and can be closed with
+    :meth:`close`.
+
+    All API methods return awaitables, the results are the same as
+    :class:`Solr` ones. ``retry_policy`` and ``circuit_breaker`` work
+    the same way, retries wait with ``asyncio.sleep``.
+
+    Usage::
+
+        solr = pysolr.AsyncSolr('http://localhost:8983/solr')
+        results = await solr.search('*:*')
+        await solr.close()
+
+    """
+    def __init__(self, url, decoder=None, timeout=60, update_format='xml',
+                 session=None, retry_policy=None, circuit_breaker=None):
+        self._init_client(url, decoder, timeout, False, update_format,
+                          retry_policy, circuit_breaker)
+        self.session = session
+
+    def pool_stats(self):
+        """
+        Returns connection pool utilization.
+
+        ``pool_maxsize`` is the connection limit of the aiohttp connector,
+        ``None`` until the session is created.
+        """
+        connector = getattr(self.session, 'connector', None)
+        return {
+            'pool_maxsize': connector.limit if connector else None,
+            'pool_maxsize_per_host': (connector.limit_per_host
+                                      if connector else None),
+            'in_flight': self._in_flight,
+            'requests': self._requests_count,
+        }
+
+    def _get_session(self):
+        if self.session is None:
+            if aiohttp is None:
+                raise ImportError("AsyncSolr requires aiohttp to be installed")
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _send_request(self, method, path='', body=None, headers=None, files=None, stream=False):
+        # responses are always read at once, ``stream`` is accepted for
+        # compatibility with Solr._select
+        policy = self.retry_policy
+        if policy is None or not policy.is_retryable(method, path):
+            return await self._send_attempt(method, path, body=body,
+                                            headers=headers, files=files)
+        attempt = 1
+        while True:
+            try:
+                return await self._send_attempt(method, path, body=body,
+                                                headers=headers, files=files)
+            except CircuitOpenError:
+                raise
+            except SolrConnectionError as e:
+                delay = policy.next_delay(attempt)
+                if delay is None:
+                    raise
+                self.log.warning("Retrying '%s' in %0.3f seconds: %s",
+                                 path, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _send_attempt(self, method, path='', body=None, headers=None, files=None):
+        self._check_circuit_breaker()
+        try:
+            response = await self._send_url_request(
+                self._create_full_url(path), method, body=body,
+                headers=headers, files=files)
+        except Exception as e:
+            self._record_attempt(e)
+            raise
+        self._record_attempt()
+        return response
+
+    async def _send_url_request(self, url, method, body=None, headers=None, files=None):
+        method = method.lower()
+        log_body = body
+
+        if headers is None:
+            headers = {}
+
+        if log_body is None:
+            log_body = ''
+        elif isinstance(log_body, bytes):
+            log_body = force_unicode(log_body[:10])
+        elif not isinstance(log_body, str):
+            log_body = repr(body)
+
+        self.log.debug("Starting request to '%s' (%s) with body '%s'...",
+                       url, method, log_body[:10])
+        start_time = time.time()
+
+        bytes_body = body
+
+        if files is not None:
+            # multipart form with the body fields like requests sends it
+            bytes_body = aiohttp.FormData()
+            for name, value in (body or {}).items():
+                bytes_body.add_field(name, force_unicode(value))
+            for name, (filename, file_obj) in files.items():
+                bytes_body.add_field(name, file_obj, filename=filename)
+        elif bytes_body is not None:
+            bytes_body = force_bytes(body)
+
+        timeout = get_timeout(self.timeout)
+        session = self._get_session()
+        self._acquire()
+        try:
+            with phase(instrumentation.HTTP, url=url, method=method) as info:
+                async with session.request(
+                        method, url, data=bytes_body, headers=headers,
+                        timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                    status = resp.status
+                    resp_headers = resp.headers
+                    content = await resp.read()
+                info['status'] = status
+                info['bytes'] = len(content)
+        except asyncio.TimeoutError as err:
+            if is_limited_by_deadline(timeout, self.timeout):
+                raise DeadlineExceeded(
+                    "Deadline exceeded waiting for '%s': %s" % (url, err))
+            error_message = "Connection to server '%s' timed out: %s"
+            self.log.error(error_message, url, err, exc_info=True)
+            raise SolrConnectionError(error_message % (url, err))
+        except aiohttp.ClientConnectionError as err:
+            error_message = "Failed to connect to server at '%s', are you sure that URL is correct? Checking it in a browser might help: %s"
+            params = (url, err)
+            self.log.error(error_message, *params, exc_info=True)
+            raise SolrConnectionError(error_message % params)
+        except aiohttp.ClientError as err:
+            error_message = "Unhandled error: %s %s: %s"
+            self.log.error(error_message, method, url, err, exc_info=True)
+            raise SolrConnectionError(error_message % (method, url, err))
+        finally:
+            self._release()
+
+        end_time = time.time()
+        self.log.info("Finished '%s' (%s) with body '%s' in %0.3f seconds.",
+                      url, method, log_body[:10], end_time - start_time)
+
+        if int(status) != 200:
+            error_message = self._extract_error_message(resp_headers, content)
+            self.log.error(error_message, extra={'data': {'headers': resp_headers,
+                                                          'response': content}})
+            if int(status) in UNAVAILABLE_STATUS_CODES:
+                raise SolrConnectionError(error_message)
+            raise SolrError(error_message)
+
+        return force_unicode(content)
+
+    # API Methods ############################################################
+
+    async def search(self, q, **kwargs):
+        params = {'q': q}
+        params.update(kwargs)
+        response = await self._select(params)
+        return self._search_results(response)
+
+    async def search_raw(self, q, **kwargs):
+        params = {'q': q}
+        params.update(kwargs)
+        return self._decode_search_response(await self._select(params))
+
+    async def get(self, id=None, ids=None, **kwargs):
+        if id is None and ids is None:
+            raise ValueError('You must specify "id" or "ids".')
+        elif id is not None and ids is not None:
+            raise ValueError('You many only specify "id" OR "ids", not both.')
+        elif id is not None:
+            params = {'id': id}
+        elif ids is not None:
+            params = {'ids': ids}
+        params.update(kwargs)
+        response = await self._get(params)
+        return self._get_results(response, single=id is not None)
+
+    async def more_like_this(self, q, mltfl, **kwargs):
+        params = {
+            'q': q,
+            'mlt.fl': mltfl,
+        }
+        params.update(kwargs)
+        response = await self._mlt(params)
+        return self._mlt_results(response)
+
+    async def suggest_terms(self, fields, prefix, **kwargs):
+        params = {
+            'terms.fl': fields,
+            'terms.prefix': prefix,
+        }
+        params.update(kwargs)
+        response = await self._suggest_terms(params)
+        return self._suggest_terms_results(response)
+
+    async def extract(self, file_obj, extractOnly=True, **kwargs):
+        params = self._extract_params(file_obj, extractOnly, kwargs)
+        try:
+            resp = await self._send_request(
+                'post', 'update/extract', body=params,
+                files={'file': (file_obj.name, file_obj)})
+        except (IOError, SolrError) as err:
+            self.log.error("Failed to extract document metadata: %s", err,
+                           exc_info=True)
+            raise
+        return self._extract_results(resp, file_obj)
+
+
 class SolrCoreAdmin(object):
     """
     Handles core admin operations: see http://wiki.apache.org/solr/CoreAdmin
@@ -1020,13 +1818,18 @@ class SolrCoreAdmin(object):
        6. SWAP
        7. UNLOAD
        8. LOAD (not currently implemented)
+
+    Optionally accepts ``session`` to reuse connections of
+    :class:`Solr` instance: ``SolrCoreAdmin(url, session=solr.session)``.
     """
     def __init__(self, url, *args, **kwargs):
+        session = kwargs.pop('session', None)
         super(SolrCoreAdmin, self).__init__(*args, **kwargs)
         self.url = url
+        self.session = session or make_session()
 
     def _get_url(self, url, params={}, headers={}):
-        resp = requests.get(url, params=safe_urlencode(params), headers=headers)
+        resp = self.session.get(url, params=safe_urlencode(params), headers=headers)
         return force_unicode(resp.content)
 
     def status(self, core=None, **params):
@@ -1124,14 +1927,19 @@ class SolrSchemaAdmin(object):
           * List UniqueKey (not implemented yet)
           * Show Global Similarity (not implemented yet)
           * Get the Default Query Operator (not implemented yet)
+
+    Optionally accepts ``session`` to reuse connections of
+    :class:`Solr` instance: ``SolrSchemaAdmin(url, session=solr.session)``.
     """
     def __init__(self, url, *args, **kwargs):
+        session = kwargs.pop('session', None)
         super(SolrSchemaAdmin, self).__init__(*args, **kwargs)
         self.url = url
         self.decoder = json.JSONDecoder()
+        self.session = session or make_session()
 
     def _get_url(self, url, params={}, headers={}):
-        resp = requests.get(url, params=safe_urlencode(params), headers=headers)
+        resp = self.session.get(url, params=safe_urlencode(params), headers=headers)
         return force_unicode(resp.content)
 
     def list_fields(self, collection, fieldname=None, **params):
@@ -1179,10 +1987,18 @@ REPLACEMENTS = (
     (b'\x1f', b''), # Unit separator
 )
 
-def sanitize(data):
-    fixed_string = force_bytes(data)
+# All replacements are deletions so a single ``bytes.translate`` pass is enough
+CONTROL_CHARS = b''.join(bad for bad, good in REPLACEMENTS)
 
-    for bad, good in REPLACEMENTS:
-        fixed_string = fixed_string.replace(bad, good)
 
-    return force_unicode(fixed_string)
+def sanitize(data):
+    """
+    Removes control characters listed in ``REPLACEMENTS``.
+
+    Unicode strings without control characters are returned untouched.
+    """
+    data_bytes = force_bytes(data)
+    fixed_bytes = data_bytes.translate(None, CONTROL_CHARS)
+    if len(fixed_bytes) == len(data_bytes) and isinstance(data, six.text_type):
+        return data
+    return force_unicode(fixed_bytes)
@@ -3,24 +3,61 @@ from __future__ import unicode_literals
 from __future__ import absolute_import
 import re
 import sys
+import asyncio
 import logging
 from itertools import chain, starmap
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 from .pysolr import SolrError
 
 from .compat import PY2, force_unicode, implements_to_string, reraise
 from .result import SolrResults
+from .loader import InstanceLoader
+from .template import substitute
+from .deadline import Deadline, get_current_deadline
+from . import instrumentation
+from .instrumentation import phase
 from .stats import Stats
 from .facets import FacetField, FacetRange, FacetQuery, FacetPivot
 from .grouped import GroupedField, GroupedQuery, GroupedFunc
 from .util import SafeUnicode, safe_solr_input, X, LocalParams, make_fq, make_q
-from .util import _pop_from_kwargs
+from .util import _pop_from_kwargs, split_top_level
 
 
 log = logging.getLogger(__name__)
 
 
+class _NullContext(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_null_context = _NullContext()
+
+
+def format_query(q, params):
+    """Formats readable query string, private params are skipped."""
+    def simple_quote(s):
+        return force_unicode(s) \
+            .replace('%', '%25') \
+            .replace('&', '%26') \
+            .replace('+', '%2B')
+
+    parts = ['q={}'.format(simple_quote(q))]
+    for p, v in params.items():
+        if p.startswith('_'):
+            continue
+        if not isinstance(v, (list, tuple)):
+            v = [v]
+        for w in v:
+            parts.append('{}={}'.format(simple_quote(p), simple_quote(w)))
+    return '&'.join(parts)
+
+
 def _with_clone(fn):
     @wraps(fn)
     def wrapper(self, *args, **kwargs):
@@ -36,6 +73,32 @@ def clone_all(values):
     return [v.clone() for v in values]
 
 
+class _CopyOnWrite(object):
+    """Query attribute shared by clones until one of them accesses it.
+
+    The value is stored in the instance ``__dict__`` under the same name.
+    On the first access a query gets its own copy, so code that only reads
+    the value should use :meth:`SolrQuery._peek` to avoid copying.
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        d = obj.__dict__
+        value = d[self.name]
+        owned = d['_owned_attrs']
+        if self.name not in owned:
+            value = d[self.name] = value.copy()
+            owned.add(self.name)
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+        obj.__dict__['_owned_attrs'].add(self.name)
+
+
 class SolrParameterSetter(object):
     def __init__(self, solr_query, param_name):
         self.solr_query = solr_query
@@ -52,7 +115,19 @@ class SolrParameterSetter(object):
 
 @implements_to_string
 class SolrQuery(object):
+    _fq = _CopyOnWrite('_fq')
+    _groupeds = _CopyOnWrite('_groupeds')
+    _facet_fields = _CopyOnWrite('_facet_fields')
+    _facet_queries = _CopyOnWrite('_facet_queries')
+    _facet_dates = _CopyOnWrite('_facet_dates')
+    _facet_ranges = _CopyOnWrite('_facet_ranges')
+    _facet_pivots = _CopyOnWrite('_facet_pivots')
+    _stats_fields = _CopyOnWrite('_stats_fields')
+    _params = _CopyOnWrite('_params')
+
     def __init__(self, searcher, q, *args, **kwargs):
+        # names of copy-on-write attributes that are not shared with clones
+        self._owned_attrs = set()
         self.searcher = searcher
 
         self._q_local_params = LocalParams(kwargs.pop('_local_params', {}))
@@ -74,37 +149,26 @@ class SolrQuery(object):
         self._db_query = None
 
         self._iter_instances = False
+        self._use_cache = True
+        self._deadline = None
+
+        # rendered values of placeholders, see solar.template
+        self._bound_values = None
+        # q and params rendered by a query template
+        self._prepared = None
 
         self._result_cache = None
 
     def __str__(self):
-        def simple_quote(s):
-            return force_unicode(s) \
-                .replace('%', '%25') \
-                .replace('&', '%26') \
-                .replace('+', '%2B')
-        
-        params = []
-        params.append(('q', self._make_q()))
-        params.extend(list(self._prepare_params().items()))
-        parts = []
-        for p, v in params:
-            if not isinstance(v, (list, tuple)):
-                v = [v]
-            for w in v:
-                parts.append('{}={}'.format(simple_quote(p), simple_quote(w)))
-        return '&'.join(parts)
+        q, prepared_params = self._render()
+        return format_query(q, prepared_params)
 
     def __len__(self):
         results = self._fetch_results()
         return len(results)
 
     def __iter__(self):
-        results = self._fetch_results()
-        if self._iter_instances:
-            return iter(doc.instance for doc in results if doc.instance)
-        else:
-            return iter(results)
+        return self._iter_results(self._fetch_results())
 
     def __getitem__(self, k):
         if not isinstance(k, (slice, int)):
@@ -138,13 +202,23 @@ class SolrQuery(object):
             raise AttributeError
         return SolrParameterSetter(self, attr_name.replace('_', '.'))
 
+    def _iter_results(self, results):
+        if self._iter_instances:
+            return iter(doc.instance for doc in results if doc.instance)
+        else:
+            return iter(results)
+
     def _fetch_results(self, only_count=False):
         if self._result_cache is None:
             self._result_cache = self._do_search(only_count)
         return self._result_cache
 
+    def _peek(self, name):
+        """Returns copy-on-write attribute without copying, do not modify it."""
+        return self.__dict__[name]
+
     def _prepare_params(self, only_count=False):
-        params = self._params.copy()
+        params = self._peek('_params').copy()
         self._modify_params(params, only_count=only_count)
         prepared_params = {}
         for key, val in params.items():
@@ -169,9 +243,10 @@ class SolrQuery(object):
         
         if only_count:
             params['rows'] = 0
-        if self._fq:
+        fq = self._peek('_fq')
+        if fq:
             params['fq'] = [make_fq(x, local_params)
-                            for x, local_params in self._fq]
+                            for x, local_params in fq]
         if 'qf' in params:
             params['qf'] = ' '.join(
                 starmap('{}^{}'.format,
@@ -179,58 +254,119 @@ class SolrQuery(object):
         if 'fl' not in params:
             params['fl'] = ('*', 'score')
 
-        for grouped in self._groupeds:
+        for grouped in self._peek('_groupeds'):
             params = merge_params(params, grouped.get_params())
 
-        for facet in chain(self._facet_fields, self._facet_queries,
-                           self._facet_dates, self._facet_ranges,
-                           self._facet_pivots):
+        for facet in chain(self._peek('_facet_fields'),
+                           self._peek('_facet_queries'),
+                           self._peek('_facet_dates'),
+                           self._peek('_facet_ranges'),
+                           self._peek('_facet_pivots')):
             params = merge_params(params, facet.get_params())
 
-        for stats in self._stats_fields:
+        for stats in self._peek('_stats_fields'):
             params = merge_params(params, stats.get_params())
 
     def _make_q(self):
         return make_q(self._q, self._q_local_params, *self._q_args, **self._q_kwargs)
 
-    def _do_search(self, only_count=False):
+    def _cursor_sort(self):
+        sort = self._peek('_params').get('sort')
+        if not sort:
+            fields = ['score desc']
+        elif isinstance(sort, (list, tuple)):
+            fields = list(sort)
+        else:
+            fields = [f.strip() for f in split_top_level(force_unicode(sort))]
+        unique_field = self.searcher.unique_field
+        if not any(f.split()[0] == unique_field for f in fields if f):
+            fields.append('{} asc'.format(unique_field))
+        return tuple(fields)
+
+    def _cursor_clone(self, batch_size):
+        clone = self._clone()
+        clone._params.pop('start', None)
+        clone._params['rows'] = batch_size
+        clone._params['sort'] = clone._cursor_sort()
+        return clone
+
+    def _next_cursor_mark(self, results, cursor_mark, batch_size):
+        next_cursor_mark = results.raw_results.nextCursorMark
+        if (len(results.docs) < batch_size or
+                not next_cursor_mark or next_cursor_mark == cursor_mark):
+            return None
+        return next_cursor_mark
+
+    def _prepare_select_params(self, only_count=False):
         params = self._prepare_params(only_count=only_count)
-        raw_results = self.searcher.select(self._make_q(), **params)
-
-        facet_fields = clone_all(self._facet_fields)
-        facet_queries = clone_all(self._facet_queries)
-        facet_dates = clone_all(self._facet_dates)
-        facet_ranges = clone_all(self._facet_ranges)
-        facet_pivots = clone_all(self._facet_pivots)
-        stats_fields = clone_all(self._stats_fields)
-        groupeds = clone_all(self._groupeds)
-
-        mapper_registry = {}
-        for facet in chain(facet_fields, facet_pivots):
-            facet.set_mapper_registry(mapper_registry)
-
-        return SolrResults(raw_results, self, self._document_cls,
-                           self._instance_mapper, self._db_query,
-                           facet_fields, facet_queries, facet_dates, facet_ranges,
-                           facet_pivots, stats_fields, groupeds)
+        if not self._use_cache:
+            params['_cache'] = False
+        return params
+
+    def _render(self, only_count=False):
+        if self._prepared is not None and not only_count:
+            q, params = self._prepared
+            return q, dict(params)
+        with phase(instrumentation.PARAMS):
+            q = self._make_q()
+            params = self._prepare_select_params(only_count=only_count)
+            if self._bound_values is not None:
+                q = substitute(q, self._bound_values)
+                params = dict((k, substitute(v, self._bound_values))
+                              for k, v in params.items())
+        return q, params
+
+    def _activate_deadline(self):
+        if self._deadline is None:
+            return _null_context
+        return self._deadline.activate()
+
+    def _do_search(self, only_count=False):
+        with self._activate_deadline(), \
+                phase(instrumentation.QUERY, query=self) as info:
+            q, params = self._render(only_count=only_count)
+            info['q'] = q
+            info['params'] = params
+            raw_results = self.searcher.select(q, **params)
+            results = self._make_results(raw_results)
+            info['hits'] = results.hits
+            if instrumentation.is_enabled():
+                info['qtime'] = raw_results.qtime
+        return results
+
+    def _make_results(self, raw_results):
+        facet_fields = clone_all(self._peek('_facet_fields'))
+        facet_queries = clone_all(self._peek('_facet_queries'))
+        facet_dates = clone_all(self._peek('_facet_dates'))
+        facet_ranges = clone_all(self._peek('_facet_ranges'))
+        facet_pivots = clone_all(self._peek('_facet_pivots'))
+        stats_fields = clone_all(self._peek('_stats_fields'))
+        groupeds = clone_all(self._peek('_groupeds'))
+
+        with phase(instrumentation.RESULTS) as info:
+            instance_loader = InstanceLoader(cache=self.searcher.instance_cache,
+                                             deadline=get_current_deadline())
+            for component in chain(facet_fields, facet_pivots, stats_fields, groupeds):
+                component.set_instance_loader(instance_loader)
+
+            results = SolrResults(raw_results, self, self._document_cls,
+                                  self._instance_mapper, self._db_query,
+                                  facet_fields, facet_queries, facet_dates,
+                                  facet_ranges, facet_pivots, stats_fields,
+                                  groupeds, instance_loader=instance_loader)
+            info['hits'] = results.hits
+            info['docs'] = len(results.docs)
+        return results
             
     def _clone(self, cls=None):
         cls = cls or self.__class__
-        clone = cls(self.searcher, self._q, *self._q_args, **self._q_kwargs)
-        clone._q_local_params = self._q_local_params
-        clone._fq = list(self._fq)
-        clone._groupeds = list(self._groupeds)
-        clone._facet_fields = list(self._facet_fields)
-        clone._facet_queries = list(self._facet_queries)
-        clone._facet_ranges = list(self._facet_ranges)
-        clone._facet_dates = list(self._facet_dates)
-        clone._facet_pivots = list(self._facet_pivots)
-        clone._stats_fields = list(self._stats_fields)
-        clone._params = self._params.copy()
-        clone._document_cls = self._document_cls
-        clone._instance_mapper = self._instance_mapper
-        clone._db_query = self._db_query
-        clone._iter_instances = self._iter_instances
+        clone = cls.__new__(cls)
+        clone.__dict__.update(self.__dict__)
+        # lists and params are shared now and copied on access
+        self._owned_attrs = set()
+        clone._owned_attrs = set()
+        clone._result_cache = None
+        clone._prepared = None
         return clone
 
     @_with_clone
@@ -266,6 +402,51 @@ class SolrQuery(object):
     def all(self):
         return list(self.results)
 
+    def iterate(self, batch_size=1000, prefetch=True):
+        """Iterates over all matched documents using Solr cursors.
+
+        Documents are fetched by ``batch_size`` rows using ``cursorMark``
+        so deep paging does not become slower. Unique field is added
+        to the sort as a tiebreaker if it is missing. If ``prefetch`` is
+        ``True`` the next batch is requested in a background thread while
+        the current one is processed.
+
+        Usage::
+
+            for doc in searcher.search().filter(status=0).iterate(500):
+                reindex(doc)
+        """
+        clone = self._cursor_clone(batch_size)
+
+        def fetch(cursor_mark):
+            return clone.set_param('cursorMark', cursor_mark)._fetch_results()
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            cursor_mark = '*'
+            results = fetch(cursor_mark)
+            while True:
+                next_cursor_mark = clone._next_cursor_mark(
+                    results, cursor_mark, batch_size)
+                future = None
+                if next_cursor_mark and executor:
+                    deadline = get_current_deadline()
+                    future = executor.submit(
+                        deadline.wrap(fetch) if deadline else fetch,
+                        next_cursor_mark)
+                for item in clone._iter_results(results):
+                    yield item
+                if not next_cursor_mark:
+                    break
+                cursor_mark = next_cursor_mark
+                if future:
+                    results = future.result()
+                else:
+                    results = fetch(cursor_mark)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
     def count(self):
         return self._clone()._fetch_results(only_count=True).ndocs
 
@@ -284,6 +465,22 @@ class SolrQuery(object):
         local_params = LocalParams(_pop_from_kwargs(kwargs, 'local_params'))
         self._fq.append((~X(*args, **kwargs), local_params))
 
+    @_with_clone
+    def cache(self, enabled=True):
+        """Turns on/off searcher's result cache for this query."""
+        self._use_cache = enabled
+
+    @_with_clone
+    def deadline(self, deadline):
+        """Limits time of the search and instance mapping.
+
+        Accepts :class:`Deadline` or number of seconds. Clones share the same
+        deadline so sub-queries made from results spend the same budget.
+        """
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        self._deadline = deadline
+
     @_with_clone
     def instance_mapper(self, instance_mapper):
         self._instance_mapper = instance_mapper
@@ -502,9 +699,10 @@ class SolrQuery(object):
         self._groupeds.append(grouped)
 
     @_with_clone
-    def stats(self, field, facet_fields=None):
+    def stats(self, field, facet_fields=None, local_params={}, **kwargs):
+        local_params = kwargs.pop('_local_params', local_params)
         self._stats_fields.append(
-            Stats(field, facet_fields=facet_fields)
+            Stats(field, facet_fields=facet_fields, local_params=local_params)
         )
         self._params['stats'] = True
 
@@ -538,3 +736,92 @@ class SolrQuery(object):
         clone = self.filter(*args, **kwargs).limit(1)
         if len(clone):
             return clone[0]
+
+
+class AsyncSolrQuery(SolrQuery):
+    """Query that is executed by an asynchronous searcher.
+
+    Results must be fetched with ``await query.results`` or
+    ``async for doc in query``. After that the query can be used
+    as a usual one.
+
+    Usage::
+
+        q = searcher.search('test').filter(status=0)
+        results = await q.results
+        async for doc in q.limit(10):
+            print(doc.id)
+    """
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        results = await self._async_fetch_results()
+        for item in self._iter_results(results):
+            yield item
+
+    def _fetch_results(self, only_count=False):
+        if self._result_cache is None:
+            raise RuntimeError(
+                "Results are not fetched yet, use 'await query.results'")
+        return self._result_cache
+
+    async def _async_fetch_results(self, only_count=False):
+        if self._result_cache is None:
+            self._result_cache = await self._async_do_search(only_count)
+        return self._result_cache
+
+    async def _async_do_search(self, only_count=False):
+        with self._activate_deadline():
+            q, params = self._render(only_count=only_count)
+            raw_results = await self.searcher.select(q, **params)
+            return self._make_results(raw_results)
+
+    # Public methods
+
+    @property
+    def results(self):
+        return self._async_fetch_results()
+
+    async def all(self):
+        return list(await self.results)
+
+    async def count(self):
+        results = await self._clone()._async_fetch_results(only_count=True)
+        return results.ndocs
+
+    async def iterate(self, batch_size=1000, prefetch=True):
+        clone = self._cursor_clone(batch_size)
+
+        def fetch(cursor_mark):
+            return clone.set_param('cursorMark', cursor_mark)._async_fetch_results()
+
+        cursor_mark = '*'
+        results = await fetch(cursor_mark)
+        while True:
+            next_cursor_mark = clone._next_cursor_mark(
+                results, cursor_mark, batch_size)
+            task = None
+            if next_cursor_mark and prefetch:
+                task = asyncio.ensure_future(fetch(next_cursor_mark))
+            try:
+                for item in clone._iter_results(results):
+                    yield item
+            except BaseException:
+                if task:
+                    task.cancel()
+                raise
+            if not next_cursor_mark:
+                break
+            cursor_mark = next_cursor_mark
+            if task:
+                results = await task
+            else:
+                results = await fetch(cursor_mark)
+
+    async def get(self, *args, **kwargs):
+        clone = self.filter(*args, **kwargs).limit(1)
+        results = await clone.results
+        if len(results):
+            return clone[0]
@@ -3,12 +3,12 @@ from __future__ import unicode_literals
 from __future__ import absolute_import
 import math
 import weakref
-from copy import deepcopy
 from itertools import starmap
 from functools import partial
 from collections import defaultdict
 
-from .util import X, LocalParams, make_fq, process_value, wrap_list, _pop_from_kwargs
+from .util import X, LocalParams, LookupIndex, make_fq, process_value, wrap_list
+from .util import _pop_from_kwargs
 from .types import instantiate, Integer, Long, Float 
 from .facets import FacetValue
 from .compat import PY2, force_unicode, zip_longest
@@ -230,6 +230,14 @@ class QueryFilter(object):
 
     def process_results(self, results):
         self._results = results
+        subqueries = []
+        for f in self.filters:
+            subquery = f.make_subquery(results, self._params.get(f.name, []))
+            if subquery is not None:
+                subqueries.append(subquery)
+        # sub-queries are independent so send them all at once
+        if subqueries:
+            results.searcher.execute_many(subqueries)
         for f in self.filters:
             f.process_results(self._results, self._params.get(f.name, []))
 
@@ -252,6 +260,14 @@ class BaseFilter(object):
     def get_types(self):
         return [self.type]
 
+    def make_subquery(self, results, params):
+        """Returns query which results are needed to process main results.
+
+        :class:`QueryFilter` runs sub-queries of all filters concurrently
+        before calling :meth:`process_results`.
+        """
+        return None
+
     def process_results(self, results, params):
         raise NotImplementedError()
 
@@ -397,6 +413,7 @@ class FacetFilter(Filter):
         self.values = []
         self.selected_values = []
         self.all_values = []
+        self._all_values_index = LookupIndex('value')
 
     def add_value(self, fv):
         self.all_values.append(fv)
@@ -406,9 +423,7 @@ class FacetFilter(Filter):
             self.values.append(fv)
 
     def get_value(self, value):
-        for filter_value in self.all_values:
-            if filter_value.value == value:
-                return filter_value
+        return self._all_values_index.lookup(self.all_values, value)
 
     def apply(self, query, params):
         query = super(FacetFilter, self).apply(query, params)
@@ -683,10 +698,15 @@ class RangeFilter(Filter):
     allowed_operators = ['gte', 'lte']
 
     def __init__(self, name, field=None, type=None,
-                 gather_stats=False, exclude_filter=True, **kwargs):
+                 gather_stats=False, exclude_filter=True,
+                 stats_subquery=False, **kwargs):
         super(RangeFilter, self).__init__(name, field, type=type, **kwargs)
         self.gather_stats = gather_stats
         self.exclude_filter = exclude_filter
+        # use separate query instead of {!ex} local param,
+        # for example when filter is not tagged by other filters
+        self.stats_subquery = stats_subquery
+        self.stats_query = None
         self.from_value = None
         self.to_value = None
         self.stats = None
@@ -701,18 +721,36 @@ class RangeFilter(Filter):
                 self.to_value = v[0]
 
         query = super(RangeFilter, self).apply(query, params)
-        if self.gather_stats and not self.exclude_filter:
-            query = query.stats(self.field)
+        if self.gather_stats:
+            if not self.exclude_filter:
+                query = query.stats(self.field)
+            elif not self.stats_subquery:
+                local_params = LocalParams()
+                local_params['key'] = self.name
+                local_params.merge({'ex': self.name})
+                query = query.stats(self.field, _local_params=local_params)
         return query
 
+    def make_subquery(self, results, params):
+        self.stats_query = None
+        if self.gather_stats and self.exclude_filter and self.stats_subquery:
+            stats_query = results.searcher.search(results.query._q) \
+                                         .deadline(results.query._deadline)
+            stats_query._fq = [
+                (x, local_params) for x, local_params in results.query._fq
+                if self.name not in wrap_list(local_params.get('tag'))]
+            self.stats_query = stats_query.stats(self.field).limit(0)
+        return self.stats_query
+
     def process_results(self, results, params):
         if self.gather_stats:
-            if self.exclude_filter:
-                stats_query = results.searcher.search(results.query._q)
-                stats_query._fq = deepcopy(results.query._fq)
-                stats_query = stats_query.stats(self.field).limit(0)
+            if self.exclude_filter and self.stats_subquery:
+                if self.stats_query is None:
+                    self.make_subquery(results, params)
                 self.process_stats(
-                    stats_query.results.get_stats_field(self.field))
+                    self.stats_query.results.get_stats_field(self.field))
+            elif self.exclude_filter:
+                self.process_stats(results.get_stats_field(self.name))
             else:
                 self.process_stats(results.get_stats_field(self.field))
 
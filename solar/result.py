@@ -1,47 +1,137 @@
 from __future__ import absolute_import
-from itertools import chain
 
-from .util import LocalParams, X, make_fq
+from .util import LocalParams, X, LookupIndex, make_fq
 from .compat import force_unicode
+from .pysolr import StreamingResults
+from .loader import InstanceLoader
+from .document import FieldIndex
+from . import instrumentation
+from .instrumentation import phase
+
+
+class LazyDocuments(list):
+    """List of documents that wraps raw documents on first access.
+
+    Length, indexing and iteration wrap only the requested documents, other
+    list operations wrap all of them first.
+    """
+    def __init__(self, raw_docs, make_doc):
+        list.__init__(self)
+        self._raw_docs = raw_docs
+        self._docs = [None] * len(raw_docs)
+        self._make_doc = make_doc
+        self._materialized = False
+
+    def _materialize(self):
+        if not self._materialized:
+            list.extend(self, [self._get(i) for i in range(len(self._docs))])
+            self._materialized = True
+            self._raw_docs = None
+
+    def __len__(self):
+        if self._materialized:
+            return list.__len__(self)
+        return len(self._docs)
+
+    def _get(self, i):
+        doc = self._docs[i]
+        if doc is None:
+            doc = self._docs[i] = self._make_doc(self._raw_docs[i])
+        return doc
+
+    def __getitem__(self, index):
+        if self._materialized:
+            return list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('documents index out of range')
+        return self._get(index)
+
+    def __iter__(self):
+        if self._materialized:
+            return list.__iter__(self)
+        return self._iter_lazy()
+
+    def _iter_lazy(self):
+        for i in range(len(self._docs)):
+            yield self._get(i)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        self._materialize()
+        return list.__add__(other, self)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _materializing(name):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        for arg in args:
+            if isinstance(arg, LazyDocuments):
+                arg._materialize()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'reverse',
+              'sort', 'clear', 'copy', 'index', 'count', '__contains__',
+              '__reversed__', '__setitem__', '__delitem__', '__add__',
+              '__iadd__', '__mul__', '__rmul__', '__imul__', '__eq__',
+              '__ne__', '__lt__', '__le__', '__gt__', '__ge__'):
+    setattr(LazyDocuments, _name, _materializing(_name))
+del _name
 
 
 class SolrResults(object):
     def __init__(self, raw_results, query, document_cls, instance_mapper, db_query,
                  facet_fields, facet_queries, facet_dates, facet_ranges,
-                 facet_pivots, stats_fields, groupeds):
+                 facet_pivots, stats_fields, groupeds, instance_loader=None):
         self.raw_results = raw_results
         self.ndocs = self.hits = self.raw_results.hits
-        self.docs = []
         self.query = query
         self.searcher = query.searcher
         self.document_cls = document_cls
         self.instance_mapper = instance_mapper
         self.db_query = db_query
-        self.facet_fields = facet_fields
-        self.facet_queries = facet_queries
-        self.facet_dates = facet_dates
-        self.facet_ranges = facet_ranges
-        self.facet_pivots = facet_pivots
-        self.stats_fields = stats_fields
-        self.groupeds = groupeds
-
-        for facet in chain(self.facet_fields, self.facet_queries,
-                           self.facet_dates, self.facet_ranges,
-                           self.facet_pivots):
-            facet.process_data(self)
-        
-        for grouped in self.groupeds:
-            grouped.process_data(self)
+        self._facet_fields = facet_fields
+        self._facet_queries = facet_queries
+        self._facet_dates = facet_dates
+        self._facet_ranges = facet_ranges
+        self._facet_pivots = facet_pivots
+        self._stats_fields = stats_fields
+        self._groupeds = groupeds
+        # ids of components whose process_data was called
+        self._processed = set()
+        self._facet_fields_index = LookupIndex('key')
+        self._facet_queries_index = LookupIndex('key')
+        self._facet_ranges_index = LookupIndex('key')
+        self._facet_pivots_index = LookupIndex('key')
+        self._stats_fields_index = LookupIndex('key')
+        self._groupeds_index = LookupIndex('key')
+        self.field_index = FieldIndex()
+        self.instance_loader = instance_loader or InstanceLoader()
+        self.instance_loader.prepare = self._process_all
+        self.instance_loader.register(self)
 
-        for stats in self.stats_fields:
-            stats.process_data(self)
-        
-        for raw_doc in self.raw_results.docs:
-            doc = self.document_cls(_results=self, **raw_doc)
-            self.docs.append(doc)
+        if isinstance(self.raw_results, StreamingResults):
+            # documents go first so streaming results do not keep raw documents
+            self.docs = [self._make_doc(raw_doc) for raw_doc in self.raw_results]
+        else:
+            self.docs = LazyDocuments(self.raw_results.docs, self._make_doc)
 
         self.highlighted = self.raw_results.highlighting
         self.debug_info = self.raw_results.debug
+        # Solr stopped searching because of timeAllowed
+        self.partial_results = self.raw_results.partial_results
 
     def __bool__(self):
         return True
@@ -52,48 +142,91 @@ class SolrResults(object):
 
     def __iter__(self):
         return iter(self.docs)
-    
+
+    def _make_doc(self, raw_doc):
+        return self.document_cls(_results=self, **raw_doc)
+
+    def _process(self, component):
+        if id(component) not in self._processed:
+            self._processed.add(id(component))
+            with phase(instrumentation.PROCESS,
+                       component=component.__class__.__name__) as info:
+                component.process_data(self)
+                info['key'] = getattr(component, 'key', None)
+                info['values'] = len(getattr(component, 'values', ()))
+        return component
+
+    def _process_many(self, components):
+        for component in components:
+            self._process(component)
+        return components
+
+    def _process_all(self):
+        for components in (self._facet_fields, self._facet_queries,
+                           self._facet_dates, self._facet_ranges,
+                           self._facet_pivots, self._groupeds,
+                           self._stats_fields):
+            self._process_many(components)
+
+    @property
+    def facet_fields(self):
+        return self._process_many(self._facet_fields)
+
+    @property
+    def facet_queries(self):
+        return self._process_many(self._facet_queries)
+
+    @property
+    def facet_dates(self):
+        return self._process_many(self._facet_dates)
+
+    @property
+    def facet_ranges(self):
+        return self._process_many(self._facet_ranges)
+
+    @property
+    def facet_pivots(self):
+        return self._process_many(self._facet_pivots)
+
+    @property
+    def stats_fields(self):
+        return self._process_many(self._stats_fields)
+
+    @property
+    def groupeds(self):
+        return self._process_many(self._groupeds)
+
+    def _lookup(self, index, components, key):
+        component = index.lookup(components, key)
+        if component is not None:
+            return self._process(component)
+
     def get_grouped(self, key):
         if isinstance(key, X):
             key = make_fq(key)
         key = force_unicode(key)
-        for grouped in self.groupeds:
-            if grouped.key == key:
-                return grouped
+        return self._lookup(self._groupeds_index, self._groupeds, key)
 
     def get_stats_field(self, field):
-        for st in self.stats_fields:
-            if st.field == field:
-                return st
-        
+        return self._lookup(self._stats_fields_index, self._stats_fields, field)
+
     def get_facet_field(self, key):
-        for facet in self.facet_fields:
-            if facet.key == key:
-                return facet
+        return self._lookup(self._facet_fields_index, self._facet_fields, key)
 
     def get_facet_range(self, key):
-        for facet in self.facet_ranges:
-            if facet.key == key:
-                return facet
+        return self._lookup(self._facet_ranges_index, self._facet_ranges, key)
 
     def get_facet_query(self, key_or_x, local_params={}):
         if isinstance(key_or_x, X):
             key = make_fq(key_or_x, LocalParams(local_params))
         else:
             key = key_or_x
-        for facet in self.facet_queries:
-            if facet.key == key:
-                return facet
+        return self._lookup(self._facet_queries_index, self._facet_queries, key)
 
     def get_facet_pivot(self, key):
-        for facet in self.facet_pivots:
-            if facet.key == key:
-                return facet
-
-    def _populate_instances(self):
-        if not self.instance_mapper:
-            return
+        return self._lookup(self._facet_pivots_index, self._facet_pivots, key)
 
+    def _all_docs(self):
         all_docs = []
         for doc in self.docs:
             all_docs.append(doc)
@@ -103,13 +236,22 @@ class SolrResults(object):
                     all_docs.append(doc)
             for doc in grouped.docs:
                 all_docs.append(doc)
+        return all_docs
 
-        ids = [doc.id for doc in all_docs]
-        instances = self.instance_mapper(ids, db_query=self.db_query)
+    def get_instance_mapper(self):
+        if self.instance_mapper:
+            return (self.instance_mapper, self.db_query)
 
-        for doc in all_docs:
+    def get_instance_ids(self):
+        return [doc.id for doc in self._all_docs()]
+
+    def set_instances(self, instances):
+        for doc in self._all_docs():
             doc._instance = instances.get(doc.id)
 
+    def _populate_instances(self):
+        self.instance_loader.load(self)
+
     @property
     def instances(self):
         return [doc.instance for doc in self if doc.instance]
@@ -0,0 +1,159 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import random
+import threading
+import time
+
+from .deadline import get_current_deadline
+
+
+class RetryPolicy(object):
+    """Retries idempotent requests failed with connection errors.
+
+    Delay before the n-th retry is a random value between 0 and
+    ``min(max_backoff, backoff * multiplier ** (n - 1))`` ("full jitter"),
+    or exactly that value when ``jitter`` is ``False``. Retries stop when
+    the active :class:`solar.deadline.Deadline` has no time for the delay.
+
+    Usage::
+
+        solr = Solr('http://localhost:8983/solr/core',
+                    retry_policy=RetryPolicy(max_attempts=3, backoff=0.1))
+    """
+    handlers = ('select', 'get', 'mlt', 'terms')
+
+    def __init__(self, max_attempts=3, backoff=0.05, max_backoff=1.0,
+                 multiplier=2.0, jitter=True, handlers=None,
+                 _sleep=time.sleep, _random=random.random):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        if handlers is not None:
+            self.handlers = tuple(handlers)
+        self._sleep = _sleep
+        self._random = _random
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def is_retryable(self, method, path):
+        handler = path.lstrip('/').split('?', 1)[0].split('/', 1)[0]
+        return handler in self.handlers
+
+    def get_delay(self, retry):
+        delay = min(self.max_backoff,
+                    self.backoff * self.multiplier ** (retry - 1))
+        if self.jitter:
+            delay *= self._random()
+        return delay
+
+    def next_delay(self, attempt):
+        """Returns delay before the next attempt or ``None`` to give up."""
+        delay = self.get_delay(attempt)
+        deadline = get_current_deadline()
+        with self._lock:
+            if (attempt >= self.max_attempts or
+                    (deadline is not None and deadline.remaining() <= delay)):
+                self.exhausted += 1
+                return None
+            self.retries += 1
+        return delay
+
+    def sleep(self, delay):
+        self._sleep(delay)
+
+    def stats(self):
+        return {
+            'max_attempts': self.max_attempts,
+            'retries': self.retries,
+            'exhausted': self.exhausted,
+        }
+
+
+class CircuitBreaker(object):
+    """Fails fast when a node is down.
+
+    After ``failure_threshold`` consecutive connection failures the breaker
+    opens and requests are rejected without connecting. When
+    ``reset_timeout`` seconds pass a single probe request is let through
+    (half-open state); its success closes the breaker, a failure opens it
+    again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 _clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = _clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self.rejected = 0
+        self._probing = False
+
+    def copy(self):
+        return self.__class__(self.failure_threshold, self.reset_timeout,
+                              _clock=self._clock)
+
+    def _reset_timeout_passed(self):
+        return self._clock() - self.opened_at >= self.reset_timeout
+
+    def available(self):
+        """Checks if request would be allowed without changing the state."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                return self._reset_timeout_passed()
+            return not self._probing
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self._reset_timeout_passed():
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """Lets another probe through when request was not sent."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if (self.state == self.HALF_OPEN or
+                    self.failures >= self.failure_threshold):
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'open_count': self.open_count,
+                'rejected': self.rejected,
+            }
@@ -2,16 +2,27 @@ from __future__ import unicode_literals
 
 from __future__ import absolute_import
 import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from .compat import text_type, with_metaclass
-from .pysolr import Solr
-from .query import SolrQuery
+from .pysolr import Solr, AsyncSolr
+from .query import SolrQuery, AsyncSolrQuery
 from .util import SafeUnicode, X, make_q
 from .grouped import Group
 from .document import Document
+from .indexer import Indexer, AsyncIndexer
+from .template import QueryTemplate
+from .deadline import get_current_deadline
+from . import instrumentation
+from .instrumentation import phase
 from six.moves import map
 
 
+def is_partial(raw_result):
+    return bool((raw_result.get('responseHeader') or {}).get('partialResults'))
+
+
 class SolrSearcherMeta(type):
     def __new__(mcs, name, bases, dct):
         cls = type.__new__(mcs, name, bases, dct)
@@ -32,17 +43,30 @@ class SolrSearcher(with_metaclass(SolrSearcherMeta, object)):
     db_field = 'id'
     db_field_type = int
 
+    solr_cls = Solr
     query_cls = SolrQuery
     group_cls = Group
     document_cls = Document
+    indexer_cls = Indexer
+
+    max_concurrent_queries = 8
+
+    result_cache = None
+    instance_cache = None
 
     def __init__(self, solr_url=None, solr=None, model=None, session=None, db_field=None,
-                 query_cls=None, group_cls=None, document_cls=None):
+                 query_cls=None, group_cls=None, document_cls=None, result_cache=None,
+                 instance_cache=None):
         if solr_url:
-            self.solr = Solr(solr_url)
+            self.solr = self.solr_cls(solr_url)
         else:
             self.solr = solr
 
+        if result_cache is not None:
+            self.result_cache = result_cache
+        if instance_cache is not None:
+            self.instance_cache = instance_cache
+
         self.model = model or self.model
         self.session = session or self.session
         self.db_field = db_field or self.db_field
@@ -58,32 +82,116 @@ class SolrSearcher(with_metaclass(SolrSearcherMeta, object)):
     def search(self, q=None, *args, **kwargs):
         return self.query_cls(self, q, *args, **kwargs)
 
+    def prepare(self, query):
+        """Renders query with placeholders once into a template.
+
+        Usage::
+
+            template = searcher.prepare(
+                searcher.search(Placeholder('q'))
+                        .filter(category=Placeholder('category', Integer))
+                        .facet_field('brand'))
+            results = template.bind(q='phone', category=13).results
+        """
+        return QueryTemplate(query)
+
     def get(self, id=None, ids=None, **kwargs):
         if ids and hasattr(ids, '__iter__'):
             ids = ','.join(ids)
         raw_results = self.solr.get(id=id, ids=ids, **kwargs)
+        return self._make_documents(raw_results)
+
+    def _make_documents(self, raw_results):
         return [self.document_cls(**raw_doc) for raw_doc in raw_results.docs]
 
+    def _pending_queries(self, queries):
+        pending = []
+        seen = set()
+        for q in queries:
+            if q._result_cache is None and id(q) not in seen:
+                seen.add(id(q))
+                pending.append(q)
+        return pending
+
+    def execute_many(self, queries, max_workers=None):
+        """Fetches results for several independent queries concurrently.
+
+        Queries are sent using a thread pool with at most ``max_workers``
+        threads (``max_concurrent_queries`` by default). Results are stored
+        in the queries so ``query.results`` does not hit Solr again.
+        Returns a list of results in the same order as ``queries``.
+
+        Usage::
+
+            listing = searcher.search('phone').facet_field('category')
+            related = searcher.search('phone case').limit(5)
+            listing_results, related_results = searcher.execute_many(
+                [listing, related])
+        """
+        queries = list(queries)
+        pending = self._pending_queries(queries)
+        if len(pending) == 1:
+            pending[0]._fetch_results()
+        elif pending:
+            max_workers = min(len(pending),
+                              max_workers or self.max_concurrent_queries)
+            deadline = get_current_deadline()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(deadline.wrap(q._fetch_results)
+                                    if deadline else q._fetch_results)
+                    for q in pending]
+                for future in futures:
+                    future.result()
+        return [q.results for q in queries]
+
     # proxy methods
 
+    def _get_cache_key(self, q, kwargs):
+        use_cache = kwargs.pop('_cache', True)
+        if (self.result_cache is None or not use_cache or
+                self.solr.stream_results):
+            return None
+        # cores can share one memcached server
+        params = dict(kwargs, q=q, _url=self.solr.url)
+        return self.result_cache.make_key('select', params)
+
     def select(self, q, **kwargs):
-        return self.solr.search(q, **kwargs)
+        cache_key = self._get_cache_key(q, kwargs)
+        if cache_key is None:
+            return self.solr.search(q, **kwargs)
+
+        with phase(instrumentation.CACHE, cache='result', hits=1, misses=0) as info:
+            def fetch():
+                info['hits'] = 0
+                info['misses'] = 1
+                return self.solr.search_raw(q, **kwargs)
+
+            raw_result = self.result_cache.get_or_set(
+                cache_key, fetch, cacheable=lambda r: not is_partial(r))
+        return self.solr.results_from_raw(raw_result)
 
     def add(self, docs, commit=True):
-        return self.solr.add(docs, commit=commit)
+        return self.solr.add(self.prepare_docs(docs), commit=commit)
+
+    def indexer(self, **kwargs):
+        return self.indexer_cls(self, **kwargs)
 
     def commit(self):
-        self.solr.commit()
+        return self.solr.commit()
 
     def delete(self, *args, **kwargs):
         commit = kwargs.pop('commit', True)
-        self.solr.delete(q=make_q(None, None, *args, **kwargs), commit=commit)
+        return self.solr.delete(q=make_q(None, None, *args, **kwargs), commit=commit)
 
     def optimize_index(self):
-        self.solr.optimize()
+        return self.solr.optimize()
 
     # methods to override
 
+    def prepare_docs(self, docs):
+        return docs
+
     def get_db_query(self):
         return self.session.query(self.model)
 
@@ -111,6 +219,77 @@ class SolrSearcher(with_metaclass(SolrSearcherMeta, object)):
         return instances
 
 
+class AsyncSolrSearcher(SolrSearcher):
+    """Searcher that uses :class:`solar.pysolr.AsyncSolr`.
+
+    Proxy methods return awaitables and queries must be awaited::
+
+        searcher = AsyncSolrSearcher('http://localhost:8983/solr')
+        results = await searcher.search('test').results
+    """
+    solr_cls = AsyncSolr
+    query_cls = AsyncSolrQuery
+    indexer_cls = AsyncIndexer
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncSolrSearcher, self).__init__(*args, **kwargs)
+        self._pending_selects = {}
+
+    async def _call_cache(self, method, *args):
+        if not self.result_cache.blocking:
+            return method(*args)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, method, *args)
+
+    async def _fetch_raw(self, cache_key, q, kwargs):
+        raw_result = await self.solr.search_raw(q, **kwargs)
+        if not is_partial(raw_result):
+            await self._call_cache(self.result_cache.set, cache_key, raw_result)
+        return raw_result
+
+    async def select(self, q, **kwargs):
+        if self.result_cache is not None and self.result_cache.blocking:
+            # memcached key contains the namespace version read from server
+            loop = asyncio.get_event_loop()
+            cache_key = await loop.run_in_executor(
+                None, self._get_cache_key, q, kwargs)
+        else:
+            cache_key = self._get_cache_key(q, kwargs)
+        if cache_key is None:
+            return await self.solr.search(q, **kwargs)
+
+        raw_result = await self._call_cache(self.result_cache.get, cache_key)
+        if raw_result is None:
+            # concurrent selects of the same key wait for a single request
+            pending = self._pending_selects
+            task = pending.get(cache_key)
+            if task is None:
+                task = pending[cache_key] = asyncio.ensure_future(
+                    self._fetch_raw(cache_key, q, kwargs))
+                task.add_done_callback(
+                    lambda _: pending.pop(cache_key, None))
+            raw_result = await asyncio.shield(task)
+        return self.solr.results_from_raw(raw_result)
+
+    async def get(self, id=None, ids=None, **kwargs):
+        if ids and hasattr(ids, '__iter__'):
+            ids = ','.join(ids)
+        raw_results = await self.solr.get(id=id, ids=ids, **kwargs)
+        return self._make_documents(raw_results)
+
+    async def execute_many(self, queries, max_workers=None):
+        queries = list(queries)
+        semaphore = asyncio.Semaphore(
+            max_workers or self.max_concurrent_queries)
+
+        async def fetch(q):
+            async with semaphore:
+                await q._async_fetch_results()
+
+        await asyncio.gather(*[fetch(q) for q in self._pending_queries(queries)])
+        return [q._fetch_results() for q in queries]
+
+
 class CommonSearcher(SolrSearcher):
     unique_field = '_id'
     type_field = '_type'
@@ -132,7 +311,7 @@ class CommonSearcher(SolrSearcher):
             .filter(**{self.type_field: self.get_type_value()})
         )
 
-    def add(self, docs, commit=True):
+    def prepare_docs(self, docs):
         patched_docs = []
         for _doc in docs:
             if _doc:
@@ -142,8 +321,7 @@ class CommonSearcher(SolrSearcher):
                 )
                 doc[self.type_field] = self.get_type_value()
                 patched_docs.append(doc)
-                
-        return super(CommonSearcher, self).add(patched_docs, commit=commit)
+        return patched_docs
 
     def get(self, id=None, ids=None, **kwargs):
         if id:
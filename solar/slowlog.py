@@ -0,0 +1,205 @@
+"""Slow query log.
+
+Records searches which take longer than a threshold together with
+the code that started them. Captured entries can be replayed::
+
+    python -m solar.slowlog replay slow.log --url http://localhost:8983/solr/core
+"""
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+from __future__ import print_function
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from . import instrumentation
+from .compat import force_unicode
+from .instrumentation import Hook
+from .query import format_query
+
+
+SOLAR_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def get_calling_site(skip_dirs=(SOLAR_DIR,)):
+    """Returns ``file:line in function`` of the first frame outside solar."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if not filename.startswith(skip_dirs):
+            return '{}:{} in {}'.format(
+                filename, frame.f_lineno, frame.f_code.co_name)
+        frame = frame.f_back
+    return None
+
+
+def _to_json(value):
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    return force_unicode(value)
+
+
+class SlowQueryLog(Hook):
+    """Instrumentation hook recording slow searches.
+
+    Entries are kept in a ring buffer of ``max_entries`` size and, when
+    ``path`` is passed, written as JSON lines to a rotating file.
+
+    Usage::
+
+        slowlog = instrumentation.add_hook(
+            SlowQueryLog(threshold=0.5, path='/var/log/app/solr-slow.log'))
+        ...
+        for entry in slowlog.entries():
+            print(entry['elapsed'], entry['qtime'], entry['site'])
+    """
+    def __init__(self, threshold=1.0, max_entries=100, path=None,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.threshold = threshold
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.handler = None
+        if path:
+            self.handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count,
+                encoding='utf-8')
+            self.handler.setFormatter(logging.Formatter('%(message)s'))
+
+    def _current(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            return stack[-1]
+
+    def before(self, phase, info):
+        if phase == instrumentation.QUERY:
+            stack = getattr(self._local, 'stack', None)
+            if stack is None:
+                stack = self._local.stack = []
+            stack.append({'bytes': 0, 'handler': 'select'})
+
+    def after(self, phase, elapsed, info):
+        if phase == instrumentation.HTTP:
+            current = self._current()
+            if current is not None:
+                current['bytes'] += info.get('bytes') or 0
+                current['url'] = info.get('url')
+        elif phase == instrumentation.QUERY:
+            current = self._current()
+            if current is None:
+                # hook was added while the query was running
+                return
+            self._local.stack.pop()
+            if elapsed >= self.threshold:
+                self.add(self._make_entry(elapsed, info, current))
+
+    def _make_entry(self, elapsed, info, current):
+        params = dict((k, _to_json(v)) for k, v in info.get('params', {}).items()
+                      if not k.startswith('_'))
+        params['q'] = _to_json(info.get('q'))
+        return {
+            'time': time.time(),
+            'elapsed': elapsed,
+            'qtime': info.get('qtime'),
+            'hits': info.get('hits'),
+            'bytes': current['bytes'],
+            'handler': current['handler'],
+            'url': current.get('url'),
+            'query': format_query(info.get('q'), info.get('params', {})),
+            'params': params,
+            'phases': info.get('phases', {}),
+            'error': (force_unicode(repr(info['error']))
+                      if info.get('error') is not None else None),
+            'site': get_calling_site(),
+        }
+
+    def add(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+        if self.handler is not None:
+            # handle() takes the handler lock so rollover is thread safe
+            self.handler.handle(logging.makeLogRecord(
+                {'msg': json.dumps(entry, sort_keys=True), 'args': None}))
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def dump(self, path):
+        """Writes entries from the ring buffer to a file for replaying."""
+        with open(path, 'w') as f:
+            for entry in self.entries():
+                f.write(json.dumps(entry, sort_keys=True))
+                f.write('\n')
+
+    def close(self):
+        if self.handler is not None:
+            self.handler.close()
+
+
+def read_entries(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def replay(entries, solr, repeat=1, out=None):
+    """Sends captured queries to Solr and prints timings."""
+    out = out or sys.stdout
+    for entry in entries:
+        params = dict(entry['params'])
+        q = params.pop('q', None)
+        timings = []
+        qtimes = []
+        for _ in range(repeat):
+            start_time = time.time()
+            result = solr.search_raw(q, **params)
+            timings.append(time.time() - start_time)
+            qtimes.append((result.get('responseHeader') or {}).get('QTime'))
+        print('{:8.1f} ms (was {:8.1f} ms)  QTime {} (was {})  {}'.format(
+            min(timings) * 1000, entry['elapsed'] * 1000,
+            min(qtimes) if None not in qtimes else None, entry.get('qtime'),
+            entry.get('site') or ''), file=out)
+        print('    {}'.format(entry.get('query') or q), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m solar.slowlog',
+                                     description='Slow query log tools.')
+    subparsers = parser.add_subparsers(dest='command')
+    replay_parser = subparsers.add_parser(
+        'replay', help='replay captured queries against Solr')
+    replay_parser.add_argument('path', help='slow query log file')
+    replay_parser.add_argument('--url', required=True, help='Solr core url')
+    replay_parser.add_argument('--repeat', type=int, default=1,
+                               help='send every query several times')
+    replay_parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args(argv)
+
+    if args.command != 'replay':
+        parser.print_help()
+        return 2
+
+    from .pysolr import Solr
+    solr = Solr(args.url, timeout=args.timeout)
+    replay(read_entries(args.path), solr, repeat=args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
 from __future__ import unicode_literals
 
+from __future__ import absolute_import
+from .loader import InstanceLoader
+from .util import LocalParams, LookupIndex
+
 
 def maybe_float(v):
     if v is not None:
@@ -34,9 +38,11 @@ class StatsMixin(object):
 
 
 class Stats(StatsMixin):
-    def __init__(self, field, facet_fields=None):
+    def __init__(self, field, facet_fields=None, local_params={}):
         super(Stats, self).__init__()
         self.field = field
+        self.local_params = LocalParams(local_params)
+        self.key = self.local_params.get('key', self.field)
         self.facets = []
         for facet_field in (facet_fields or []):
             if isinstance(facet_field, (tuple, list)):
@@ -51,17 +57,22 @@ class Stats(StatsMixin):
     def clone(self):
         facet_fields = [(stats_facet.field, stats_facet._instance_mapper)
                         for stats_facet in self.facets]
-        return self.__class__(self.field, facet_fields=facet_fields)
+        return self.__class__(self.field, facet_fields=facet_fields,
+                              local_params=self.local_params)
             
     def get_params(self):
         params = {}
-        params['stats.field'] = [self.field]
+        params['stats.field'] = ['{}{}'.format(self.local_params, self.field)]
         params['f.{}.stats.facet'.format(self.field)] = [
             facet.field for facet in self.facets]
         return params
 
+    def set_instance_loader(self, instance_loader):
+        for facet in self.facets:
+            facet.set_instance_loader(instance_loader)
+
     def process_data(self, results):
-        raw_stats = results.raw_results.stats.get('stats_fields', {}).get(self.field) or {}
+        raw_stats = results.raw_results.stats.get('stats_fields', {}).get(self.key) or {}
         for facet in self.facets:
             facet.process_data(raw_stats.get('facets', {}))
         self._process_data(raw_stats)
@@ -76,7 +87,14 @@ class StatsFacet(object):
     def __init__(self, field, instance_mapper=None):
         self.field = field
         self._instance_mapper = instance_mapper
+        self.instance_loader = None
         self.values = []
+        self._values_index = LookupIndex('value')
+
+    def set_instance_loader(self, instance_loader):
+        self.instance_loader = instance_loader
+        if instance_loader is not None:
+            instance_loader.register(self)
 
     def process_data(self, raw_data):
         for value, raw_fv_data in raw_data.get(self.field, {}).items():
@@ -85,18 +103,24 @@ class StatsFacet(object):
             self.values.append(fv)
         
     def get_value(self, value):
-        for fv in self.values:
-            if fv.value == value:
-                return fv
+        return self._values_index.lookup(self.values, value)
 
-    def _populate_instances(self):
-        values = [fv.value for fv in self.values]
-        instances = {}
+    def get_instance_mapper(self):
         if self._instance_mapper:
-            instances = self._instance_mapper(values)
+            return (self._instance_mapper, None)
+
+    def get_instance_ids(self):
+        return [fv.value for fv in self.values]
+
+    def set_instances(self, instances):
         for fv in self.values:
             fv._instance = instances.get(fv.value)
 
+    def _populate_instances(self):
+        if self.instance_loader is None:
+            self.instance_loader = InstanceLoader()
+        self.instance_loader.load(self)
+
 
 class StatsFacetValue(StatsMixin):
     def __init__(self, value, facet=None):
@@ -0,0 +1,199 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import re
+from copy import copy
+
+from .compat import force_unicode
+from .types import instantiate
+from .util import (
+    SafeUnicode, X, process_value, safe_solr_input, maybe_wrap_parentheses,
+    split_param,
+)
+
+
+TOKEN_START = '\ue000'
+TOKEN_END = '\ue001'
+TOKEN_RE = re.compile('{}(\\w+):(\\w*){}'.format(TOKEN_START, TOKEN_END))
+
+# lookups which render value without any wrapping
+VALUE_LOOKUPS = ('exact', 'gte', 'lte', 'gt', 'lt')
+# lookups which change query structure depending on value
+UNSUPPORTED_LOOKUPS = ('in', 'between', 'range', 'isnull', 'startswith')
+
+
+class Placeholder(SafeUnicode):
+    """Value of a query template that is bound later.
+
+    Placeholders can be used in the main query, filters and parameters.
+    Optional ``type`` converts bound values (see :mod:`solar.types`).
+
+    Usage::
+
+        q = searcher.search(Placeholder('q')) \\
+                    .filter(category=Placeholder('category', Integer)) \\
+                    .limit(Placeholder('rows', Integer)) \\
+                    .facet_field('brand')
+        template = searcher.prepare(q)
+        results = template.bind(q='phone', category=13, rows=20).results
+    """
+    def __new__(cls, name, type=None, _context=''):
+        if not re.match(r'^\w+$', name):
+            raise ValueError('Invalid placeholder name: {!r}'.format(name))
+        obj = super(Placeholder, cls).__new__(
+            cls, '{}{}:{}{}'.format(TOKEN_START, name, _context, TOKEN_END))
+        obj.name = name
+        obj.type = instantiate(type)
+        obj.context = _context
+        return obj
+
+    def with_context(self, context):
+        return Placeholder(self.name, self.type, context)
+
+    def render(self, value):
+        if value is None:
+            raise ValueError(
+                "Cannot bind None to placeholder '{}'".format(self.name))
+        if self.type is not None:
+            value = self.type.to_python(value)
+        if self.context == 'value':
+            return process_value(value)
+        if self.context == 'bare':
+            return maybe_wrap_parentheses(process_value(value))
+        if self.context == 'q':
+            return safe_solr_input(value)
+        if isinstance(value, bool):
+            return force_unicode(value).lower()
+        return force_unicode(value)
+
+
+def _lookup_context(param, value):
+    _, op = split_param(param)
+    if op in UNSUPPORTED_LOOKUPS:
+        raise ValueError(
+            "Placeholder '{}' is not supported with '{}' lookup".format(
+                value.name, op))
+    if op in VALUE_LOOKUPS:
+        return 'value'
+    return 'bare'
+
+
+def _set_contexts(value, context='q'):
+    if isinstance(value, Placeholder):
+        return value.with_context(context)
+    if isinstance(value, X):
+        x = copy(value)
+        x.children = [_set_contexts(child) for child in value.children]
+        return x
+    if isinstance(value, tuple) and len(value) == 2:
+        param, v = value
+        if isinstance(v, Placeholder):
+            return (param, v.with_context(_lookup_context(param, v)))
+    return value
+
+
+def _set_params_contexts(params):
+    new_params = {}
+    for key, value in params.items():
+        if isinstance(value, Placeholder):
+            value = value.with_context('param')
+        elif isinstance(value, (list, tuple)):
+            value = type(value)(
+                v.with_context('param') if isinstance(v, Placeholder) else v
+                for v in value)
+        new_params[key] = value
+    return new_params
+
+
+def substitute(value, replacements):
+    """Replaces placeholder tokens in string or list of strings."""
+    def replace(m):
+        try:
+            return replacements[m.group(0)]
+        except KeyError:
+            raise ValueError("Placeholder '{}' is not bound".format(m.group(1)))
+
+    if isinstance(value, (list, tuple)):
+        return [substitute(v, replacements) for v in value]
+    if isinstance(value, type('')) and TOKEN_START in value:
+        return TOKEN_RE.sub(replace, value)
+    return value
+
+
+class QueryTemplate(object):
+    """Query rendered once with placeholder tokens.
+
+    Binding values only substitutes tokens in the rendered query string
+    and parameters. Use :meth:`SolrSearcher.prepare` to create it.
+    """
+    def __init__(self, query):
+        query = query._clone()
+        query._q = _set_contexts(query._q)
+        query._q_args = tuple(_set_contexts(a) for a in query._q_args)
+        query._q_kwargs = dict(
+            _set_contexts(item) for item in query._q_kwargs.items())
+        query._fq = [(_set_contexts(x), local_params)
+                     for x, local_params in query._peek('_fq')]
+        query._params = _set_params_contexts(query._peek('_params'))
+        self.query = query
+
+        self.q = query._make_q()
+        self.params = query._prepare_select_params()
+
+        self._placeholders = self._find_placeholders()
+        self.names = frozenset(p.name for p in self._placeholders.values())
+        for value in [self.q] + list(self.params.values()):
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            for v in value:
+                if isinstance(v, type('')):
+                    self._check_tokens(v)
+
+    def _find_placeholders(self):
+        found = {}
+
+        def walk(value):
+            if isinstance(value, Placeholder):
+                if value.context:
+                    found[force_unicode(value)] = value
+            elif isinstance(value, X):
+                walk(value.children)
+            elif isinstance(value, (list, tuple)):
+                for v in value:
+                    walk(v)
+            elif isinstance(value, dict):
+                walk(list(value.values()))
+
+        query = self.query
+        walk([query._q, query._q_args, query._q_kwargs,
+              [x for x, _ in query._peek('_fq')], query._peek('_params')])
+        return found
+
+    def _check_tokens(self, value):
+        for m in TOKEN_RE.finditer(value):
+            if m.group(0) not in self._placeholders:
+                raise ValueError(
+                    "Placeholder '{}' is not supported here".format(m.group(1)))
+
+    def bind(self, **values):
+        """Returns query with substituted values."""
+        missing = self.names - set(values)
+        if missing:
+            raise ValueError('Missing values for placeholders: {}'.format(
+                ', '.join(sorted(missing))))
+        unknown = set(values) - self.names
+        if unknown:
+            raise ValueError('Unknown placeholders: {}'.format(
+                ', '.join(sorted(unknown))))
+
+        replacements = dict(
+            (token, placeholder.render(values[placeholder.name]))
+            for token, placeholder in self._placeholders.items())
+        query = self.query._clone()
+        query._bound_values = replacements
+        query._prepared = (
+            substitute(self.q, replacements),
+            dict((k, substitute(v, replacements))
+                 for k, v in self.params.items()),
+        )
+        return query
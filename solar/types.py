@@ -20,11 +20,46 @@ def get_to_python(typeobj):
         return typeobj.to_python
     return lambda v: v
 
-            
+
+def get_to_python_list(typeobj):
+    if hasattr(typeobj, 'to_python_list'):
+        return typeobj.to_python_list
+    if hasattr(typeobj, 'to_python'):
+        to_python = typeobj.to_python
+        return lambda values: [to_python(v) for v in values]
+    return list
+
+
+def _to_unicode_list(typeobj, values):
+    str_type = type('')
+    if all(type(v) is str_type for v in values):
+        return list(values)
+    return Type.to_python_list(typeobj, values)
+
+
+def _to_int_list(typeobj, values):
+    try:
+        return list(map(int, values))
+    except TypeError:
+        return Type.to_python_list(typeobj, values)
+
+
 class Type(object):
+    # dtype of numpy arrays for converted values
+    numpy_dtype = object
+
     def to_python(self, value):
         raise NotImplementedError()
 
+    def to_python_list(self, values):
+        """Converts list of values.
+
+        Subclasses override it with faster version, so it must be overridden
+        together with ``to_python``.
+        """
+        to_python = self.to_python
+        return [to_python(v) for v in values]
+
 
 class String(Type):
     def to_python(self, value):
@@ -32,28 +67,41 @@ class String(Type):
             return None
         return force_unicode(value)
 
+    def to_python_list(self, values):
+        return _to_unicode_list(self, values)
+
 
 class Integer(Type):
     MIN_VALUE = -(1 << 31)
     MAX_VALUE = (1 << 31) - 1
+    numpy_dtype = 'int64'
 
     def to_python(self, value):
         if value is None:
             return None
         return int(value)
 
+    def to_python_list(self, values):
+        return _to_int_list(self, values)
+
 
 class Long(Type):
     MIN_VALUE = -(1 << 63)
     MAX_VALUE = (1 << 63) - 1
+    numpy_dtype = 'int64'
 
     def to_python(self, value):
         if value is None:
             return None
         return int(value)
 
+    def to_python_list(self, values):
+        return _to_int_list(self, values)
+
 
 class Float(Type):
+    numpy_dtype = 'float64'
+
     def __init__(self, precision=None):
         self.precision = precision
         
@@ -64,8 +112,20 @@ class Float(Type):
             return round(float(value), self.precision)
         return float(value)
 
+    def to_python_list(self, values):
+        try:
+            values = list(map(float, values))
+        except TypeError:
+            return super(Float, self).to_python_list(values)
+        if self.precision is not None:
+            precision = self.precision
+            return [round(v, precision) for v in values]
+        return values
+
 
 class Boolean(Type):
+    numpy_dtype = 'bool'
+
     def to_python(self, value):
         if value is None:
             return None
@@ -91,3 +151,6 @@ class Text(Type):
         if value is None:
             return None
         return force_unicode(value)
+
+    def to_python_list(self, values):
+        return _to_unicode_list(self, values)
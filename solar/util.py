@@ -6,6 +6,7 @@ import math
 import six.moves.urllib.request, six.moves.urllib.parse, six.moves.urllib.error
 import decimal
 import logging
+import threading
 from copy import deepcopy
 from datetime import datetime, date
 
@@ -39,21 +40,45 @@ class SafeUnicode(text_type):
 ALL = SafeUnicode('*:*')
 
 
+# compiled regexes and translate tables by words and characters
+_special_words_res = {}
+_special_chars_tables = {}
+_special_chars_res = {}
+
+def _get_special_words_re(words):
+    words = tuple(words or SPECIAL_WORDS)
+    words_re = _special_words_res.get(words)
+    if words_re is None:
+        # lookarounds do not consume spaces so adjacent words match too
+        words_re = _special_words_res[words] = re.compile(
+            r'(?<!\S)({})(?!\S)'.format('|'.join(words)))
+    return words_re
+
+def _lower_match(m):
+    return m.group(0).lower()
+
 def process_special_words(value, words=None):
-    words = words or SPECIAL_WORDS
-    for w in words:
-        value = re.sub(r'(\A|\s+)({})(\s+|\Z)'.format(w), lambda m: m.group(0).lower(), value)
-    return value
+    return _get_special_words_re(words).sub(_lower_match, value)
 
 def process_special_characters(value, chars=None):
-    chars = chars or SPECIAL_CHARACTERS
-    for c in chars:
-        value = value.replace(c, r'\{}'.format(c))
-    return value
+    chars = ''.join(chars or SPECIAL_CHARACTERS)
+    if not isinstance(value, text_type):
+        for c in chars:
+            value = value.replace(c, r'\{}'.format(c))
+        return value
+    table = _special_chars_tables.get(chars)
+    if table is None:
+        table = _special_chars_tables[chars] = dict(
+            (ord(c), '\\' + c) for c in chars)
+    return value.translate(table)
 
 def contains_special_characters(value, chars=None):
-    chars = chars or SPECIAL_CHARACTERS
-    return any([c in value for c in chars])
+    chars = ''.join(chars or SPECIAL_CHARACTERS)
+    chars_re = _special_chars_res.get(chars)
+    if chars_re is None:
+        chars_re = _special_chars_res[chars] = re.compile(
+            '[{}]'.format(re.escape(chars)))
+    return chars_re.search(value) is not None
 
 def safe_solr_input(value):
     if isinstance(value, (SafeString, SafeUnicode)):
@@ -291,7 +316,81 @@ def fq_from_tuple(x):
     field_val = process_field(field, op, x[1])
     return field_val
 
+class _NotMemoizable(Exception):
+    pass
+
+_MEMO_SCALAR_TYPES = frozenset(
+    (text_type, binary_type, SafeUnicode, SafeString, bool,
+     date, type(None)) + tuple(int_types))
+# equal values can be rendered differently: 1.0 and 1.00, 0.0 and -0.0
+_MEMO_REPR_TYPES = frozenset((float, decimal.Decimal))
+
+def _memo_key(value):
+    # type goes into the key as 1, 1.0 and True are equal but rendered differently
+    t = type(value)
+    if t in _MEMO_SCALAR_TYPES:
+        return (t, value)
+    if t in _MEMO_REPR_TYPES:
+        return (t, repr(value))
+    if t is datetime:
+        # aware datetimes with different offsets are equal
+        return (t, value.isoformat())
+    if t is tuple or t is list:
+        return (t, tuple(_memo_key(v) for v in value))
+    if isinstance(value, X):
+        return (t, value.connector, value.negated,
+                tuple(_memo_key(c) for c in value.children))
+    if t is LocalParams:
+        return (t, tuple((k, _memo_key(v)) for k, v in value.items()))
+    raise _NotMemoizable()
+
+
+class _LRUMemo(object):
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# rendered filter queries by X structure and local params
+fq_memo = _LRUMemo(4096)
+
 def make_fq(x, local_params={}):
+    """Renders X object into a query string.
+
+    Results for the trees built from plain values (strings, numbers, dates,
+    lists and nested X) are memoized in ``fq_memo``.
+    """
+    try:
+        key = (_memo_key(x), _memo_key(local_params or None))
+        hash(key)
+    except (_NotMemoizable, TypeError):
+        return _render_fq(x, local_params)
+
+    fq = fq_memo.get(key)
+    if fq is None:
+        fq = _render_fq(x, local_params)
+        fq_memo.set(key, fq)
+    return fq
+
+def _render_fq(x, local_params={}):
     def _make_fq(x, level):
         fq = []
         for child in x.children:
@@ -344,7 +443,78 @@ def _pop_from_kwargs(kwargs, key):
         return kwargs.pop('_{}'.format(key))
     return kwargs.pop(key, {})
 
+def split_top_level(value, sep=','):
+    """Splits string by separators which are not inside parentheses or quotes.
+
+    Usage::
+
+        split_top_level('div(popularity,price) desc, id asc')
+        # ['div(popularity,price) desc', ' id asc']
+    """
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, c in enumerate(value):
+        if quote:
+            if c == quote and value[i - 1] != '\\':
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == sep and depth == 0:
+            parts.append(value[start:i])
+            start = i + 1
+    parts.append(value[start:])
+    return parts
+
 def wrap_list(v):
     if not isinstance(v, (list, tuple)):
         return [v]
     return v
+
+
+class LookupIndex(object):
+    """Dict index over a list of objects by attribute built on first lookup.
+
+    The index is rebuilt when another list is passed or the list length
+    changes. When several objects have the same key the first one wins
+    like in linear search. Unhashable keys fall back to linear search.
+
+    Usage::
+
+        self._values_index = LookupIndex('value')
+        ...
+        return self._values_index.lookup(self.values, value)
+    """
+    __slots__ = ('attr', '_items', '_size', '_index')
+
+    def __init__(self, attr):
+        self.attr = attr
+        self._items = None
+        self._size = None
+        self._index = None
+
+    def _build(self, items):
+        index = {}
+        for item in items:
+            index.setdefault(getattr(item, self.attr), item)
+        self._index = index
+        self._items = items
+        self._size = len(items)
+        return index
+
+    def lookup(self, items, key):
+        index = self._index
+        try:
+            if index is None or items is not self._items or len(items) != self._size:
+                index = self._build(items)
+            return index.get(key)
+        except TypeError:
+            self._index = None
+            for item in items:
+                if getattr(item, self.attr) == key:
+                    return item
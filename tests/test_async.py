@@ -0,0 +1,233 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import asyncio
+import io
+import threading
+import unittest
+
+from mock import patch, AsyncMock, Mock
+
+from solar import AsyncSolrSearcher, ResultCache
+from solar import instrumentation
+from solar.instrumentation import Hook, add_hook, remove_hook
+from solar.pysolr import AsyncSolr, SolrError
+
+
+class Response(object):
+    status = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def read(self):
+        return self.content
+
+
+class AsyncQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.searcher = AsyncSolrSearcher('http://example.com:8180/solr')
+
+    def patch_send_request(self):
+        return patch.object(self.searcher.solr, '_send_request',
+                            new_callable=AsyncMock)
+
+    def test_results(self):
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''
+{
+  "response": {
+    "numFound": 28,
+    "start": 0,
+    "docs": [
+      {"id": "111", "name": "Test 1"},
+      {"id": "222", "name": "Test 2"}
+    ]
+  },
+  "facet_counts": {
+    "facet_fields": {
+      "category": ["1", 20, "2", 8]
+    }
+  }
+}
+'''
+            q = self.searcher.search().facet_field('category')
+            self.assertRaises(RuntimeError, len, q)
+
+            results = asyncio.run(q.results)
+            self.assertEqual(results.ndocs, 28)
+            self.assertEqual(len(results.docs), 2)
+            self.assertEqual(results.docs[0].id, '111')
+            self.assertEqual(len(results.get_facet_field('category').values), 2)
+            # results are cached
+            self.assertEqual(len(q), 28)
+            self.assertEqual([d.id for d in q], ['111', '222'])
+            self.assertEqual(send_request.call_count, 1)
+
+            async def collect():
+                return [doc.name async for doc in self.searcher.search()]
+
+            self.assertEqual(asyncio.run(collect()), ['Test 1', 'Test 2'])
+            self.assertEqual(send_request.call_count, 2)
+
+    def test_count_and_get(self):
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''
+{
+  "response": {
+    "numFound": 1,
+    "start": 0,
+    "docs": [{"id": "111"}]
+  }
+}
+'''
+            q = self.searcher.search()
+            self.assertEqual(asyncio.run(q.count()), 1)
+            self.assertIn('rows=0', send_request.call_args[0][1])
+
+            doc = asyncio.run(q.get(id='111'))
+            self.assertEqual(doc.id, '111')
+
+    def test_searcher_get(self):
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''
+{
+  "doc": {
+    "id": "111",
+    "name": "Test realtime doc"
+  }
+}
+'''
+            docs = asyncio.run(self.searcher.get('111'))
+            self.assertEqual(docs[0].id, '111')
+            self.assertEqual(docs[0].name, 'Test realtime doc')
+
+    def test_execute_many(self):
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''
+{"response": {"numFound": 3, "start": 0, "docs": [{"id": "1"}]}}
+'''
+            q1 = self.searcher.search('test')
+            q2 = self.searcher.search('other')
+            results = asyncio.run(self.searcher.execute_many([q1, q2]))
+            self.assertEqual([r.ndocs for r in results], [3, 3])
+            self.assertEqual(send_request.call_count, 2)
+            self.assertEqual(q1[0].id, '1')
+            self.assertEqual(len(q2), 3)
+
+    def test_iterate(self):
+        responses = [
+            '{"response": {"numFound": 3, "docs": [{"id": "1"}, {"id": "2"}]},'
+            ' "nextCursorMark": "AoE1"}',
+            '{"response": {"numFound": 3, "docs": [{"id": "3"}]},'
+            ' "nextCursorMark": "AoE2"}',
+        ]
+        with self.patch_send_request() as send_request:
+            send_request.side_effect = responses
+
+            async def collect():
+                return [doc.id async for doc in self.searcher.search().iterate(2)]
+
+            self.assertEqual(asyncio.run(collect()), ['1', '2', '3'])
+            self.assertEqual(send_request.call_count, 2)
+            self.assertIn('cursorMark=AoE1', send_request.call_args[0][1])
+
+    def test_indexer(self):
+        with self.patch_send_request() as send_request:
+            async def send(method, path, body=None, *args, **kwargs):
+                if '<field name="id">3</field>' in body:
+                    raise SolrError('Bad document')
+                return '{}'
+            send_request.side_effect = send
+
+            indexer = self.searcher.indexer(batch_size=2, workers=2, commit=True)
+            stats = asyncio.run(indexer.index({'id': i} for i in range(7)))
+            self.assertEqual(stats.docs, 5)
+            self.assertEqual(stats.batches, 3)
+            self.assertEqual(stats.failed_batches[0].index, 1)
+            # 4 batches and a commit
+            self.assertEqual(send_request.await_count, 5)
+            self.assertIn('commit=true', send_request.call_args[0][1])
+
+    def test_extract(self):
+        solr = self.searcher.solr
+        sent = {}
+
+        def request(method, url, data=None, **kwargs):
+            sent.update(method=method, url=url, data=data)
+            return Response(
+                b'{"test.txt": "Test content", '
+                b'"test.txt_metadata": ["content_type", ["text/plain"]]}')
+
+        solr.session = Mock(request=request)
+        file_obj = io.BytesIO(b'Test content')
+        file_obj.name = 'test.txt'
+        data = asyncio.run(solr.extract(file_obj))
+        self.assertEqual(data['contents'], 'Test content')
+        self.assertEqual(data['metadata'], {'content_type': ['text/plain']})
+        self.assertTrue(sent['url'].endswith('/update/extract'))
+        self.assertEqual(type(sent['data']).__name__, 'FormData')
+
+    def test_blocking_cache(self):
+        class BlockingCache(ResultCache):
+            blocking = True
+
+            def get(self, key):
+                threads.add(threading.current_thread())
+                return super(BlockingCache, self).get(key)
+
+        threads = set()
+        searcher = AsyncSolrSearcher('http://example.com:8180/solr',
+                                     result_cache=BlockingCache())
+        with patch.object(searcher.solr, '_send_request',
+                          new_callable=AsyncMock) as send_request:
+            async def send(*args, **kwargs):
+                await asyncio.sleep(0.01)
+                return '{"response": {"numFound": 1, "start": 0, "docs": []}}'
+            send_request.side_effect = send
+
+            async def search():
+                return await asyncio.gather(
+                    *[searcher.search('test').results for _ in range(3)])
+
+            results = asyncio.run(search())
+            self.assertEqual([r.hits for r in results], [1, 1, 1])
+            self.assertEqual(send_request.await_count, 1)
+            self.assertNotIn(threading.current_thread(), threads)
+            self.assertEqual(len(searcher.result_cache), 1)
+
+    def test_pool_stats_and_phases(self):
+        class RecordingHook(Hook):
+            def after(self, phase, elapsed, info):
+                phases.append((phase, dict(info)))
+
+        phases = []
+        solr = AsyncSolr('http://example.com:8180/solr')
+        self.assertEqual(solr.pool_stats()['requests'], 0)
+        content = b'{"response": {"numFound": 3, "start": 0, "docs": []}}'
+        solr.session = Mock(request=Mock(return_value=Response(content)),
+                            connector=Mock(limit=100, limit_per_host=0))
+        hook = add_hook(RecordingHook())
+        try:
+            raw = asyncio.run(solr.search_raw('*:*'))
+        finally:
+            remove_hook(hook)
+        self.assertEqual(raw['response']['numFound'], 3)
+        self.assertEqual([p for p, _ in phases],
+                         [instrumentation.URLENCODE, instrumentation.HTTP,
+                          instrumentation.DECODE])
+        http_info, decode_info = phases[1][1], phases[2][1]
+        self.assertEqual(http_info['status'], 200)
+        self.assertEqual(http_info['bytes'], len(content))
+        self.assertEqual(decode_info['hits'], 3)
+        stats = solr.pool_stats()
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['pool_maxsize'], 100)
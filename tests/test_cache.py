@@ -0,0 +1,246 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import time
+import threading
+
+from six.moves import socketserver
+
+from solar import ResultCache, MemcachedResultCache, SolrSearcher
+
+from .base import TestCase
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultCacheTest(TestCase):
+    def test_lru(self):
+        cache = ResultCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats(),
+                         {'hits': 3, 'misses': 1, 'evictions': 1,
+                          'expirations': 0, 'size': 2})
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        cache = ResultCache(ttl=10, timer=timer)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=30)
+        timer.now = 9
+        self.assertEqual(cache.get('a'), 1)
+        timer.now = 10
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_make_key(self):
+        self.assertEqual(
+            ResultCache.make_key('select', {'q': '*:*', 'fq': ['a', 'b'], 'rows': 10}),
+            ResultCache.make_key('select', {'rows': 10, 'fq': ['a', 'b'], 'q': '*:*'}))
+        self.assertNotEqual(
+            ResultCache.make_key('select', {'q': '*:*', 'fq': ['a', 'b']}),
+            ResultCache.make_key('select', {'q': '*:*', 'fq': ['b', 'a']}))
+
+    def test_searcher(self):
+        searcher = SolrSearcher('http://example.com:8180/solr',
+                                result_cache=ResultCache())
+        raw = '''{"response": {"numFound": 2, "start": 0,
+                    "docs": [{"id": "1", "name": "one"}, {"id": "2", "name": "two"}]},
+                  "facet_counts": {"facet_fields": {"cat": ["a", 5, "b", 3]}}}'''
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = raw
+
+            q = searcher.search('test').facet_field('cat')
+            r1 = q.results
+            r2 = q.filter(id=1).filter(id=1).results
+            r3 = searcher.search('test').facet_field('cat').results
+            self.assertEqual(send_request.call_count, 2)
+            self.assertIsNot(r1, r3)
+            self.assertIsNot(r1.docs[0], r3.docs[0])
+            self.assertEqual([d.name for d in r3], ['one', 'two'])
+            self.assertEqual(r3.get_facet_field('cat').get_value('a').count, 5)
+            self.assertEqual(r2.hits, 2)
+
+            searcher.search('test').facet_field('cat').cache(False).results
+            self.assertEqual(send_request.call_count, 3)
+            self.assertEqual(searcher.result_cache.hits, 1)
+
+    def test_searcher_cores(self):
+        cache = ResultCache()
+        products = SolrSearcher('http://example.com:8180/solr/products',
+                                result_cache=cache)
+        articles = SolrSearcher('http://example.com:8180/solr/articles',
+                                result_cache=cache)
+        with self.patch_send_request(products) as send_products, \
+                self.patch_send_request(articles) as send_articles:
+            send_products.return_value = '{"response": {"numFound": 1, "start": 0, "docs": []}}'
+            send_articles.return_value = '{"response": {"numFound": 2, "start": 0, "docs": []}}'
+            self.assertEqual(products.search('test').results.hits, 1)
+            self.assertEqual(articles.search('test').results.hits, 2)
+
+    def test_searcher_without_cache(self):
+        searcher = SolrSearcher('http://example.com:8180/solr')
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = '{"response": {"numFound": 0, "start": 0, "docs": []}}'
+            searcher.search('test').cache(False).results
+            self.assertNotIn('_cache', send_request.call_args[0][1])
+
+
+class MemcachedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        data = self.server.data
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            cmd = parts[0]
+            with self.server.lock:
+                self.server.commands.append(cmd)
+            if cmd == b'get':
+                out = b''
+                for key in parts[1:]:
+                    if key in data:
+                        flags, value = data[key]
+                        out += b'VALUE ' + key + b' ' + flags + b' ' + \
+                            str(len(value)).encode() + b'\r\n' + value + b'\r\n'
+                self.wfile.write(out + b'END\r\n')
+            elif cmd in (b'set', b'add'):
+                key, flags, size = parts[1], parts[2], int(parts[4])
+                value = self.rfile.read(size + 2)[:-2]
+                with self.server.lock:
+                    if cmd == b'add' and key in data:
+                        self.wfile.write(b'NOT_STORED\r\n')
+                        continue
+                    data[key] = (flags, value)
+                self.wfile.write(b'STORED\r\n')
+            elif cmd == b'delete':
+                found = data.pop(parts[1], None) is not None
+                self.wfile.write(b'DELETED\r\n' if found else b'NOT_FOUND\r\n')
+            elif cmd == b'incr':
+                with self.server.lock:
+                    if parts[1] not in data:
+                        self.wfile.write(b'NOT_FOUND\r\n')
+                        continue
+                    flags, value = data[parts[1]]
+                    value = str(int(value) + int(parts[2])).encode()
+                    data[parts[1]] = (flags, value)
+                self.wfile.write(value + b'\r\n')
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+
+class MemcachedResultCacheTest(TestCase):
+    def setUp(self):
+        super(MemcachedResultCacheTest, self).setUp()
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0),
+                                                      MemcachedHandler)
+        self.server.daemon_threads = True
+        self.server.data = {}
+        self.server.commands = []
+        self.server.lock = threading.Lock()
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.cache = MemcachedResultCache(self.server.server_address)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get_set(self):
+        key = self.cache.make_key('select', {'q': '*:*', 'rows': 10})
+        self.assertTrue(key.startswith('solar:select:'))
+        self.assertLessEqual(len(key), 250)
+        self.assertIsNone(self.cache.get(key))
+
+        value = {'response': {'numFound': 1, 'docs': [{'id': '1', 'name': 'x' * 100}]}}
+        self.cache.set(key, value)
+        flags, stored = self.server.data[key.encode()]
+        self.assertEqual(flags, b'1')
+        self.assertLess(len(stored), 100)
+        self.assertEqual(self.cache.get(key), value)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1})
+
+        self.cache.delete(key)
+        self.assertIsNone(self.cache.get(key))
+
+    def test_clear(self):
+        self.server.data[b'other:key'] = (b'0', b'x')
+        key = self.cache.make_key('select', {'q': '*:*'})
+        self.cache.set(key, {'a': 1})
+        self.cache.clear()
+        self.assertNotEqual(self.cache.make_key('select', {'q': '*:*'}), key)
+        self.assertIsNone(self.cache.get(self.cache.make_key('select', {'q': '*:*'})))
+        self.assertIn(b'other:key', self.server.data)
+
+        # other clients see the new version after version_ttl
+        other = MemcachedResultCache(self.server.server_address, version_ttl=0)
+        self.assertEqual(other.make_key('select', {'q': '*:*'}),
+                         self.cache.make_key('select', {'q': '*:*'}))
+
+    def test_corrupt_value(self):
+        self.server.data[b'key'] = (b'1', b'not zlib')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get_or_set('key', lambda: {'a': 1}), {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+
+    def test_server_down(self):
+        cache = MemcachedResultCache(('127.0.0.1', 1))
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', {})
+        self.assertEqual(cache.get_or_set('key', lambda: {'a': 1}), {'a': 1})
+
+    def test_single_flight(self):
+        calls = []
+        started = threading.Event()
+
+        def creator():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {'value': 1}
+
+        results = []
+
+        def worker():
+            results.append(self.cache.get_or_set('hot', creator))
+
+        first = threading.Thread(target=worker)
+        first.start()
+        started.wait()
+        others = [threading.Thread(target=worker) for _ in range(4)]
+        for t in others:
+            t.start()
+        for t in [first] + others:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 1}] * 5)
+        self.assertNotIn(b'hot:lock', self.server.data)
+
+    def test_searcher(self):
+        searcher = SolrSearcher('http://example.com:8180/solr',
+                                result_cache=self.cache)
+        raw = '{"response": {"numFound": 1, "start": 0, "docs": [{"id": "1"}]}}'
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = raw
+            searcher.search('test').results
+            results = searcher.search('test').results
+            self.assertEqual(send_request.call_count, 1)
+            self.assertEqual(results.docs[0].id, '1')
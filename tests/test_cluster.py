@@ -0,0 +1,178 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+import socket
+import threading
+import time
+from unittest import TestCase
+
+from six.moves import BaseHTTPServer, socketserver
+
+from solar import SolrSearcher, Deadline, DeadlineExceeded, CircuitBreaker
+from solar.cluster import SolrCluster
+from solar.pysolr import SolrError, SolrConnectionError
+
+
+RESPONSE = {
+    "response": {"numFound": 1, "start": 0, "docs": [{"id": "1"}]},
+}
+
+
+class SolrHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        server = self.server
+        server.requests.append(self.path)
+        if server.delay:
+            time.sleep(server.delay)
+        body = json.dumps(RESPONSE).encode('utf-8')
+        self.send_response(server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._respond()
+
+    def log_message(self, *args):
+        pass
+
+
+class StubSolr(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), SolrHandler)
+        self.requests = []
+        self.status = 200
+        self.delay = 0
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       kwargs={'poll_interval': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/solr/core'.format(self.server_port)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def unused_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:{}/solr/core'.format(port)
+
+
+class SolrClusterTest(TestCase):
+    def setUp(self):
+        self.servers = [StubSolr(), StubSolr()]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def test_balancing(self):
+        solr = SolrCluster([s.url for s in self.servers], timeout=5)
+        searcher = SolrSearcher(solr=solr)
+        for _ in range(10):
+            self.assertEqual(searcher.search().results.hits, 1)
+        self.assertEqual(len(self.servers[0].requests), 5)
+        self.assertEqual(len(self.servers[1].requests), 5)
+        self.assertTrue(all(p.startswith('/solr/core/select/')
+                            for p in self.servers[0].requests))
+        self.assertEqual(
+            [n['outstanding'] for n in solr.nodes_stats()], [0, 0])
+
+        self.assertRaises(ValueError, SolrCluster, [])
+        self.assertRaises(ValueError, SolrCluster, [self.servers[0].url],
+                          balancing='random')
+
+    def test_ewma(self):
+        slow, fast = self.servers
+        slow.delay = 0.05
+        solr = SolrCluster([slow.url, fast.url], balancing='ewma', timeout=5)
+        for _ in range(10):
+            solr.search('*:*')
+        self.assertEqual(len(slow.requests), 1)
+        self.assertEqual(len(fast.requests), 9)
+        slow_node, fast_node = solr.nodes
+        self.assertGreater(slow_node.latency, fast_node.latency)
+
+    def test_failover(self):
+        dead_url = unused_url()
+        solr = SolrCluster([dead_url] + [s.url for s in self.servers],
+                           timeout=5)
+        for _ in range(6):
+            self.assertEqual(solr.search('*:*').hits, 1)
+        dead_node = solr.nodes[0]
+        self.assertFalse(dead_node.healthy)
+        self.assertEqual(dead_node.failures, 1)
+        self.assertEqual(
+            len(self.servers[0].requests) + len(self.servers[1].requests), 6)
+
+        # unavailable replica is also skipped
+        self.servers[0].status = 503
+        for _ in range(3):
+            self.assertEqual(solr.search('*:*').hits, 1)
+        self.assertFalse(solr.nodes[1].healthy)
+
+        # health check re-admits recovered nodes only
+        self.servers[0].status = 200
+        solr.check_health()
+        self.assertEqual([n.healthy for n in solr.nodes], [False, True, True])
+
+        # updates are not retried
+        solr = SolrCluster([dead_url], timeout=5)
+        self.assertRaises(SolrConnectionError, solr.add, [{'id': '1'}])
+
+    def test_deadline(self):
+        slow, fast = self.servers
+        slow.delay = fast.delay = 0.5
+        solr = SolrCluster([s.url for s in self.servers], timeout=5,
+                           circuit_breaker=CircuitBreaker(failure_threshold=1))
+        with Deadline(0.1).activate():
+            self.assertRaises(DeadlineExceeded, solr.search, '*:*')
+        # slow response within the caller's budget is not a node failure
+        self.assertEqual(len(slow.requests) + len(fast.requests), 1)
+        stats = solr.nodes_stats()
+        self.assertTrue(all(n['healthy'] for n in stats))
+        self.assertEqual([n['failures'] for n in stats], [0, 0])
+        self.assertEqual([n['circuit_breaker']['state'] for n in stats],
+                         ['closed', 'closed'])
+
+    def test_bad_request_is_not_retried(self):
+        for server in self.servers:
+            server.status = 400
+        solr = SolrCluster([s.url for s in self.servers], timeout=5)
+        self.assertRaises(SolrError, solr.search, '*:*')
+        self.assertEqual(
+            len(self.servers[0].requests) + len(self.servers[1].requests), 1)
+        self.assertTrue(all(n.healthy for n in solr.nodes))
+
+    def test_health_checker(self):
+        solr = SolrCluster([s.url for s in self.servers], timeout=5,
+                           health_check_interval=0.01)
+        try:
+            solr.nodes[0].healthy = False
+            for _ in range(100):
+                if solr.nodes[0].healthy:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(solr.nodes[0].healthy)
+            self.assertIn('/solr/core/admin/ping?wt=json',
+                          self.servers[0].requests)
+        finally:
+            solr.close()
+        self.assertIsNone(solr._health_checker)
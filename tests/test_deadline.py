@@ -0,0 +1,148 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+
+import requests
+from mock import Mock
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from solar import (
+    SolrSearcher, ResultCache, Deadline, DeadlineExceeded, CircuitBreaker)
+from solar.pysolr import Solr, SolrConnectionError
+from solar.deadline import get_current_deadline, get_timeout
+
+from .base import TestCase
+from .test_cache import FakeTimer
+
+
+def make_response(partial=False):
+    header = {"status": 0, "QTime": 3}
+    if partial:
+        header['partialResults'] = True
+    content = json.dumps({
+        "responseHeader": header,
+        "response": {"numFound": 2, "start": 0, "docs": [{"id": "1"}, {"id": "2"}]},
+    }).encode('utf-8')
+    return Mock(status_code=200, content=content)
+
+
+class DeadlineTest(TestCase):
+    def setUp(self):
+        self.clock = FakeTimer()
+        self.searcher = SolrSearcher('http://example.com:8180/solr')
+        self.get = self.searcher.solr.session.get = Mock(
+            return_value=make_response())
+
+    def sent_params(self):
+        url = self.get.call_args[0][0]
+        return parse_qs(urlparse(url).query)
+
+    def test_deadline(self):
+        deadline = Deadline(2.5, _clock=self.clock)
+        self.clock.now = 0.5
+        self.assertEqual(deadline.remaining(), 2.0)
+        self.assertFalse(deadline.expired())
+
+        q = self.searcher.search('test').deadline(deadline)
+        self.assertIs(q.limit(5)._deadline, deadline)
+        q.results
+        self.assertEqual(self.sent_params()['timeAllowed'], ['2000'])
+        self.assertEqual(self.get.call_args[1]['timeout'], 2.0)
+        self.assertIsNone(get_current_deadline())
+
+        # user's timeAllowed is kept when it is less than the budget
+        self.searcher.search('test').deadline(deadline) \
+                                    .set_param('timeAllowed', 500).results
+        self.assertEqual(self.sent_params()['timeAllowed'], ['500'])
+
+        self.searcher.search('test').results
+        self.assertNotIn('timeAllowed', self.sent_params())
+        self.assertEqual(self.get.call_args[1]['timeout'], 60)
+
+        self.clock.now = 2.5
+        self.assertTrue(deadline.expired())
+        self.get.reset_mock()
+        with self.assertRaises(DeadlineExceeded):
+            self.searcher.search('test').deadline(deadline).results
+        self.assertFalse(self.get.called)
+
+        self.assertIsInstance(self.searcher.search().deadline(1)._deadline,
+                              Deadline)
+
+    def test_activate(self):
+        outer = Deadline(1, _clock=self.clock)
+        inner = Deadline(5, _clock=self.clock)
+        with outer.activate() as active:
+            self.assertIs(active, outer)
+            self.assertEqual(get_timeout(60), 1)
+            # inner deadline cannot extend the outer one
+            with inner.activate() as active:
+                self.assertIs(active, outer)
+                self.searcher.search('test').deadline(inner).results
+                self.assertEqual(self.get.call_args[1]['timeout'], 1)
+            self.assertIs(get_current_deadline(), outer)
+        self.assertIsNone(get_current_deadline())
+        self.assertEqual(get_timeout(60), 60)
+
+    def test_sub_queries(self):
+        deadline = Deadline(3, _clock=self.clock)
+        timeouts = []
+
+        def get(url, **kwargs):
+            timeouts.append(kwargs['timeout'])
+            return make_response()
+        self.get.side_effect = get
+
+        with deadline.activate():
+            self.searcher.execute_many([self.searcher.search('a'),
+                                        self.searcher.search('b')])
+        self.assertEqual(timeouts, [3, 3])
+
+    def test_instance_mapper(self):
+        deadline = Deadline(1, _clock=self.clock)
+        seen = []
+
+        def mapper(ids):
+            seen.append(get_current_deadline())
+            return dict((id, id) for id in ids)
+
+        results = self.searcher.search('test').instance_mapper(mapper) \
+                                              .deadline(deadline).results
+        self.assertEqual(results.instances, ['1', '2'])
+        self.assertEqual(seen, [deadline])
+
+        results = self.searcher.search('test').instance_mapper(mapper) \
+                                              .deadline(deadline).results
+        self.clock.now = 1
+        with self.assertRaises(DeadlineExceeded):
+            results.instances
+        self.assertEqual(len(seen), 1)
+
+    def test_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        solr = Solr('http://example.com:8180/solr', circuit_breaker=breaker)
+        solr.session.get = Mock(side_effect=requests.exceptions.Timeout('slow'))
+        with Deadline(1, _clock=self.clock).activate():
+            self.assertRaises(DeadlineExceeded, solr.search, '*:*')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        # own timeout of the client is a connection error
+        self.assertRaises(SolrConnectionError, solr.search, '*:*')
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_partial_results(self):
+        self.get.return_value = make_response(partial=True)
+        cache = ResultCache()
+        cache.set = Mock(wraps=cache.set)
+        searcher = SolrSearcher(solr=self.searcher.solr, result_cache=cache)
+        results = searcher.search('test').results
+        self.assertTrue(results.partial_results)
+        self.assertEqual(len(searcher.result_cache), 0)
+        # truncated response is never visible to other threads
+        self.assertFalse(cache.set.called)
+
+        self.get.return_value = make_response()
+        results = searcher.search('test').results
+        self.assertFalse(results.partial_results)
+        self.assertEqual(len(searcher.result_cache), 1)
@@ -0,0 +1,72 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import threading
+
+from solar.pysolr import SolrError
+from solar.searcher import CommonSearcher
+
+from .base import TestCase
+
+
+class IndexerTest(TestCase):
+    def test_batches(self):
+        indexer = self.searcher.indexer(batch_size=3)
+        batches = list(indexer.iter_batches({'id': i} for i in range(7)))
+        self.assertEqual([len(b) for b in batches], [3, 3, 1])
+
+        indexer = self.searcher.indexer(batch_size=100, batch_bytes=20)
+        docs = [{'id': '1', 'name': 'x' * 8}, {'id': '2', 'name': 'y' * 8},
+                {'id': '3', 'name': 'z' * 30}, {'id': '4'}]
+        batches = list(indexer.iter_batches(docs))
+        self.assertEqual([[d['id'] for d in b] for b in batches],
+                         [['1'], ['2'], ['3'], ['4']])
+
+    def test_index(self):
+        bodies = []
+        paths = []
+        lock = threading.Lock()
+
+        def send_request(method, path, body=None, *args, **kwargs):
+            if '<field name="id">13</field>' in body:
+                raise SolrError('Bad document')
+            with lock:
+                paths.append(path)
+                bodies.append(body)
+            return '{}'
+
+        with self.patch_send_request() as send_request_mock:
+            send_request_mock.side_effect = send_request
+            indexer = self.searcher.indexer(batch_size=10, workers=3,
+                                            commit_within=5000)
+            stats = indexer.index({'id': i, 'name': 'Doc'} for i in range(95))
+
+        self.assertEqual(stats.docs, 85)
+        self.assertEqual(stats.batches, 9)
+        self.assertEqual(stats.failed_docs, 10)
+        self.assertEqual(len(stats.failed_batches), 1)
+        self.assertEqual(stats.failed_batches[0].index, 1)
+        self.assertEqual(stats.failed_batches[0].docs[0]['id'], 10)
+        self.assertIsInstance(stats.failed_batches[0].error, SolrError)
+        self.assertGreater(stats.docs_per_sec, 0)
+        self.assertEqual(len(bodies), 9)
+        self.assertTrue(all('commit=false' in p for p in paths))
+        self.assertTrue(all('commitWithin="5000"' in b for b in bodies))
+
+    def test_common_searcher(self):
+        class Model(object):
+            pass
+
+        class ModelSearcher(CommonSearcher):
+            model = Model
+
+        searcher = ModelSearcher('http://example.com:8180/solr')
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = '{}'
+            stats = searcher.indexer(commit=True).index([{'id': 1}, None])
+            self.assertEqual(stats.docs, 1)
+            self.assertEqual(send_request.call_count, 2)
+            body = send_request.call_args_list[0][0][2]
+            self.assertIn('<field name="_id">Model:1</field>', body)
+            self.assertIn('<field name="_type">Model</field>', body)
+            self.assertIn('commit=true', send_request.call_args_list[1][0][1])
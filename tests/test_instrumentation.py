@@ -0,0 +1,130 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from solar import SolrSearcher, instrumentation
+from solar.instrumentation import (
+    Hook, PhaseCollector, add_hook, remove_hook, phase, percentile)
+
+
+RESPONSE = {
+    "responseHeader": {"status": 0, "QTime": 17},
+    "response": {
+        "numFound": 120,
+        "start": 0,
+        "docs": [{"id": "1"}, {"id": "2"}],
+    },
+    "facet_counts": {
+        "facet_fields": {"category": ["1", 20, "2", 8, "3", 1]}
+    },
+}
+
+
+class RecordingHook(Hook):
+    def __init__(self):
+        self.calls = []
+
+    def before(self, phase, info):
+        self.calls.append(('before', phase))
+
+    def after(self, phase, elapsed, info):
+        self.calls.append(('after', phase, elapsed, dict(info)))
+
+    def finished(self, phase):
+        return [c for c in self.calls if c[0] == 'after' and c[1] == phase]
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        self.hook = add_hook(RecordingHook())
+        self.collector = add_hook(PhaseCollector(max_samples=3))
+
+    def tearDown(self):
+        remove_hook(self.hook)
+        remove_hook(self.collector)
+
+    def _searcher(self):
+        searcher = SolrSearcher('http://example.com:8180/solr')
+        content = json.dumps(RESPONSE).encode('utf-8')
+        searcher.solr.session.get = Mock(
+            return_value=Mock(status_code=200, content=content))
+        return searcher
+
+    def test_phases(self):
+        mapper = Mock(side_effect=lambda ids: dict((id, id) for id in ids))
+        q = self._searcher().search('test') \
+                            .facet_field('category', _instance_mapper=mapper)
+        results = q.results
+        self.assertEqual(results.get_facet_field('category').values[0].instance, '1')
+
+        phases = [c[1] for c in self.hook.calls if c[0] == 'after']
+        self.assertEqual(phases, ['params', 'urlencode', 'http', 'decode',
+                                  'results', 'query', 'process', 'instances'])
+        self.assertEqual(self.hook.calls[0], ('before', 'query'))
+
+        _, _, elapsed, info = self.hook.finished('query')[0]
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertEqual(info['q'], 'test')
+        self.assertEqual(info['hits'], 120)
+        self.assertIs(info['query'], q)
+        self.assertEqual(sorted(info['phases']),
+                         ['decode', 'http', 'params', 'results', 'urlencode'])
+        self.assertLessEqual(sum(info['phases'].values()), elapsed)
+
+        info = self.hook.finished('http')[0][3]
+        self.assertEqual(info['status'], 200)
+        self.assertEqual(info['method'], 'get')
+        self.assertGreater(info['bytes'], 0)
+        info = self.hook.finished('decode')[0][3]
+        self.assertEqual(info['qtime'], 17)
+        self.assertEqual(info['hits'], 120)
+        info = self.hook.finished('results')[0][3]
+        self.assertEqual(info['docs'], 2)
+        info = self.hook.finished('process')[0][3]
+        self.assertEqual(info['component'], 'FacetField')
+        self.assertEqual(info['key'], 'category')
+        self.assertEqual(info['values'], 3)
+        info = self.hook.finished('instances')[0][3]
+        self.assertEqual(info['ids'], 3)
+        self.assertEqual(info['instances'], 3)
+
+        stats = self.collector.percentiles('http')
+        self.assertEqual(stats['count'], 1)
+        self.assertIsNotNone(stats['p99'])
+        self.assertIn('query', self.collector.summary())
+
+        for _ in range(4):
+            self._searcher().search().results
+        self.assertEqual(self.collector.percentiles('http')['count'], 5)
+        self.assertEqual(len(self.collector._samples['http']), 3)
+        self.collector.reset()
+        self.assertEqual(self.collector.summary(), {})
+
+    def test_error(self):
+        with self.assertRaises(ValueError):
+            with phase(instrumentation.HTTP):
+                raise ValueError()
+        info = self.hook.finished('http')[0][3]
+        self.assertIsInstance(info['error'], ValueError)
+
+    def test_disabled(self):
+        remove_hook(self.hook)
+        remove_hook(self.collector)
+        self.assertFalse(instrumentation.is_enabled())
+        with phase(instrumentation.HTTP, url='/') as info:
+            info['bytes'] = 10
+        self.assertEqual(info, {})
+        self._searcher().search().results
+        self.assertEqual(self.hook.calls, [])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([5], 99), 5)
+        self.assertIsNone(percentile([], 50))
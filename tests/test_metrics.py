@@ -0,0 +1,90 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+from unittest import TestCase
+
+from mock import Mock
+
+from solar import SolrSearcher
+from solar.cache import ResultCache
+from solar.instrumentation import add_hook, remove_hook
+from solar.metrics import MetricsRegistry, MetricsHook, get_handler
+
+
+RESPONSE = {
+    "responseHeader": {"status": 0, "QTime": 30},
+    "response": {"numFound": 1, "start": 0, "docs": [{"id": "1"}]},
+}
+
+
+class MetricsTest(TestCase):
+    def test_registry(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('app_requests_total', 'Requests "total"\\\n.',
+                                   ['handler'])
+        histogram = registry.histogram('app_latency_seconds', 'Latency.',
+                                       buckets=(0.1, 1))
+        counter.inc(handler='select')
+        counter.inc(2, handler='up"date')
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+        self.assertEqual(counter.get(handler='select'), 1)
+        self.assertEqual(histogram.get_count(), 3)
+        self.assertRaises(ValueError, counter.inc, status='200')
+        self.assertRaises(ValueError, registry.counter, 'app_requests_total', '')
+
+        self.assertEqual(registry.render(), '''\
+# HELP app_requests_total Requests "total"\\\\\\n.
+# TYPE app_requests_total counter
+app_requests_total{handler="select"} 1
+app_requests_total{handler="up\\"date"} 2
+# HELP app_latency_seconds Latency.
+# TYPE app_latency_seconds histogram
+app_latency_seconds_bucket{le="0.1"} 1
+app_latency_seconds_bucket{le="1"} 2
+app_latency_seconds_bucket{le="+Inf"} 3
+app_latency_seconds_sum 5.55
+app_latency_seconds_count 3
+''')
+
+    def test_get_handler(self):
+        self.assertEqual(get_handler('http://h/solr/core/select/?q=*:*'), 'select')
+        self.assertEqual(get_handler('http://h/solr/core/update/?commit=true'), 'update')
+        self.assertEqual(get_handler('http://h/solr/core/get/?id=1'), 'get')
+        self.assertEqual(get_handler('http://h/solr/core/admin/ping'), 'admin')
+        self.assertEqual(get_handler('http://h/solr/core/export'), 'other')
+
+    def test_hook(self):
+        hook = add_hook(MetricsHook())
+        try:
+            searcher = SolrSearcher('http://example.com:8180/solr',
+                                    result_cache=ResultCache())
+            content = json.dumps(RESPONSE).encode('utf-8')
+            searcher.solr.session.get = Mock(
+                return_value=Mock(status_code=200, content=content))
+            searcher.search('test').results
+            searcher.search('test').results
+            searcher.search('test').results
+            searcher.solr.session.get.return_value = Mock(
+                status_code=400, content=b'', headers={})
+            with self.assertRaises(Exception):
+                searcher.search('other').results
+        finally:
+            remove_hook(hook)
+
+        self.assertEqual(hook.requests.get(handler='select', status='200'), 1)
+        self.assertEqual(hook.requests.get(handler='select', status='400'), 1)
+        self.assertEqual(hook.request_duration.get_count(handler='select'), 2)
+        self.assertEqual(hook.response_size.get_sum(handler='select'), len(content))
+        self.assertEqual(hook.qtime.get_sum(handler='select'), 0.03)
+        self.assertEqual(hook.query_duration.get_count(), 4)
+        self.assertEqual(hook.cache_requests.get(cache='result', result='hit'), 2)
+        self.assertEqual(hook.cache_requests.get(cache='result', result='miss'), 2)
+
+        text = hook.registry.render()
+        self.assertIn('solar_requests_total{handler="select",status="200"} 1\n', text)
+        self.assertIn('solar_qtime_seconds_bucket{handler="select",le="0.05"} 1\n', text)
+        self.assertIn('solar_cache_hit_ratio{cache="result"} 0.5\n', text)
+        self.assertIn('# TYPE solar_response_size_bytes histogram\n', text)
@@ -0,0 +1,224 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+from datetime import datetime
+from unittest import TestCase
+
+import requests
+from mock import Mock
+
+from solar.pysolr import (
+    Solr, SolrError, SolrCoreAdmin, SolrSchemaAdmin,
+    StreamingResults, JSONStreamReader,
+    clean_xml_string, sanitize,
+)
+from solar.searcher import SolrSearcher
+
+
+RESPONSE = {
+    "responseHeader": {"status": 0, "QTime": 5},
+    "response": {
+        "numFound": 1234,
+        "start": 0,
+        "docs": [
+            {"id": "1", "name": "Test ф 1", "price": 10.5},
+            {"id": "2", "name": "Test, \"quoted\" }{ 2", "rank": 12345},
+            {"id": "3", "tags": ["a", "b"], "flag": True},
+        ]
+    },
+    "facet_counts": {
+        "facet_fields": {"category": ["1", 20, "2", 8]}
+    },
+    "stats": {
+        "stats_fields": {"price": {"min": 1.0, "max": 2.0}}
+    }
+}
+
+
+def split(s, size):
+    return [s[i:i + size] for i in range(0, len(s), size)]
+
+
+class StreamingResultsTest(TestCase):
+    def test_reader(self):
+        data = json.dumps([1, 23456, "a\"b", {"c": [None, True]}, 7.5])
+        for size in (1, 2, 3, 7, 100):
+            reader = JSONStreamReader(split(data, size))
+            self.assertEqual(list(reader.items()),
+                             [1, 23456, 'a"b', {'c': [None, True]}, 7.5])
+
+        reader = JSONStreamReader(split('{"a": 1, "b": [1, 2]}', 3))
+        values = {}
+        for key in reader.members():
+            values[key] = reader.value()
+        self.assertEqual(values, {'a': 1, 'b': [1, 2]})
+
+        reader = JSONStreamReader(['[1, 2'])
+        self.assertRaises(ValueError, list, reader.items())
+
+    def test_streaming(self):
+        data = json.dumps(RESPONSE)
+        for size in (1, 5, 64, len(data)):
+            results = StreamingResults(split(data, size))
+            self.assertEqual(results.hits, 1234)
+            self.assertEqual([d['id'] for d in results], ['1', '2', '3'])
+            self.assertRaises(SolrError, iter, results)
+            # all documents were iterated
+            self.assertEqual(results.docs, [])
+            self.assertEqual(results.qtime, 5)
+            self.assertEqual(results.facets['facet_fields']['category'],
+                             ['1', 20, '2', 8])
+            self.assertEqual(results.stats['stats_fields']['price']['max'], 2.0)
+            self.assertEqual(results.grouped, {})
+
+        # accessing sections first keeps documents
+        results = StreamingResults(split(data, 10))
+        self.assertEqual(results.facets['facet_fields']['category'][0], '1')
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results.docs[1]['name'], 'Test, "quoted" }{ 2')
+        self.assertEqual([d['id'] for d in results], ['1', '2', '3'])
+
+        results = StreamingResults(split(data, 10))
+        self.assertEqual([d['id'] for d in list(results)], ['1', '2', '3'])
+
+        # sections accessed in the middle of iteration keep the rest of documents
+        results = StreamingResults(split(data, 10))
+        docs = iter(results)
+        self.assertEqual(next(docs)['id'], '1')
+        self.assertEqual(results.facets['facet_fields']['category'][0], '1')
+        self.assertEqual(results.hits, 1234)
+        self.assertEqual([d['id'] for d in results.docs], ['2', '3'])
+        self.assertEqual([d['id'] for d in docs], ['2', '3'])
+
+        results = StreamingResults('{"grouped": {"x": {"matches": 2}}}')
+        self.assertEqual(results.hits, 0)
+        self.assertEqual(list(results), [])
+        self.assertEqual(results.grouped['x']['matches'], 2)
+
+    def test_iter_content(self):
+        solr = Solr('http://example.com:8180/solr')
+        data = json.dumps(RESPONSE, ensure_ascii=False).encode('utf-8')
+        resp = Mock()
+        resp.iter_content.return_value = split(data, 3)
+        chunks = list(solr._iter_content(resp))
+        self.assertEqual(''.join(chunks), data.decode('utf-8'))
+        self.assertTrue(resp.close.called)
+
+    def test_searcher(self):
+        searcher = SolrSearcher(solr=Solr('http://example.com:8180/solr',
+                                          stream_results=True))
+        searcher.solr._send_request = Mock(
+            return_value=iter(split(json.dumps(RESPONSE), 16)))
+        q = searcher.search().facet_field('category').stats('price')
+        results = q.results
+        self.assertTrue(searcher.solr._send_request.call_args[1]['stream'])
+        self.assertEqual(results.ndocs, 1234)
+        self.assertEqual([doc.id for doc in results], ['1', '2', '3'])
+        self.assertEqual(results.docs[2].tags, ['a', 'b'])
+        self.assertEqual(len(results.get_facet_field('category').values), 2)
+        self.assertEqual(results.get_stats_field('price').min, 1.0)
+
+        searcher.solr._send_request.return_value = iter(
+            split(json.dumps(RESPONSE), 16))
+        self.assertEqual([d['id'] for d in list(searcher.solr.search('*:*'))],
+                         ['1', '2', '3'])
+
+
+class JSONUpdateTest(TestCase):
+    def setUp(self):
+        self.solr = Solr('http://example.com:8180/solr', update_format='json')
+        self.solr._send_request = Mock(return_value='{}')
+
+    def test_add(self):
+        self.solr.add([
+            {'id': 1, 'name': 'Test\x01 ф', 'tags': ['a', None, 'b'],
+             'dt': datetime(2014, 7, 2, 12, 30), 'active': True,
+             'empty': '', 'missing': None},
+            {'id': 2, 'name': 'Second'},
+        ], commit=False, commitWithin=1000)
+        method, path, body, headers = self.solr._send_request.call_args[0]
+        self.assertEqual(method, 'post')
+        self.assertIn('commit=false', path)
+        self.assertIn('commitWithin=1000', path)
+        self.assertTrue(headers['Content-type'].startswith('application/json'))
+        self.assertIsInstance(body, bytes)
+        self.assertEqual(json.loads(body.decode('utf-8')), [
+            {'id': '1', 'name': 'Test\x01 ф', 'tags': ['a', 'b'],
+             'dt': '2014-07-02T12:30:00Z', 'active': 'true'},
+            {'id': '2', 'name': 'Second'},
+        ])
+
+    def test_boost_and_field_updates(self):
+        self.solr.add([{'id': '1', 'name': 'Test', 'rank': 5, 'boost': 2}],
+                      boost={'name': 3}, fieldUpdates={'rank': 'inc'})
+        body = self.solr._send_request.call_args[0][2].decode('utf-8')
+        self.assertTrue(body.startswith('{"add":'))
+        self.assertEqual(json.loads(body), {
+            'add': {
+                'doc': {'id': '1', 'name': {'boost': 3.0, 'value': 'Test'},
+                        'rank': {'inc': '5'}},
+                'boost': 2.0,
+            }
+        })
+
+    def test_xml_fallback(self):
+        self.solr.update_format = 'xml'
+        self.solr.add([{'id': '1', 'name': 'Test\x01'}])
+        body = self.solr._send_request.call_args[0][2]
+        self.assertIn('<field name="name">Test</field>', body)
+
+
+class SanitizeTest(TestCase):
+    def test_clean_xml_string(self):
+        self.assertEqual(clean_xml_string('Test\x00 \x08\t\n\r ф￾\U0001F600'),
+                         'Test \t\n\r ф\U0001F600')
+        s = 'Clean string ф'
+        self.assertIs(clean_xml_string(s), s)
+
+    def test_sanitize(self):
+        self.assertEqual(sanitize('a\x00\x01\x1fb\t\n\r\x0b\x0cф'), 'ab\t\n\rф')
+        self.assertEqual(sanitize(b'a\x00b'), 'ab')
+        s = '<add><doc>ф</doc></add>'
+        self.assertIs(sanitize(s), s)
+
+
+class ConnectionPoolTest(TestCase):
+    def test_connection_pool(self):
+        solr = Solr('http://example.com:8180/solr', pool_connections=2,
+                    pool_maxsize=16, pool_block=True)
+        adapter = solr.session.get_adapter('http://example.com:8180/solr')
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 16)
+        self.assertTrue(adapter._pool_block)
+
+        in_flight = []
+
+        def get(url, **kwargs):
+            in_flight.append(solr.pool_stats()['in_flight'])
+            resp = Mock(status_code=200)
+            resp.content = json.dumps(RESPONSE).encode('utf-8')
+            return resp
+
+        solr.session.get = get
+        solr.search('*:*')
+        self.assertEqual(in_flight, [1])
+        stats = solr.pool_stats()
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['pool_maxsize'], 16)
+        self.assertEqual(stats['pools'], {})
+
+        def failing_get(url, **kwargs):
+            raise requests.exceptions.ConnectionError('refused')
+
+        solr.session.get = failing_get
+        self.assertRaises(SolrError, solr.search, '*:*')
+        self.assertEqual(solr.pool_stats()['in_flight'], 0)
+
+        # admin clients can share the session
+        admin = SolrCoreAdmin('http://example.com:8180/solr/admin/cores',
+                              session=solr.session)
+        self.assertIs(admin.session, solr.session)
+        schema_admin = SolrSchemaAdmin('http://example.com:8180/solr')
+        self.assertIsNot(schema_admin.session, solr.session)
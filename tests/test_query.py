@@ -8,9 +8,13 @@ from mock import patch, Mock
 
 from solar.searcher import SolrSearcher
 from solar.util import SafeUnicode, X, LocalParams, make_fq
-from solar.types import Integer, Float, DateTime
+from solar.types import Integer, Float, Boolean, DateTime
+from solar.facets import zip_counts, numpy
 from solar.compat import force_unicode
 from solar import func
+from solar.cache import ResultCache
+from solar.document import CompactDocument
+from solar.template import Placeholder
 
 from .base import TestCase
 from six.moves import zip
@@ -1279,6 +1283,13 @@ class QueryTest(TestCase):
             self.assertEqual(grouped.docs[3].id, '555')
             self.assertEqual(grouped.docs[3].name, 'Test 5')
 
+    def test_stats_field(self):
+        q = self.searcher.search().stats('price-unit')
+        self.assertIn('stats.field=price-unit', str(q))
+
+        q = self.searcher.search().stats('price-unit', _local_params={'key': 'pu'})
+        self.assertIn('stats.field={!key=pu}price-unit', str(q))
+
     def test_stats(self):
         with self.patch_send_request() as send_request:
             send_request.return_value = '''
@@ -1581,3 +1592,285 @@ class QueryTest(TestCase):
             self.assertNotIn('hl.snippets=2', raw_query)
             self.assertNotIn('hl.simple.pre={em}', raw_query)
             self.assertNotIn('hl.simple.post={/em}', raw_query)
+
+    def test_iterate(self):
+        pages = {
+            '%2A': ('AoE1', ['1', '2']),
+            'AoE1': ('AoE2', ['3', '4']),
+            'AoE2': ('AoE3', ['5']),
+        }
+
+        def send_request(method, path, *args, **kwargs):
+            params = dict(p.split('=', 1) for p in path.split('?', 1)[1].split('&'))
+            next_cursor_mark, ids = pages[params['cursorMark']]
+            return '''{"response": {"numFound": 5, "start": 0, "docs": [%s]},
+                       "nextCursorMark": "%s"}''' % (
+                ', '.join('{"id": "%s"}' % id for id in ids), next_cursor_mark)
+
+        for prefetch in (True, False):
+            with self.patch_send_request() as send_request_mock:
+                send_request_mock.side_effect = send_request
+                q = self.searcher.search().order_by('-rank')[10:20]
+                docs = list(q.iterate(batch_size=2, prefetch=prefetch))
+                self.assertEqual([doc.id for doc in docs], ['1', '2', '3', '4', '5'])
+                self.assertEqual(send_request_mock.call_count, 3)
+                path = send_request_mock.call_args[0][1]
+                self.assertIn('sort=rank+desc%2Cid+asc', path)
+                self.assertIn('rows=2', path)
+                self.assertNotIn('start=', path)
+
+        q = self.searcher.search().order_by('id')
+        self.assertEqual(q._cursor_sort(), ('id asc',))
+        q = self.searcher.search().sort('price asc, id desc')
+        self.assertEqual(q._cursor_sort(), ('price asc', 'id desc'))
+        q = self.searcher.search()
+        self.assertEqual(q._cursor_sort(), ('score desc', 'id asc'))
+        q = self.searcher.search().sort("div(popularity,price) desc, if(exists(a),1,0) asc")
+        self.assertEqual(q._cursor_sort(), ('div(popularity,price) desc',
+                                            'if(exists(a),1,0) asc', 'id asc'))
+
+    def test_instance_loader(self):
+        obj_mapper = Mock(wraps=_obj_mapper)
+
+        class TestSearcher(SolrSearcher):
+            def instance_mapper(self, ids, db_query=None):
+                return obj_mapper(ids)
+
+        searcher = TestSearcher('http://example.com:8180/solr',
+                                instance_cache=ResultCache())
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = '''{
+  "response": {"numFound": 2, "start": 0, "docs": [{"id": "1"}, {"id": "2"}]},
+  "grouped": {
+    "company": {
+      "matches": 2,
+      "groups": [{
+          "groupValue": "3",
+          "doclist": {"numFound": 1, "start": 0, "docs": [{"id": "4"}]}}]}},
+  "facet_counts": {
+    "facet_fields": {"category": ["1", 5, "5", 2]}},
+  "stats": {
+    "stats_fields": {
+      "price": {
+        "min": 3.5,
+        "facets": {"brand": {"6": {"min": 4.0}}}}}}}'''
+
+            q = searcher.search()
+            q = q.facet_field('category', _instance_mapper=searcher.instance_mapper)
+            q = q.group_field('company', _instance_mapper=searcher.instance_mapper)
+            q = q.stats('price', facet_fields=[('brand', searcher.instance_mapper)])
+            r = q.results
+
+            self.assertEqual(r.docs[0].instance, Obj('1', '1 1'))
+            self.assertEqual(obj_mapper.call_count, 1)
+            self.assertEqual(sorted(obj_mapper.call_args[0][0]),
+                             ['1', '2', '3', '4', '5', '6'])
+            grouped = r.get_grouped('company')
+            self.assertEqual(grouped.groups[0].instance, Obj('3', '3 3'))
+            self.assertEqual(grouped.groups[0].docs[0].instance, Obj('4', '4 4'))
+            category_facet = r.get_facet_field('category')
+            self.assertEqual(category_facet.get_value('5').instance, Obj('5', '5 5'))
+            brand_facet = r.get_stats_field('price').get_facet('brand')
+            self.assertEqual(brand_facet.get_value('6').instance, Obj('6', '6 6'))
+            self.assertEqual(obj_mapper.call_count, 1)
+
+            send_request.return_value = '''{
+  "response": {"numFound": 2, "start": 0, "docs": [{"id": "1"}, {"id": "7"}]}}'''
+            r = searcher.search().results
+            self.assertEqual(r.docs[0].instance, Obj('1', '1 1'))
+            self.assertEqual(r.docs[1].instance, Obj('7', '7 7'))
+            self.assertEqual(obj_mapper.call_count, 2)
+            self.assertEqual(list(obj_mapper.call_args[0][0]), ['7'])
+
+    def test_compact_document(self):
+        searcher = SolrSearcher('http://example.com:8180/solr',
+                                document_cls=CompactDocument)
+        with self.patch_send_request(searcher) as send_request:
+            send_request.return_value = '''{
+  "response": {"numFound": 3, "start": 0, "docs": [
+    {"id": "1", "name": "one"},
+    {"id": "2", "name": "two", "rank": 5},
+    {"name": "three", "id": "3"}]},
+  "highlighting": {"2": {"name": ["<em>two</em>"]}}}'''
+            r = searcher.search().results
+            doc1, doc2, doc3 = r.docs
+            self.assertFalse(hasattr(doc1, '__dict__'))
+            self.assertEqual(doc1.id, '1')
+            self.assertEqual(doc3.name, 'three')
+            self.assertEqual(doc2.rank, 5)
+            self.assertRaises(AttributeError, lambda: doc1.rank)
+            self.assertEqual(getattr(doc3, 'rank', None), None)
+            self.assertEqual(doc1.to_solr(), {'id': '1', 'name': 'one'})
+            self.assertEqual(doc2.to_solr(), {'id': '2', 'name': 'two', 'rank': 5})
+            self.assertEqual(doc2.highlighted, {'name': ['<em>two</em>']})
+            self.assertIs(doc1._index, doc3._index)
+            self.assertEqual(r.field_index.names, ['id', 'name', 'rank'])
+
+    def test_lazy_results(self):
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''{
+  "response": {"numFound": 3, "start": 0, "docs": [
+    {"id": "1"}, {"id": "2"}, {"id": "3"}]},
+  "facet_counts": {
+    "facet_fields": {"category": ["1", 5], "tag": ["a", 2]}},
+  "stats": {"stats_fields": {"price": {"min": 3.5}}}}'''
+            q = self.searcher.search() \
+                             .facet_field('category', _type=Integer) \
+                             .facet_field('tag') \
+                             .stats('price')
+            r = q.results
+
+            self.assertEqual(len(r), 3)
+            self.assertEqual(len(r.docs), 3)
+            self.assertEqual(r.docs._docs, [None, None, None])
+            self.assertEqual(r.docs[-1].id, '3')
+            self.assertEqual(r.docs._docs[:2], [None, None])
+            self.assertEqual([doc.id for doc in r.docs[:2]], ['1', '2'])
+            self.assertIs(r.docs[0], list(r)[0])
+
+            # docs behave like a list, mutation wraps the rest
+            self.assertIsInstance(r.docs, list)
+            self.assertEqual([d.id for d in ([None] + r.docs)[1:]], ['1', '2', '3'])
+            r.docs.append(r.docs[0])
+            self.assertEqual([d.id for d in r.docs], ['1', '2', '3', '1'])
+            self.assertEqual(len(r.docs), 4)
+            self.assertEqual([d.id for d in r.docs + r.docs[:1]],
+                             ['1', '2', '3', '1', '1'])
+            self.assertEqual(r.docs, list(r.docs))
+
+            self.assertEqual(r._facet_fields[0].values, [])
+            category_facet = r.get_facet_field('category')
+            self.assertEqual(category_facet.values[0].value, 1)
+            self.assertEqual(r._facet_fields[1].values, [])
+            self.assertEqual(r._stats_fields[0].min, None)
+            self.assertIs(r.get_facet_field('category'), category_facet)
+            self.assertEqual(len(category_facet.values), 1)
+
+            self.assertEqual([len(f.values) for f in r.facet_fields], [1, 1])
+            self.assertEqual(r.get_stats_field('price').min, 3.5)
+
+    def test_facet_field_decoding(self):
+        self.assertEqual(list(zip_counts(['a', 1, 'b', 2, 'c'], 2)),
+                         [('a', 1), ('b', 2)])
+        self.assertEqual(list(zip_counts([1, 10, 2, 20, 3], 2, 1)),
+                         [(1, 10, 2), (2, 20, 3)])
+        self.assertEqual(list(zip_counts([1, 10, 2, 20], 2, 1)),
+                         [(1, 10, 2), (2, 20, None)])
+
+        self.assertEqual(Integer().to_python_list(['1', 2, None]), [1, 2, None])
+        self.assertEqual(Float(1).to_python_list(['1.25', '2']), [1.2, 2.0])
+        self.assertEqual(Boolean().to_python_list(['true', 'false']), [True, False])
+
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''{
+  "response": {"numFound": 10, "start": 0, "docs": []},
+  "facet_counts": {
+    "facet_fields": {
+      "category": ["10", 5, "2", 3, "7", 2],
+      "tag": ["a", 4, null, 1]}}}'''
+            q = self.searcher.search() \
+                             .facet_field('category', _type=Integer) \
+                             .facet_field('tag')
+            r = q.results
+            category_facet = r.get_facet_field('category')
+            self.assertEqual([fv.value for fv in category_facet.values], [10, 2, 7])
+            self.assertEqual([fv.orig_value for fv in category_facet.values],
+                             [10, 2, 7])
+            self.assertEqual([fv.count for fv in category_facet.values], [5, 3, 2])
+            tag_facet = r.get_facet_field('tag')
+            self.assertEqual([fv.value for fv in tag_facet.values], ['a', None])
+
+            if numpy is not None:
+                values, counts = category_facet.to_arrays()
+                self.assertEqual(values.dtype, numpy.int64)
+                self.assertEqual(values[counts.argsort()].tolist(), [7, 2, 10])
+                self.assertEqual((values * counts).sum(), 70)
+                values, counts = tag_facet.to_arrays()
+                self.assertEqual(values.tolist(), ['a', None])
+
+    def test_copy_on_write(self):
+        base = self.searcher.search().filter(status=0).rows(10)
+        q1 = base.filter(category=1)
+        q2 = base.filter(category=2).rows(20)
+        self.assertIs(q1._peek('_params'), base._peek('_params'))
+        self.assertIsNot(q2._peek('_params'), base._peek('_params'))
+        self.assertIsNot(q1._peek('_fq'), base._peek('_fq'))
+
+        self.assertEqual(len(base._fq), 1)
+        self.assertEqual(len(q1._fq), 2)
+        self.assertEqual(base._params['rows'], 10)
+        self.assertEqual(q2._params['rows'], 20)
+        self.assertIn('fq=category:1', str(q1))
+        self.assertNotIn('fq=category:2', str(q1))
+
+        # modifying query in place after cloning must not affect the clone
+        q3 = base.clone()
+        base._params['rows'] = 30
+        base._fq.append((X(category=3), LocalParams()))
+        self.assertEqual(q3._params['rows'], 10)
+        self.assertEqual(len(q3._fq), 1)
+
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '{"response": {"numFound": 0, "start": 0, "docs": []}}'
+            q1.results
+            self.assertIsNotNone(q1._result_cache)
+            self.assertIsNone(q1.clone()._result_cache)
+
+    def test_prepared_query(self):
+        q = self.searcher.search(Placeholder('q')) \
+                         .filter(category=Placeholder('category', Integer)) \
+                         .filter(Placeholder('fq')) \
+                         .filter(price__gte=Placeholder('price')) \
+                         .limit(Placeholder('rows', Integer)) \
+                         .facet_field('brand')
+        template = self.searcher.prepare(q)
+        self.assertEqual(template.names,
+                         set(['q', 'category', 'fq', 'price', 'rows']))
+
+        bound = template.bind(q='phone: red', category='13',
+                              fq='red OR blue', price=100, rows='20')
+        raw_query = str(bound)
+        self.assertIn('q=phone\\: red', raw_query)
+        self.assertIn('fq=category:13', raw_query)
+        self.assertIn('fq=red or blue', raw_query)
+        self.assertIn('fq=price:[100 TO *]', raw_query)
+        self.assertIn('rows=20', raw_query)
+        self.assertIn('facet.field=brand', raw_query)
+        self.assertNotIn('\ue000', raw_query)
+
+        # values can be bound many times, template is not changed
+        raw_query = str(template.bind(q='tv', category=1, fq='green',
+                                      price=5, rows=10))
+        self.assertIn('q=tv', raw_query)
+        self.assertIn('fq=category:1&', raw_query)
+        self.assertIn('fq=green', raw_query)
+
+        # further chaining after binding still substitutes values
+        raw_query = str(bound.limit(5).filter(status=0))
+        self.assertIn('q=phone\\: red', raw_query)
+        self.assertIn('fq=category:13', raw_query)
+        self.assertIn('fq=status:0', raw_query)
+        self.assertIn('rows=5', raw_query)
+        self.assertNotIn('rows=20', raw_query)
+
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '{"response": {"numFound": 7, "start": 0, "docs": []}}'
+            self.assertEqual(bound.count(), 7)
+            self.assertEqual(len(bound.results.docs), 0)
+            self.assertEqual(send_request.call_count, 2)
+            self.assertNotIn('\ue000', force_unicode(send_request.call_args))
+
+        self.assertRaises(ValueError, template.bind, q='tv')
+        self.assertRaises(ValueError, template.bind, q='tv', category=1,
+                          fq='status:0', price=5, rows=10, unknown=1)
+        self.assertRaises(ValueError, template.bind, q='tv', category='abc',
+                          fq='status:0', price=5, rows=10)
+        self.assertRaises(ValueError, template.bind, q='tv', category=None,
+                          fq='status:0', price=5, rows=10)
+        self.assertRaises(
+            ValueError, self.searcher.prepare,
+            self.searcher.search().filter(category__in=Placeholder('category')))
+        self.assertRaises(
+            ValueError, self.searcher.prepare,
+            self.searcher.search().facet_query(category=Placeholder('category')))
+        self.assertRaises(ValueError, Placeholder, 'not valid')
@@ -1,10 +1,12 @@
 from __future__ import unicode_literals
 
 from __future__ import absolute_import
+import json
 from datetime import datetime
 from collections import namedtuple
 
 from mock import Mock
+from six.moves.urllib.parse import parse_qs, urlparse
 
 from solar import X, LocalParams
 from solar.types import Integer, Float, Boolean
@@ -588,35 +590,32 @@ class QueryFilterTest(TestCase):
             self.assertEqual(obj_mapper.call_count, 1)
             
     def test_range_filter(self):
-        with self.patch_send_request() as send_request:
-            send_request.return_value = '{}'
-        
-            q = self.searcher.search()
+        q = self.searcher.search()
 
-            qf = QueryFilter()
-            qf.add_filter(RangeFilter('price', 'price_unit', gather_stats=True,
-                                      _local_params=LocalParams(cache=False),
-                                      type=Float))
+        qf = QueryFilter()
+        qf.add_filter(RangeFilter('price', 'price_unit', gather_stats=True,
+                                  _local_params=LocalParams(cache=False),
+                                  type=Float))
 
-            params = {
-                'price__gte': '100',
-                'price__lte': ['nan', '200'],
-                'price': '66',
-            }
+        params = {
+            'price__gte': '100',
+            'price__lte': ['nan', '200'],
+            'price': '66',
+        }
 
-            q = qf.apply(q, params)
-            raw_query = force_unicode(q)
+        q = qf.apply(q, params)
+        raw_query = force_unicode(q)
 
-            self.assertIn('fq={!cache=false tag=price}'
-                          'price_unit:[100.0 TO *]', raw_query)
-            self.assertIn('fq={!cache=false tag=price}'
-                          'price_unit:[* TO 200.0]', raw_query)
-            self.assertNotIn('fq={!cache=false tag=price}'
-                             'price_unit:"66.0"', raw_query)
+        self.assertIn('fq={!cache=false tag=price}'
+                      'price_unit:[100.0 TO *]', raw_query)
+        self.assertIn('fq={!cache=false tag=price}'
+                      'price_unit:[* TO 200.0]', raw_query)
+        self.assertNotIn('fq={!cache=false tag=price}'
+                         'price_unit:"66.0"', raw_query)
+        self.assertIn('stats.field={!key=price ex=price}price_unit', raw_query)
 
-            results = q.results
-            with self.patch_send_request() as send_request:
-                send_request.return_value = '''
+        with self.patch_send_request() as send_request:
+            send_request.return_value = '''
 {
   "response": {
     "numFound": 800,
@@ -625,7 +624,7 @@ class QueryFilterTest(TestCase):
   },
   "stats": {
     "stats_fields": {
-      "price_unit": {
+      "price": {
         "min": 3.5,
         "max": 892.0,
         "count": 1882931,
@@ -638,11 +637,52 @@ class QueryFilterTest(TestCase):
     }
   }
 }'''
-                
-                qf.process_results(results)
-
-                price_filter = qf.get_filter('price')
-                self.assertEqual(price_filter.from_value, 100)
-                self.assertEqual(price_filter.to_value, 200)
-                self.assertEqual(price_filter.min, 3.5)
-                self.assertEqual(price_filter.max, 892.0)
+            results = q.results
+            qf.process_results(results)
+
+            price_filter = qf.get_filter('price')
+            self.assertEqual(price_filter.from_value, 100)
+            self.assertEqual(price_filter.to_value, 200)
+            self.assertEqual(price_filter.min, 3.5)
+            self.assertEqual(price_filter.max, 892.0)
+            # stats are gathered within the main request
+            self.assertEqual(send_request.call_count, 1)
+
+    def test_range_filter_stats_subquery(self):
+        q = self.searcher.search()
+
+        qf = QueryFilter()
+        qf.add_filter(RangeFilter('price', 'price_unit', gather_stats=True,
+                                  stats_subquery=True, type=Float))
+        qf.add_filter(RangeFilter('weight', gather_stats=True,
+                                  stats_subquery=True, type=Float))
+        qf.add_filter(Filter('status', type=Integer))
+
+        q = qf.apply(q, {'price__gte': '100', 'weight__lte': '5',
+                         'status': '0'})
+        self.assertNotIn('stats', force_unicode(q))
+
+        def send_request(method, path, **kwargs):
+            params = parse_qs(urlparse(path).query)
+            fq = ' '.join(params['fq'])
+            stats = {}
+            if params.get('stats.field') == ['price_unit']:
+                self.assertNotIn('price_unit', fq)
+                self.assertIn('weight', fq)
+                stats = {'price_unit': {'min': 1.0, 'max': 999.0}}
+            elif params.get('stats.field') == ['weight']:
+                self.assertIn('price_unit', fq)
+                self.assertNotIn('weight', fq)
+                stats = {'weight': {'min': 0.5, 'max': 12.0}}
+            return ('{"response": {"numFound": 0, "start": 0, "docs": []}, '
+                    '"stats": {"stats_fields": %s}}' % json.dumps(stats))
+
+        with self.patch_send_request() as mocked:
+            mocked.side_effect = send_request
+            qf.process_results(q.results)
+
+            self.assertEqual(mocked.call_count, 3)
+            self.assertEqual(qf.get_filter('price').min, 1.0)
+            self.assertEqual(qf.get_filter('price').max, 999.0)
+            self.assertEqual(qf.get_filter('weight').min, 0.5)
+            self.assertEqual(qf.get_filter('weight').max, 12.0)
@@ -0,0 +1,224 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import asyncio
+import json
+
+import requests
+from mock import Mock, AsyncMock, patch
+
+from solar import (
+    SolrSearcher, SolrCluster, RetryPolicy, CircuitBreaker, CircuitOpenError,
+    Deadline, DeadlineExceeded)
+from solar.pysolr import Solr, AsyncSolr, SolrError, SolrConnectionError
+
+from .base import TestCase
+from .test_cache import FakeTimer
+
+
+def make_response(status_code=200):
+    content = json.dumps({
+        "responseHeader": {"status": 0, "QTime": 1},
+        "response": {"numFound": 1, "start": 0, "docs": [{"id": "1"}]},
+    }).encode('utf-8')
+    return Mock(status_code=status_code, content=content, headers={})
+
+
+def connection_error(*args, **kwargs):
+    raise requests.exceptions.ConnectionError('refused')
+
+
+class RetryPolicyTest(TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(max_attempts=4, backoff=0.1, max_backoff=0.3,
+                                  _sleep=self.sleeps.append,
+                                  _random=lambda: 0.5)
+
+    def test_delay(self):
+        self.assertEqual([self.policy.get_delay(n) for n in range(1, 5)],
+                         [0.05, 0.1, 0.15, 0.15])
+        self.policy.jitter = False
+        self.assertEqual(self.policy.get_delay(2), 0.2)
+        self.assertTrue(self.policy.is_retryable('GET', 'select/?q=*:*'))
+        self.assertTrue(self.policy.is_retryable('POST', '/mlt'))
+        self.assertFalse(self.policy.is_retryable('POST', 'update/?commit=true'))
+
+    def test_retry(self):
+        solr = Solr('http://example.com:8180/solr', retry_policy=self.policy)
+        get = solr.session.get = Mock(
+            side_effect=[requests.exceptions.Timeout('timeout'),
+                         make_response(503),
+                         make_response()])
+        results = solr.search('*:*')
+        self.assertEqual(results.hits, 1)
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(self.sleeps, [0.05, 0.1])
+        self.assertEqual(solr.retry_stats()['retry'],
+                         {'max_attempts': 4, 'retries': 2, 'exhausted': 0})
+
+        get.side_effect = connection_error
+        get.reset_mock()
+        with self.assertRaises(SolrConnectionError):
+            solr.search('*:*')
+        self.assertEqual(get.call_count, 4)
+        self.assertEqual(solr.retry_stats()['retry']['exhausted'], 1)
+
+        # bad requests and updates are not retried
+        get.reset_mock()
+        get.side_effect = None
+        get.return_value = make_response(400)
+        with self.assertRaises(SolrError):
+            solr.search('*:*')
+        self.assertEqual(get.call_count, 1)
+
+        post = solr.session.post = Mock(side_effect=connection_error)
+        with self.assertRaises(SolrConnectionError):
+            solr.commit()
+        self.assertEqual(post.call_count, 1)
+
+    def test_deadline(self):
+        clock = FakeTimer()
+        solr = Solr('http://example.com:8180/solr', retry_policy=self.policy)
+        get = solr.session.get = Mock(side_effect=connection_error)
+        with Deadline(0.08, _clock=clock).activate():
+            with self.assertRaises(SolrConnectionError):
+                solr.search('*:*')
+        # the second delay does not fit into the remaining budget
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(self.sleeps, [0.05])
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        self.clock = FakeTimer()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                      _clock=self.clock)
+
+    def test_states(self):
+        breaker = self.breaker
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        self.clock.now = 10
+        self.assertTrue(breaker.available())
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        # only one probe at a time
+        self.assertFalse(breaker.available())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.stats(), {
+            'state': 'closed', 'failures': 0, 'open_count': 2, 'rejected': 2})
+
+    def test_solr(self):
+        searcher = SolrSearcher(solr=Solr('http://example.com:8180/solr',
+                                          circuit_breaker=self.breaker))
+        get = searcher.solr.session.get = Mock(side_effect=connection_error)
+        for _ in range(2):
+            with self.assertRaises(SolrConnectionError):
+                searcher.search('test').results
+        get.reset_mock()
+        with self.assertRaises(CircuitOpenError):
+            searcher.search('test').results
+        self.assertFalse(get.called)
+        self.assertEqual(searcher.solr.retry_stats()['circuit_breaker']['state'],
+                         'open')
+
+        self.clock.now = 10
+        get.side_effect = None
+        get.return_value = make_response()
+        self.assertEqual(searcher.search('test').results.hits, 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_cluster(self):
+        urls = ['http://solr1:8983/solr', 'http://solr2:8983/solr']
+        solr = SolrCluster(urls, circuit_breaker=CircuitBreaker(
+            failure_threshold=1, reset_timeout=10, _clock=self.clock))
+        self.assertIsNot(solr.nodes[0].breaker, solr.nodes[1].breaker)
+
+        def get(url, **kwargs):
+            if url.startswith(urls[0]):
+                raise requests.exceptions.ConnectionError('refused')
+            return make_response()
+        solr.session.get = Mock(side_effect=get)
+
+        for _ in range(4):
+            self.assertEqual(solr.search('*:*').hits, 1)
+        stats = solr.nodes_stats()
+        self.assertEqual(stats[0]['circuit_breaker']['state'], 'open')
+        self.assertEqual(stats[0]['failures'], 1)
+        self.assertEqual(stats[1]['circuit_breaker']['state'], 'closed')
+
+        solr.session.get = Mock(side_effect=connection_error)
+        with self.assertRaises(SolrConnectionError):
+            solr.search('*:*')
+        with self.assertRaises(CircuitOpenError):
+            solr.search('*:*')
+        self.assertEqual(
+            solr.retry_stats()['circuit_breaker'][urls[1]]['state'], 'open')
+
+    def test_cluster_retry_budget(self):
+        urls = ['http://solr1:8983/solr', 'http://solr2:8983/solr']
+        sleeps = []
+        solr = SolrCluster(urls, retry_policy=RetryPolicy(
+            max_attempts=3, _sleep=sleeps.append, _random=lambda: 1))
+        get = solr.session.get = Mock(side_effect=connection_error)
+        with self.assertRaises(SolrConnectionError):
+            solr.search('*:*')
+        # retry policy limits the total number of attempts on all nodes
+        self.assertEqual(get.call_count, 3)
+        nodes = [c[0][0].split('/select')[0] for c in get.call_args_list]
+        self.assertNotEqual(nodes[0], nodes[1])
+        self.assertNotEqual(nodes[1], nodes[2])
+        self.assertEqual(sleeps, [0.05, 0.1])
+
+    def test_cluster_deadline(self):
+        clock = FakeTimer()
+        urls = ['http://solr1:8983/solr', 'http://solr2:8983/solr']
+        solr = SolrCluster(urls, retry_policy=RetryPolicy(_sleep=lambda d: None))
+
+        def get(url, **kwargs):
+            clock.now = 2
+            raise requests.exceptions.ConnectionError('refused')
+        solr.session.get = Mock(side_effect=get)
+
+        with Deadline(1, _clock=clock).activate():
+            with self.assertRaises(DeadlineExceeded):
+                solr.search('*:*')
+        # expired deadline stops failover to other nodes
+        self.assertEqual(solr.session.get.call_count, 1)
+
+
+class AsyncRetryTest(TestCase):
+    def test_retry(self):
+        solr = AsyncSolr('http://example.com:8180/solr',
+                         retry_policy=RetryPolicy(max_attempts=3),
+                         circuit_breaker=CircuitBreaker(failure_threshold=3))
+        responses = [SolrConnectionError('refused'), '{"response": {"numFound": 1, "docs": []}}']
+        solr._send_url_request = AsyncMock(side_effect=responses)
+        with patch('asyncio.sleep', new_callable=AsyncMock) as sleep:
+            results = asyncio.run(solr.search('*:*'))
+        self.assertEqual(results.hits, 1)
+        self.assertEqual(solr._send_url_request.await_count, 2)
+        self.assertEqual(sleep.await_count, 1)
+        self.assertEqual(solr.retry_stats()['retry']['retries'], 1)
+        self.assertEqual(solr.retry_stats()['circuit_breaker']['state'], 'closed')
+
+        solr._send_url_request = AsyncMock(side_effect=SolrConnectionError('refused'))
+        with patch('asyncio.sleep', new_callable=AsyncMock):
+            with self.assertRaises(SolrConnectionError):
+                asyncio.run(solr.search('*:*'))
+            with self.assertRaises(CircuitOpenError):
+                asyncio.run(solr.search('*:*'))
+        self.assertEqual(solr._send_url_request.await_count, 3)
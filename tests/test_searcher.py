@@ -59,3 +59,25 @@ class SearcherTestCase(TestCase):
             self.assertEqual(docs[0].name, 'Test realtime doc')
             self.assertEqual(docs[1].id, '222')
             self.assertEqual(docs[1].name, 'Test realtime doc duplicate')
+
+    def test_execute_many(self):
+        def send_request(method, path, *args, **kwargs):
+            numFound = 10 if 'rows=0' in path else 3
+            return '{"response": {"numFound": %d, "start": 0, "docs": []}}' % numFound
+
+        with self.patch_send_request() as mock_send_request:
+            mock_send_request.side_effect = send_request
+
+            q1 = self.searcher.search('test')
+            q2 = self.searcher.search('test').limit(0)
+            q3 = self.searcher.search('other')
+            results = self.searcher.execute_many([q1, q2, q3, q1])
+            self.assertEqual(mock_send_request.call_count, 3)
+            self.assertEqual([r.ndocs for r in results], [3, 10, 3, 3])
+            self.assertIs(results[0], q1.results)
+            self.assertIs(results[1], q2.results)
+            self.assertEqual(len(q3), 3)
+            self.assertEqual(mock_send_request.call_count, 3)
+
+            self.searcher.execute_many([q1, q2])
+            self.assertEqual(mock_send_request.call_count, 3)
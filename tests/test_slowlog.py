@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+from six import StringIO
+
+from solar import SolrSearcher
+from solar.instrumentation import add_hook, remove_hook
+from solar.slowlog import SlowQueryLog, read_entries, replay, main
+
+
+RESPONSE = {
+    "responseHeader": {"status": 0, "QTime": 42},
+    "response": {"numFound": 3, "start": 0, "docs": [{"id": "1"}]},
+}
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'slow.log')
+        self.searcher = SolrSearcher('http://example.com:8180/solr')
+        self.content = json.dumps(RESPONSE).encode('utf-8')
+        self.searcher.solr.session.get = Mock(
+            return_value=Mock(status_code=200, content=self.content))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_slow_queries(self):
+        slowlog = add_hook(SlowQueryLog(threshold=0, max_entries=2,
+                                        path=self.path))
+        try:
+            q = self.searcher.search('phone').filter(category=1).limit(5)
+            q.results
+            self.searcher.search('tv').results
+            self.searcher.search('radio').results
+        finally:
+            remove_hook(slowlog)
+            slowlog.close()
+
+        entries = slowlog.entries()
+        self.assertEqual([e['params']['q'] for e in entries], ['tv', 'radio'])
+
+        entries = list(read_entries(self.path))
+        self.assertEqual(len(entries), 3)
+        entry = entries[0]
+        self.assertEqual(entry['query'], str(q))
+        self.assertEqual(entry['params']['fq'], ['category:1'])
+        self.assertEqual(entry['params']['rows'], 5)
+        self.assertEqual(entry['qtime'], 42)
+        self.assertEqual(entry['hits'], 3)
+        self.assertEqual(entry['bytes'], len(self.content))
+        self.assertEqual(entry['handler'], 'select')
+        self.assertIn('http', entry['phases'])
+        self.assertTrue(entry['site'].startswith(os.path.abspath(__file__)))
+        self.assertIn('in test_slow_queries', entry['site'])
+
+        slowlog.clear()
+        self.assertEqual(slowlog.entries(), [])
+
+    def test_threshold(self):
+        slowlog = add_hook(SlowQueryLog(threshold=60))
+        try:
+            self.searcher.search('phone').results
+        finally:
+            remove_hook(slowlog)
+        self.assertEqual(slowlog.entries(), [])
+
+    def test_replay(self):
+        slowlog = add_hook(SlowQueryLog(threshold=0))
+        try:
+            self.searcher.search('phone').filter(category=1).results
+        finally:
+            remove_hook(slowlog)
+        slowlog.dump(self.path)
+
+        solr = Mock()
+        solr.search_raw.return_value = RESPONSE
+        out = StringIO()
+        replay(read_entries(self.path), solr, repeat=2, out=out)
+        self.assertEqual(solr.search_raw.call_count, 2)
+        args, kwargs = solr.search_raw.call_args
+        self.assertEqual(args, ('phone',))
+        self.assertEqual(kwargs['fq'], ['category:1'])
+        self.assertIn('QTime 42 (was 42)', out.getvalue())
+
+        with patch('solar.pysolr.Solr.search_raw', return_value=RESPONSE) as search_raw:
+            with patch('sys.stdout', StringIO()):
+                self.assertEqual(
+                    main(['replay', self.path, '--url', 'http://localhost/solr']), 0)
+        self.assertEqual(search_raw.call_count, 1)
@@ -3,11 +3,14 @@
 from __future__ import unicode_literals
 
 from __future__ import absolute_import
-from datetime import datetime
+import decimal
+from datetime import datetime, timedelta, timezone
 from unittest import TestCase
 
 from solar import func
-from solar.util import SafeUnicode, safe_solr_input, X, LocalParams, make_fq
+from solar.util import SafeUnicode, safe_solr_input, X, LocalParams, LookupIndex, make_fq
+from solar.util import fq_memo, process_special_words
+from solar.util import process_special_characters, contains_special_characters
 from solar.compat import force_unicode
 
 
@@ -142,3 +145,75 @@ class UtilTest(TestCase):
                             **{'facet.prefix': SafeUnicode(safe_value)})),
                 u"{!dismax facet.prefix=%s}" % safe_value)
 
+
+    def test_lookup_index(self):
+        class Item(object):
+            def __init__(self, value):
+                self.value = value
+
+        items = [Item('a'), Item(1), Item('a'), Item(None)]
+        index = LookupIndex('value')
+        self.assertIs(index.lookup(items, 'a'), items[0])
+        self.assertIs(index.lookup(items, 1), items[1])
+        self.assertIs(index.lookup(items, None), items[3])
+        self.assertIsNone(index.lookup(items, 'b'))
+        self.assertIsNone(index.lookup(items, '1'))
+
+        items.append(Item('b'))
+        self.assertIs(index.lookup(items, 'b'), items[-1])
+
+        other_items = [Item('a')]
+        self.assertIs(index.lookup(other_items, 'a'), other_items[0])
+
+        self.assertIsNone(index.lookup(items, ['a']))
+        items.append(Item(['a']))
+        self.assertIs(index.lookup(items, ['a']), items[-1])
+        self.assertIs(index.lookup(items, 'b'), items[-2])
+
+    def test_special_words(self):
+        self.assertEqual(safe_solr_input('AND AND'), 'and and')
+        self.assertEqual(safe_solr_input('NOT OR TO x'), 'not or to x')
+        self.assertEqual(safe_solr_input('ANDROID TOR'), 'ANDROID TOR')
+        self.assertEqual(process_special_words('x AND y TO', words=['TO']),
+                         'x AND y to')
+
+    def test_special_characters(self):
+        self.assertEqual(process_special_characters('a-b:c', chars=['-', ':']),
+                         'a\\-b\\:c')
+        self.assertEqual(process_special_characters('a-b:c', chars='-'),
+                         'a\\-b:c')
+        self.assertTrue(contains_special_characters('a-b', chars=['-']))
+        self.assertFalse(contains_special_characters('a-b', chars=[':']))
+
+    def test_make_fq_memo(self):
+        fq_memo.clear()
+        self.assertEqual(make_fq(X(status=1)), 'status:1')
+        self.assertEqual(make_fq(X(status=True)), 'status:true')
+        self.assertEqual(make_fq(X(status=1.0)), 'status:1.0')
+        self.assertEqual(make_fq(X(status='1')), 'status:1')
+        self.assertEqual(make_fq(X(status=1), LocalParams(tag='st')),
+                         '{!tag=st}status:1')
+        self.assertEqual(make_fq(X(status=1)), 'status:1')
+        self.assertEqual(len(fq_memo._data), 5)
+
+        x = X(status=1)
+        self.assertEqual(make_fq(x), 'status:1')
+        x.children.append(('name', 'test'))
+        self.assertEqual(make_fq(x), 'status:1 AND name:test')
+
+        self.assertEqual(make_fq(X(price=func.sqrt('price'))), 'price:sqrt(price)')
+        self.assertEqual(len(fq_memo._data), 6)
+
+        # equal numbers rendered differently are memoized separately
+        self.assertEqual(make_fq(X(price=decimal.Decimal('1.0'))), 'price:1.0')
+        self.assertEqual(make_fq(X(price=decimal.Decimal('1.00'))), 'price:1.00')
+        self.assertEqual(make_fq(X(price=0.0)), 'price:0.0')
+        self.assertEqual(make_fq(X(price=-0.0)), 'price:-0.0')
+
+        utc_noon = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        local_noon = datetime(2020, 1, 1, 14, tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(utc_noon, local_noon)
+        fq = make_fq(X(d=local_noon))
+        fq_memo.clear()
+        make_fq(X(d=utc_noon))
+        self.assertEqual(make_fq(X(d=local_noon)), fq)